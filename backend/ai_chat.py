@@ -1,20 +1,12 @@
-import os
+import llm_gateway
+import llm_scheduler
+import semantic_cache
 
-from google import genai
-from dotenv import load_dotenv
+STUDY_ONLY_MESSAGE = "This is for study purposes only."
 
-# Load keys from .env if present
-load_dotenv()
-
-def get_api_key(name):
-    """Retrieve API key from environment or streamlit secrets."""
-    return os.getenv(name) 
-
-client = genai.Client(api_key=get_api_key("GEMINI_API_KEY"))
-
-def study_chat(question, level="Beginner"):
-    prompt = f"""You are a study assistant. Only answer questions about education, learning, or studying.
-If the user's question is NOT related to education, learning, or studying, respond with exactly this sentence and nothing else: This is for study purposes only.
+def build_chat_prompt(question, level="Beginner"):
+    return f"""You are a study assistant. Only answer questions about education, learning, or studying.
+If the user's question is NOT related to education, learning, or studying, respond with exactly this sentence and nothing else: {STUDY_ONLY_MESSAGE}
 
 Otherwise, explain the following topic at {level} level in a clear and well-structured manner.
 
@@ -30,9 +22,38 @@ Topic:
 {question}
 """
 
-    response = client.models.generate_content(
-        model="gemini-2.5-flash",
-        contents=prompt,
-    )
 
-    return response.text
+def remember(question, level, answer, use_cache):
+    """Offer an answer to the semantic cache, unless the caller bypassed it or it is a refusal.
+
+    A refusal is not reused: a similar-looking question may well be a study question.
+    """
+    if use_cache and answer.strip() != STUDY_ONLY_MESSAGE:
+        semantic_cache.cache.store(question, level, answer)
+
+
+async def study_chat(question, level="Beginner", use_cache=True):
+    """Answer a study question, reusing the answer to a near-identical earlier question at the same level."""
+    if use_cache:
+        cached = semantic_cache.cache.lookup(question, level)
+        if cached is not None:
+            return cached
+    prompt = build_chat_prompt(question, level)
+    answer = await llm_gateway.generate(prompt, use_cache=use_cache, priority=llm_scheduler.INTERACTIVE)
+    remember(question, level, answer, use_cache)
+    return answer
+
+
+async def stream_study_chat(question, level="Beginner", use_cache=True):
+    """Yield the chat answer as text chunks while the model generates it."""
+    if use_cache:
+        cached = semantic_cache.cache.lookup(question, level)
+        if cached is not None:
+            yield cached
+            return
+    prompt = build_chat_prompt(question, level)
+    parts = []
+    async for chunk in llm_gateway.stream(prompt, use_cache=use_cache, priority=llm_scheduler.INTERACTIVE):
+        parts.append(chunk)
+        yield chunk
+    remember(question, level, "".join(parts), use_cache)
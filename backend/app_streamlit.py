@@ -1,5 +1,6 @@
 from datetime import date
 import streamlit as st
+from llm_gateway import run_sync
 from ai_chat import study_chat
 from summarizer import summarize_text
 from quiz_generator import generate_quiz
@@ -108,7 +109,7 @@ with tab_chat:
         with st.chat_message("assistant"):
             with st.spinner("Thinking..."):
                 try:
-                    answer = study_chat(user_msg, level)
+                    answer = run_sync(study_chat(user_msg, level))
                 except Exception as e:
                     answer = format_gemini_error(e, "answering your question")
                 st.markdown(answer)
@@ -142,7 +143,7 @@ with tab_notes:
     if summarize_button and text.strip():
         with st.spinner("Summarizing your notes..."):
             try:
-                summary = summarize_text(text)
+                summary = run_sync(summarize_text(text))
             except Exception as e:
                 st.error(format_gemini_error(e, "summarizing your notes"))
             else:
@@ -193,7 +194,7 @@ with tab_voice:
 
             with st.spinner("Turning transcript into concise notes..."):
                 try:
-                    summary = summarize_text(transcript)
+                    summary = run_sync(summarize_text(transcript))
                 except Exception as e:
                     st.error(format_gemini_error(e, "summarizing the transcript"))
                 else:
@@ -267,7 +268,7 @@ with tab_quiz:
         if generate_btn and (quiz_text.strip() or quiz_topic.strip()):
             with st.spinner("Generating quiz..."):
                 try:
-                    result = generate_quiz(text=quiz_text, topic=quiz_topic)
+                    result = run_sync(generate_quiz(text=quiz_text, topic=quiz_topic))
                 except Exception as e:
                     st.error(format_gemini_error(e, "generating your quiz"))
                 else:
@@ -384,13 +385,13 @@ with tab_planner:
     if plan_btn and planner_topics.strip():
         with st.spinner("Creating your study plan..."):
             try:
-                plan = generate_study_plan(
+                plan = run_sync(generate_study_plan(
                     topics=planner_topics.strip(),
                     start_date="",
                     end_date=str(planner_deadline_date),
                     hours_per_day=planner_hours,
                     days_per_week=planner_days,
-                )
+                ))
             except Exception as e:
                 st.error(format_gemini_error(e, "generating your study plan"))
             else:
@@ -0,0 +1,137 @@
+import os
+
+import numpy as np
+
+import audio_segments
+
+PREPROCESS_ENABLED = os.getenv("AUDIO_PREPROCESS", "1") == "1"
+# Whisper resamples everything to 16 kHz mono, so sending more is wasted upload
+TARGET_RATE = int(os.getenv("AUDIO_TARGET_RATE", "16000"))
+# Frames quieter than this, relative to the loud end of the recording, count as silence
+SILENCE_DB = float(os.getenv("AUDIO_SILENCE_DB", "-40"))
+# Internal silences longer than this are shortened to KEEP_SILENCE_SECONDS
+MAX_SILENCE_SECONDS = float(os.getenv("AUDIO_MAX_SILENCE_SECONDS", "1.0"))
+KEEP_SILENCE_SECONDS = float(os.getenv("AUDIO_KEEP_SILENCE_SECONDS", "0.4"))
+# Speech is padded by this much on each side so word onsets and tails survive
+PAD_SECONDS = float(os.getenv("AUDIO_PAD_SECONDS", "0.2"))
+
+_FILTER_TAPS = 31
+
+_stats = {"files": 0, "original_bytes": 0, "processed_bytes": 0, "seconds_removed": 0.0}
+
+
+def downmix(samples):
+    """Average the channels into one float32 channel."""
+    return samples.mean(axis=1, dtype=np.float32)
+
+
+def _lowpass(mono, cutoff: float):
+    # Windowed-sinc FIR; cutoff is a fraction of the input sample rate
+    n = np.arange(_FILTER_TAPS) - (_FILTER_TAPS - 1) / 2
+    taps = 2 * cutoff * np.sinc(2 * cutoff * n) * np.hamming(_FILTER_TAPS)
+    taps /= taps.sum()
+    return np.convolve(mono, taps.astype(np.float32), mode="same")
+
+
+def resample(mono, rate: int, target_rate: int = TARGET_RATE):
+    """Resample float32 mono audio, low-pass filtering first when downsampling."""
+    if rate == target_rate or not len(mono):
+        return mono
+    if target_rate < rate:
+        # Keep a little below the new Nyquist frequency to avoid aliasing
+        mono = _lowpass(mono, 0.45 * target_rate / rate)
+    length = int(round(len(mono) * target_rate / rate))
+    # Linear interpolation between neighbouring input samples
+    positions = np.arange(length, dtype=np.float64) * (rate / target_rate)
+    left = np.minimum(positions.astype(np.int64), len(mono) - 1)
+    right = np.minimum(left + 1, len(mono) - 1)
+    weight = (positions - left).astype(np.float32)
+    del positions
+    return mono[left] * (1 - weight) + mono[right] * weight
+
+
+def loudness(energy) -> float:
+    """The loud end of a recording: its 95th percentile frame energy."""
+    return float(np.percentile(energy, 95)) if len(energy) else 0.0
+
+
+def speech_mask(mono, rate: int, loud: float = None):
+    """Per-sample boolean mask of what to keep after energy-based silence removal.
+
+    Frames above SILENCE_DB relative to `loud` (by default the loudness of
+    `mono` itself) are speech. Leading and trailing silence is dropped,
+    and internal silences longer than MAX_SILENCE_SECONDS keep only
+    KEEP_SILENCE_SECONDS, split between both ends.
+    """
+    audio = audio_segments.PcmAudio(mono.reshape(-1, 1), rate)
+    energy, frame = audio_segments.frame_energy(audio)
+    keep = np.ones(len(mono), dtype=bool)
+    if not len(energy):
+        return keep
+    if loud is None:
+        loud = loudness(energy)
+    if loud <= 0:
+        return keep
+    voiced = energy > loud * 10 ** (SILENCE_DB / 20)
+    if not voiced.any():
+        return keep
+
+    # Pad speech by dilating the voiced frames
+    pad = int(PAD_SECONDS / audio_segments.FRAME_SECONDS)
+    if pad:
+        voiced = np.convolve(voiced.astype(np.int8), np.ones(2 * pad + 1, dtype=np.int8), mode="same") > 0
+
+    frames_keep = voiced.copy()
+    max_gap = int(MAX_SILENCE_SECONDS / audio_segments.FRAME_SECONDS)
+    half_keep = int(KEEP_SILENCE_SECONDS / audio_segments.FRAME_SECONDS) // 2
+    # Boundaries of silent runs: starts where voiced turns off, ends where it turns back on
+    edges = np.diff(np.concatenate(([1], voiced.astype(np.int8), [1])))
+    starts, ends = np.flatnonzero(edges == -1), np.flatnonzero(edges == 1)
+    for start, end in zip(starts, ends):
+        if start == 0 or end == len(voiced):
+            continue # leading / trailing silence is dropped entirely
+        if end - start > max_gap:
+            frames_keep[start:start + half_keep] = True
+            frames_keep[end - half_keep:end] = True
+        else:
+            frames_keep[start:end] = True
+
+    keep[:len(frames_keep) * frame] = np.repeat(frames_keep, frame)
+    # The partial frame at the end follows the last full frame
+    keep[len(frames_keep) * frame:] = frames_keep[-1]
+    return keep
+
+
+def preprocess(audio, loud: float = None):
+    """Mono, TARGET_RATE, silence-trimmed 16-bit copy of a PcmAudio.
+
+    Segments of one recording pass the recording's loudness as `loud`, so
+    silence is judged the same way in all of them.
+    """
+    mono = resample(downmix(audio.samples), audio.sample_rate)
+    mono = mono[speech_mask(mono, TARGET_RATE, loud)]
+    samples = np.clip(np.round(mono), -32768, 32767).astype(np.int16).reshape(-1, 1)
+    return audio_segments.PcmAudio(samples, TARGET_RATE)
+
+
+def record(original_bytes: int, sent_bytes: int, seconds_removed: float) -> dict:
+    """Count one preprocessed upload and report the bytes it took versus the WAV data actually sent."""
+    _stats["files"] += 1
+    _stats["original_bytes"] += original_bytes
+    _stats["processed_bytes"] += sent_bytes
+    _stats["seconds_removed"] += max(0.0, seconds_removed)
+    return {
+        "original_bytes": original_bytes,
+        "processed_bytes": sent_bytes,
+        "bytes_saved": original_bytes - sent_bytes,
+    }
+
+
+def stats():
+    saved = _stats["original_bytes"] - _stats["processed_bytes"]
+    return {
+        **_stats,
+        "seconds_removed": round(_stats["seconds_removed"], 1),
+        "bytes_saved": saved,
+        "saved_ratio": round(saved / _stats["original_bytes"], 4) if _stats["original_bytes"] else 0.0,
+    }
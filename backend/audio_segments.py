@@ -0,0 +1,184 @@
+import io
+import os
+import re
+import threading
+import wave
+
+import numpy as np
+
+# Recordings at least this long are split; shorter ones go out in one request
+SEGMENT_MIN_SECONDS = float(os.getenv("TRANSCRIBE_SEGMENT_MIN_SECONDS", "90"))
+SEGMENT_SECONDS = float(os.getenv("TRANSCRIBE_SEGMENT_SECONDS", "60"))
+# Each cut is moved to the quietest point within this many seconds of its target
+SILENCE_SEARCH_SECONDS = float(os.getenv("TRANSCRIBE_SILENCE_SEARCH_SECONDS", "5"))
+OVERLAP_SECONDS = float(os.getenv("TRANSCRIBE_OVERLAP_SECONDS", "1.5"))
+
+FRAME_SECONDS = 0.02
+# Energy is measured this many frames at a time, so a pass over a long file reads ~10 s blocks
+ENERGY_BLOCK_FRAMES = 500
+_WORD_RE = re.compile(r"\w+")
+
+
+class PcmAudio:
+    """16-bit PCM samples, shape (frames, channels), with their sample rate."""
+
+    def __init__(self, samples, sample_rate: int):
+        self.samples = samples
+        self.sample_rate = sample_rate
+
+    @property
+    def channels(self) -> int:
+        return self.samples.shape[1]
+
+    @property
+    def duration(self) -> float:
+        return len(self.samples) / self.sample_rate
+
+
+def is_wav(head: bytes) -> bool:
+    return head[:4] == b"RIFF" and head[8:12] == b"WAVE"
+
+
+class WavSource:
+    """A 16-bit PCM WAV file whose samples are read one frame range at a time.
+
+    Only the header is parsed up front; read() seeks to the range, so a
+    long recording is never held in memory as a whole. Reads are
+    serialized, as segments are read from several threads.
+    """
+
+    def __init__(self, file, wav, source_bytes: int):
+        self.file = file
+        self._wav = wav
+        self._lock = threading.Lock()
+        self.channels = wav.getnchannels()
+        self.sample_rate = wav.getframerate()
+        self.frames = wav.getnframes()
+        self.source_bytes = source_bytes # size of the file
+
+    @property
+    def duration(self) -> float:
+        return self.frames / self.sample_rate
+
+    def read(self, start: int, end: int):
+        """Samples of frames [start, end), shape (frames, channels)."""
+        with self._lock:
+            self._wav.setpos(start)
+            frames = self._wav.readframes(max(0, end - start))
+        return np.frombuffer(frames, dtype="<i2").reshape(-1, self.channels)
+
+    def close(self):
+        """Close the reader and the file; only for sources that own their file."""
+        with self._lock:
+            self._wav.close()
+            self.file.close()
+
+
+def open_wav(file):
+    """WavSource over a 16-bit PCM WAV file object, or None if it is anything else."""
+    position = file.tell()
+    head = file.read(12)
+    file.seek(position)
+    if not is_wav(head):
+        return None
+    try:
+        wav = wave.open(file, "rb")
+        source_bytes = file.seek(0, 2) - position
+    except (wave.Error, EOFError):
+        return None
+    finally:
+        file.seek(position)
+    if wav.getsampwidth() != 2:
+        return None
+    return WavSource(file, wav, source_bytes)
+
+
+def encode_wav(samples, sample_rate: int) -> bytes:
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(samples.shape[1])
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(np.ascontiguousarray(samples, dtype="<i2").tobytes())
+    return buffer.getvalue()
+
+
+def frame_energy(audio: PcmAudio):
+    """RMS energy of consecutive FRAME_SECONDS frames of the mono mix."""
+    frame = max(1, int(audio.sample_rate * FRAME_SECONDS))
+    mono = audio.samples.astype(np.float32).mean(axis=1)
+    usable = len(mono) // frame * frame
+    if not usable:
+        return np.zeros(0, dtype=np.float32), frame
+    frames = mono[:usable].reshape(-1, frame)
+    return np.sqrt((frames * frames).mean(axis=1)), frame
+
+
+def source_energy(source: WavSource):
+    """frame_energy() of a whole WavSource, read ENERGY_BLOCK_FRAMES frames at a time."""
+    frame = max(1, int(source.sample_rate * FRAME_SECONDS))
+    block = frame * ENERGY_BLOCK_FRAMES
+    parts = [np.zeros(0, dtype=np.float32)]
+    for start in range(0, source.frames // frame * frame, block):
+        end = min(start + block, source.frames // frame * frame)
+        parts.append(frame_energy(PcmAudio(source.read(start, end), source.sample_rate))[0])
+    return np.concatenate(parts), frame
+
+
+def plan_segments(total: int, rate: int, energy, frame: int, segment_seconds: float = SEGMENT_SECONDS,
+                  overlap_seconds: float = OVERLAP_SECONDS, search_seconds: float = SILENCE_SEARCH_SECONDS):
+    """Return (start, end) frame ranges covering `total` frames at `rate`.
+
+    `energy` holds the RMS energy of each `frame`-sized frame. Cuts land
+    on the quietest frame within search_seconds of every segment_seconds
+    mark, so words are rarely split; each segment also starts
+    overlap_seconds before the previous cut, and stitch() removes the
+    words heard twice.
+    """
+    if total <= (segment_seconds + search_seconds) * rate:
+        return [(0, total)]
+    overlap = int(overlap_seconds * rate)
+    ranges, start = [], 0
+    while True:
+        target = start + int(segment_seconds * rate)
+        if target + int(search_seconds * rate) >= total:
+            ranges.append((max(0, start - overlap) if ranges else 0, total))
+            return ranges
+        lo = max(start // frame + 1, (target - int(search_seconds * rate)) // frame)
+        hi = min(len(energy), (target + int(search_seconds * rate)) // frame)
+        cut = (lo + int(np.argmin(energy[lo:hi]))) * frame if hi > lo else target
+        ranges.append((max(0, start - overlap) if ranges else 0, cut))
+        start = cut
+
+
+def _words(text: str):
+    return [word.lower() for word in _WORD_RE.findall(text)]
+
+
+def stitch(texts, max_overlap_words: int = 30) -> str:
+    """Join consecutive segment transcripts, dropping words repeated across the overlap.
+
+    The longest run of words (up to max_overlap_words) that ends one
+    transcript and starts the next is kept only once.
+    """
+    result = ""
+    for text in texts:
+        text = (text or "").strip()
+        if not text:
+            continue
+        if not result:
+            result = text
+            continue
+        tail, head = _words(result)[-max_overlap_words:], _words(text)[:max_overlap_words]
+        repeated = 0
+        for size in range(min(len(tail), len(head)), 0, -1):
+            if tail[-size:] == head[:size]:
+                repeated = size
+                break
+        if repeated:
+            # Cut the original text after its `repeated`-th word, keeping punctuation that follows
+            matches = list(_WORD_RE.finditer(text))
+            text = text[matches[repeated - 1].end():].lstrip(" ,.;:!?")
+        if text:
+            result = f"{result} {text}"
+    return result
@@ -1,11 +1,18 @@
+import asyncio
+import multiprocessing
 import os
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import NamedTuple, Optional
 from jose import JWTError, jwt
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Response, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
-from database import get_db
+from sqlalchemy import event, inspect
+from database import SessionLocal
 import models
 import bcrypt
 
@@ -16,6 +23,19 @@ ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24 * 7 # 7 days
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/login")
 
+# bcrypt work factor for new hashes; existing hashes with another cost are
+# upgraded transparently on the next successful login.
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+# Hashing runs in its own process pool so a login burst can only take this
+# many cores, leaving the event loop and threadpool free for other traffic.
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(max(1, (os.cpu_count() or 2) // 2))))
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "256"))
+
+_hash_pool = None
+_hash_pool_lock = threading.Lock()
+_hash_slots = None
+_hash_pending = 0
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     try:
         return bcrypt.checkpw(
@@ -25,10 +45,57 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     except Exception:
         return False
 
-def get_password_hash(password: str) -> str:
-    hashed = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt())
+def get_password_hash(password: str, rounds: Optional[int] = None) -> str:
+    hashed = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds or BCRYPT_ROUNDS))
     return hashed.decode('utf-8')
 
+def password_needs_rehash(hashed_password: str) -> bool:
+    """True if the hash was made with a different bcrypt cost than BCRYPT_ROUNDS."""
+    parts = (hashed_password or "").split("$")
+    # bcrypt format: $2b$<cost>$<salt+hash>
+    return len(parts) < 4 or not parts[2].isdigit() or int(parts[2]) != BCRYPT_ROUNDS
+
+def _get_hash_pool():
+    global _hash_pool
+    if _hash_pool is None:
+        with _hash_pool_lock:
+            if _hash_pool is None:
+                # spawn: forking a process that already runs server threads is unsafe
+                _hash_pool = ProcessPoolExecutor(
+                    max_workers=PASSWORD_HASH_WORKERS,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+    return _hash_pool
+
+async def _run_in_hash_pool(fn, *args):
+    """Run a bcrypt call in the process pool, admitting callers first come, first served.
+
+    At most PASSWORD_HASH_WORKERS jobs are handed to the pool at a time;
+    beyond PASSWORD_HASH_MAX_PENDING waiting callers we answer 503 instead
+    of letting the queue grow without bound.
+    """
+    global _hash_slots, _hash_pending
+    if _hash_slots is None:
+        _hash_slots = asyncio.Semaphore(PASSWORD_HASH_WORKERS)
+    if _hash_pending >= PASSWORD_HASH_MAX_PENDING:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many sign-in requests right now. Please try again in a moment.",
+            headers={"Retry-After": "2"},
+        )
+    _hash_pending += 1
+    try:
+        async with _hash_slots:
+            return await asyncio.get_running_loop().run_in_executor(_get_hash_pool(), fn, *args)
+    finally:
+        _hash_pending -= 1
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await _run_in_hash_pool(verify_password, plain_password, hashed_password)
+
+async def get_password_hash_async(password: str) -> str:
+    return await _run_in_hash_pool(get_password_hash, password, BCRYPT_ROUNDS)
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     if expires_delta:
@@ -39,20 +106,118 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate credentials",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
+class Principal(NamedTuple):
+    """The authenticated user as seen by request handlers (no ORM session attached)."""
+    id: int
+    email: str
+    name: str
+
+# Decoded bearer tokens -> Principal, so the hot path skips both the JWT
+# signature check and the users query. Entries never outlive the token's exp.
+AUTH_CACHE_TTL_SECONDS = int(os.getenv("AUTH_CACHE_TTL_SECONDS", "300"))
+AUTH_CACHE_MAX_ENTRIES = int(os.getenv("AUTH_CACHE_MAX_ENTRIES", "10000"))
+
+_principal_cache = OrderedDict() # token -> (expires_at, Principal)
+_tokens_by_email = defaultdict(set)
+_principal_cache_lock = threading.Lock()
+_auth_stats = {"requests": 0, "cache_hits": 0, "db_lookups": 0, "invalidations": 0, "total_seconds": 0.0}
+
+def _cache_get(token: str) -> Optional[Principal]:
+    with _principal_cache_lock:
+        entry = _principal_cache.get(token)
+        if entry is None:
+            return None
+        expires_at, principal = entry
+        if time.time() >= expires_at:
+            _cache_drop(token)
+            return None
+        _principal_cache.move_to_end(token)
+        return principal
+
+def _cache_put(token: str, principal: Principal, token_exp: Optional[float]):
+    expires_at = time.time() + AUTH_CACHE_TTL_SECONDS
+    if token_exp is not None:
+        expires_at = min(expires_at, token_exp)
+    with _principal_cache_lock:
+        _principal_cache[token] = (expires_at, principal)
+        _tokens_by_email[principal.email].add(token)
+        while len(_principal_cache) > AUTH_CACHE_MAX_ENTRIES:
+            oldest = next(iter(_principal_cache))
+            _cache_drop(oldest)
+
+def _cache_drop(token: str):
+    # Caller holds _principal_cache_lock
+    _, principal = _principal_cache.pop(token)
+    tokens = _tokens_by_email.get(principal.email)
+    if tokens is not None:
+        tokens.discard(token)
+        if not tokens:
+            del _tokens_by_email[principal.email]
+
+def invalidate_user(email: str):
+    """Forget every cached token for this user (call after changing or deleting them)."""
+    with _principal_cache_lock:
+        for token in list(_tokens_by_email.get(email, ())):
+            _cache_drop(token)
+        _auth_stats["invalidations"] += 1
+
+@event.listens_for(models.User, "after_update")
+@event.listens_for(models.User, "after_delete")
+def _invalidate_on_user_change(mapper, connection, target):
+    emails = {target.email, *inspect(target).attrs.email.history.deleted}
+    for email in filter(None, emails):
+        invalidate_user(email)
+
+def _load_principal(email: str) -> Optional[Principal]:
+    # Use a short-lived session rather than the request-scoped one so the
+    # pooled connection is returned before a long-running LLM call starts.
+    db = SessionLocal()
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        email: str = payload.get("sub")
-        if email is None:
+        user = db.query(models.User).filter(models.User.email == email).first()
+        if user is None:
+            return None
+        return Principal(id=user.id, email=user.email, name=user.name)
+    finally:
+        db.close()
+
+def auth_stats():
+    with _principal_cache_lock:
+        cached_tokens = len(_principal_cache)
+    requests = _auth_stats["requests"]
+    return {
+        **_auth_stats,
+        "cached_tokens": cached_tokens,
+        "avg_microseconds": round(_auth_stats["total_seconds"] / requests * 1e6, 1) if requests else 0.0,
+    }
+
+async def get_current_user(response: Response, token: str = Depends(oauth2_scheme)):
+    started = time.perf_counter()
+    try:
+        principal = _cache_get(token)
+        if principal is not None:
+            _auth_stats["cache_hits"] += 1
+            return principal
+
+        credentials_exception = HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+        try:
+            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+            email: str = payload.get("sub")
+            if email is None:
+                raise credentials_exception
+        except JWTError:
+            raise credentials_exception
+        _auth_stats["db_lookups"] += 1
+        principal = await run_in_threadpool(_load_principal, email)
+        if principal is None:
             raise credentials_exception
-    except JWTError:
-        raise credentials_exception
-    user = db.query(models.User).filter(models.User.email == email).first()
-    if user is None:
-        raise credentials_exception
-    return user
+        _cache_put(token, principal, payload.get("exp"))
+        return principal
+    finally:
+        elapsed = time.perf_counter() - started
+        _auth_stats["requests"] += 1
+        _auth_stats["total_seconds"] += elapsed
+        response.headers["Server-Timing"] = f"auth;dur={elapsed * 1000:.3f}"
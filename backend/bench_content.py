@@ -0,0 +1,108 @@
+"""Micro-benchmark: database size and read cost of compressed content_data.
+
+Fills a scratch database with quiz JSON, flashcard JSON and Markdown
+summaries like the ones users save, then compares plain and compressed
+storage:
+
+    python bench_content.py --rows 2000
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+
+from sqlalchemy import create_engine, select, text
+from sqlalchemy.orm import sessionmaker
+
+import content_codec
+import database
+from models import SavedContent, User
+
+WORDS = (
+    "cell membrane protein energy photosynthesis chlorophyll glucose enzyme reaction "
+    "molecule nucleus mitochondria respiration oxygen carbon dioxide light stage cycle "
+    "equation variable function derivative integral limit vector matrix theorem proof"
+).split()
+
+
+def sentence(rng, words=14):
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize() + "."
+
+
+def sample_content(rng, kind):
+    if kind == "quiz":
+        return json.dumps([
+            {
+                "question": sentence(rng),
+                "options": [sentence(rng, 5) for _ in range(4)],
+                "answer": sentence(rng, 5),
+                "explanation": sentence(rng, 25),
+            }
+            for _ in range(10)
+        ])
+    if kind == "flashcards":
+        return json.dumps([{"front": sentence(rng, 8), "back": sentence(rng, 30)} for _ in range(15)])
+    sections = []
+    for n in range(6):
+        bullets = "\n".join(f"- **{rng.choice(WORDS)}**: {sentence(rng)}" for _ in range(6))
+        sections.append(f"## Section {n + 1}\n{sentence(rng, 30)}\n\n{bullets}")
+    return "\n\n".join(sections)
+
+
+def build(path, rows, compressed, seed=7):
+    engine = create_engine("sqlite:///" + path)
+    database.Base.metadata.create_all(bind=engine)
+    rng = random.Random(seed)
+    Session = sessionmaker(bind=engine)
+    with Session() as db:
+        db.add(User(name="bench", email="bench@example.com", hashed_password="x"))
+        for n in range(rows):
+            kind = ("quiz", "flashcards", "summary")[n % 3]
+            content = sample_content(rng, kind)
+            db.add(SavedContent(
+                user_id=1,
+                content_type=kind,
+                title=f"{kind} {n}",
+                content_raw=content_codec.encode(content) if compressed else content,
+            ))
+        db.commit()
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text("VACUUM"))
+    return engine
+
+
+def read_all(engine):
+    """Load every row and decode content_data, as a full listing would."""
+    Session = sessionmaker(bind=engine)
+    started = time.perf_counter()
+    decode_seconds = 0.0
+    with Session() as db:
+        for item in db.scalars(select(SavedContent)):
+            before = time.perf_counter()
+            item.content_data
+            decode_seconds += time.perf_counter() - before
+    return time.perf_counter() - started, decode_seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=2000)
+    args = parser.parse_args()
+
+    print(f"{'storage':<12}{'db size':>12}{'read all':>12}{'decode':>12}{'per row':>12}")
+    with tempfile.TemporaryDirectory() as scratch:
+        for name, compressed in (("plain", False), ("compressed", True)):
+            path = os.path.join(scratch, f"{name}.db")
+            engine = build(path, args.rows, compressed)
+            total, decode = read_all(engine)
+            engine.dispose()
+            print(
+                f"{name:<12}{os.path.getsize(path) / 1024:>10.0f}KB{total * 1000:>10.1f}ms"
+                f"{decode * 1000:>10.1f}ms{decode / args.rows * 1e6:>10.1f}us"
+            )
+
+
+if __name__ == "__main__":
+    main()
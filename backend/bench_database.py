@@ -0,0 +1,124 @@
+"""Micro-benchmark: SQLite write/read throughput with default vs tuned settings.
+
+Simulates concurrent /api/saved-content traffic (one commit per save, list
+queries per user) against a scratch database file for each configuration,
+first with readers only and then with writers and readers together:
+
+    python bench_database.py --writers 8 --readers 8 --seconds 5
+"""
+import argparse
+import os
+import tempfile
+import threading
+import time
+
+from sqlalchemy import create_engine
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+import database
+from models import SavedContent, User
+
+PAYLOAD = "Photosynthesis converts light energy into chemical energy. " * 40
+
+
+def baseline_engine(url):
+    # What database.py used before tuning: default journal, pragmas and timeout
+    return create_engine(url, connect_args={"check_same_thread": False})
+
+
+def tuned_engine(url):
+    return database.make_engine(url)
+
+
+def seed(Session, users, rows):
+    with Session() as db:
+        db.add_all([User(name=f"user{i}", email=f"user{i}@example.com", hashed_password="x") for i in range(users)])
+        db.add_all([
+            SavedContent(user_id=n % users + 1, content_type="notes", title=f"seed {n}", content_data=PAYLOAD)
+            for n in range(rows)
+        ])
+        db.commit()
+
+
+def run_phase(Session, writers, readers, seconds, users):
+    counts = {"writes": 0, "reads": 0, "locked": 0}
+    lock = threading.Lock()
+    deadline = time.monotonic() + seconds
+
+    def write_loop(worker):
+        n = 0
+        while time.monotonic() < deadline:
+            db = Session()
+            try:
+                db.add(SavedContent(user_id=worker % users + 1, content_type="notes", title=f"note {n}", content_data=PAYLOAD))
+                db.commit()
+                key = "writes"
+            except OperationalError:
+                db.rollback()
+                key = "locked"
+            finally:
+                db.close()
+            with lock:
+                counts[key] += 1
+            n += 1
+
+    def read_loop(worker):
+        while time.monotonic() < deadline:
+            db = Session()
+            try:
+                (
+                    db.query(SavedContent)
+                    .filter(SavedContent.user_id == worker % users + 1)
+                    .order_by(SavedContent.created_at.desc())
+                    .limit(20)
+                    .all()
+                )
+                key = "reads"
+            except OperationalError:
+                key = "locked"
+            finally:
+                db.close()
+            with lock:
+                counts[key] += 1
+
+    threads = [threading.Thread(target=write_loop, args=(i,)) for i in range(writers)]
+    threads += [threading.Thread(target=read_loop, args=(i,)) for i in range(readers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return {key: value / seconds if key != "locked" else value for key, value in counts.items()}
+
+
+def run(engine, args):
+    """Read-only phase on the seeded rows, then writers and readers together."""
+    database.Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine, autoflush=False)
+    seed(Session, args.users, args.rows)
+    read_only = run_phase(Session, 0, args.readers, args.seconds, args.users)
+    mixed = run_phase(Session, args.writers, args.readers, args.seconds, args.users)
+    engine.dispose()
+    return read_only, mixed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--writers", type=int, default=8)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--rows", type=int, default=2000, help="rows seeded before measuring")
+    args = parser.parse_args()
+
+    print(f"{'config':<10}{'phase':<11}{'writes/s':>10}{'reads/s':>10}{'locked errors':>15}")
+    for name, factory in (("baseline", baseline_engine), ("tuned", tuned_engine)):
+        with tempfile.TemporaryDirectory() as scratch:
+            url = "sqlite:///" + os.path.join(scratch, "bench.db")
+            phases = run(factory(url), args)
+        for phase, result in zip(("read-only", "mixed"), phases):
+            print(f"{name:<10}{phase:<11}{result['writes']:>10.1f}{result['reads']:>10.1f}{result['locked']:>15d}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""Micro-benchmark: hit rate and lookup latency of the semantic chat cache.
+
+Fills one level of the cache with synthetic study questions, then looks
+up rewordings of stored questions and questions about topics never stored
+(which should miss). Rewordings come in two groups: ones that only change
+filler words the stopword list drops, and paraphrases that add words it
+keeps, which show how much extra wording the threshold tolerates:
+
+    python bench_semantic_cache.py --entries 100000 --queries 2000
+"""
+import argparse
+import random
+import time
+
+import numpy as np
+
+import semantic_cache
+
+SYLLABLES = "ba be bi bo cal cy di do en fer gen ic io ka la lo ma mi nu o pho ra ri sis syn ta te the tro u ve xi zo".split()
+ASK = ["what is {}", "explain {}", "how does {} work", "define {}", "tell me about {}"]
+REWORD = ["{} explanation please", "can you explain {} simply", "what's {}", "{} overview", "help me understand {}"]
+# Each adds at least one word that semantic_cache.STOPWORDS keeps
+PARAPHRASE = [
+    "could you break down {} for my exam",
+    "revision notes on {}",
+    "I'm confused by {}",
+    "{} in plain english",
+    "summarize {}",
+    "struggling with {} homework",
+]
+
+
+def word(rng):
+    return "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4)))
+
+
+def topics(rng, count, vocabulary):
+    seen = set()
+    while len(seen) < count:
+        seen.add(" ".join(rng.choice(vocabulary) for _ in range(rng.randint(1, 3))))
+    return list(seen)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entries", type=int, default=100000)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--threshold", type=float, default=semantic_cache.THRESHOLD)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    vocabulary = list({word(rng) for _ in range(20000)})
+    all_topics = topics(rng, args.entries + args.queries, vocabulary)
+    stored, unseen = all_topics[:args.entries], all_topics[args.entries:]
+
+    cache = semantic_cache.SemanticCache(threshold=args.threshold, max_entries=args.entries)
+    started = time.perf_counter()
+    for topic in stored:
+        cache.store(rng.choice(ASK).format(topic), "Beginner", topic)
+    fill_seconds = time.perf_counter() - started
+
+    def run(queries):
+        latencies, answers = [], []
+        for topic, question in queries:
+            before = time.perf_counter()
+            answers.append(cache.lookup(question, "Beginner"))
+            latencies.append(time.perf_counter() - before)
+        return np.array(latencies) * 1000, answers
+
+    def rewordings(templates):
+        repeats = [(topic, rng.choice(templates).format(topic)) for topic in rng.sample(stored, args.queries)]
+        latencies, answers = run(repeats)
+        correct = sum(answer == topic for (topic, _), answer in zip(repeats, answers))
+        wrong = sum(answer is not None and answer != topic for (topic, _), answer in zip(repeats, answers))
+        return latencies, f"{correct / len(repeats):.1%} correct, {wrong / len(repeats):.1%} wrong answer"
+
+    reword_latencies, reword_hits = rewordings(REWORD)
+    latencies, paraphrase_hits = rewordings(PARAPHRASE)
+    novel_latencies, novel_answers = run([(topic, rng.choice(ASK).format(topic)) for topic in unseen])
+    false_hits = sum(answer is not None for answer in novel_answers)
+
+    partition = cache._partitions["Beginner"]
+    vector_mb = (partition.vectors.nbytes + partition.squares.nbytes) / 1024 / 1024
+    print(f"entries            {partition.size:,} ({vector_mb:.0f} MB of vectors)")
+    print(f"fill               {fill_seconds:.1f} s ({fill_seconds / args.entries * 1e6:.0f} us per store)")
+    print(f"threshold          {args.threshold}")
+    print(f"filler-only hits   {reword_hits}")
+    print(f"paraphrase hits    {paraphrase_hits}")
+    print(f"unseen topic hits  {false_hits / len(unseen):.1%} (false positives)")
+    all_latencies = np.concatenate([reword_latencies, latencies, novel_latencies])
+    print(
+        f"lookup latency     p50 {np.percentile(all_latencies, 50):.2f} ms, "
+        f"p99 {np.percentile(all_latencies, 99):.2f} ms"
+    )
+
+
+if __name__ == "__main__":
+    main()
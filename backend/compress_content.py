@@ -0,0 +1,83 @@
+"""Compress existing saved_contents rows in place, one batch per transaction.
+
+Rows written before compression existed are plain text; they stay readable
+without this, it only reclaims space. It also rewrites rows in the legacy
+binary layout as text, which a database must have before it is moved off
+SQLite. Run from the backend directory:
+
+    python compress_content.py --batch-size 500 --vacuum
+    python compress_content.py --decompress  # undo
+"""
+import argparse
+
+from sqlalchemy import bindparam, select, text, update
+
+import content_codec
+from database import engine
+from models import SavedContent
+
+table = SavedContent.__table__
+
+
+def stored_size(value) -> int:
+    if value is None:
+        return 0
+    return len(value.encode("utf-8")) if isinstance(value, str) else len(value)
+
+
+def migrate(batch_size: int, decompress: bool = False):
+    totals = {"rows": 0, "changed": 0, "bytes_before": 0, "bytes_after": 0}
+    last_id = 0
+    while True:
+        with engine.begin() as conn:
+            rows = conn.execute(
+                select(table.c.id, table.c.content_data)
+                .where(table.c.id > last_id)
+                .order_by(table.c.id)
+                .limit(batch_size)
+            ).all()
+            if not rows:
+                return totals
+            last_id = rows[-1].id
+            changes = []
+            for row in rows:
+                if decompress:
+                    new_value = content_codec.decode(row.content_data)
+                else:
+                    new_value = content_codec.encode(content_codec.decode(row.content_data))
+                totals["rows"] += 1
+                totals["bytes_before"] += stored_size(row.content_data)
+                totals["bytes_after"] += stored_size(new_value)
+                if new_value != row.content_data:
+                    changes.append({"row_id": row.id, "value": new_value})
+            if changes:
+                conn.execute(
+                    update(table).where(table.c.id == bindparam("row_id")).values(content_data=bindparam("value")),
+                    changes,
+                )
+                totals["changed"] += len(changes)
+        print(f"... up to id {last_id}: {totals['changed']} of {totals['rows']} rows rewritten")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--decompress", action="store_true", help="store every row as plain text again")
+    parser.add_argument("--vacuum", action="store_true", help="run VACUUM afterwards to shrink the file")
+    args = parser.parse_args()
+
+    if not args.decompress and not content_codec.COMPRESSION_ENABLED:
+        parser.error("CONTENT_COMPRESSION is disabled")
+    totals = migrate(args.batch_size, args.decompress)
+    print(
+        f"{totals['changed']} of {totals['rows']} rows rewritten; content bytes "
+        f"{totals['bytes_before']:,} -> {totals['bytes_after']:,}"
+    )
+    if args.vacuum:
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            conn.execute(text("VACUUM"))
+        print("VACUUM done")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+import base64
+import os
+import zlib
+
+COMPRESSION_ENABLED = os.getenv("CONTENT_COMPRESSION", "1") == "1"
+# Shorter values are stored as plain text; zlib barely helps below this
+MIN_COMPRESS_BYTES = int(os.getenv("CONTENT_COMPRESSION_MIN_BYTES", "256"))
+COMPRESSION_LEVEL = int(os.getenv("CONTENT_COMPRESSION_LEVEL", "6"))
+
+# Stored layout: PREFIX + version digit + base64 of the zlib-compressed UTF-8
+# payload. It stays valid TEXT on every backend (Postgres rejects NUL and
+# raw bytes in VARCHAR). A plain value that happens to start with PREFIX is
+# always stored encoded, so the two never get mixed up.
+PREFIX = "\x1fSB"
+VERSION_ZLIB = 1
+# Rows written by the first version of this module: MAGIC + version byte +
+# raw zlib bytes, which only SQLite would store. Still decoded; running
+# compress_content.py rewrites them in the text layout.
+LEGACY_MAGIC = b"\x00SB"
+
+
+def is_encoded(stored) -> bool:
+    if isinstance(stored, str):
+        return stored.startswith(PREFIX)
+    return isinstance(stored, (bytes, bytearray, memoryview)) and bytes(stored[:3]) == LEGACY_MAGIC
+
+
+def _pack(raw: bytes) -> str:
+    payload = base64.b64encode(zlib.compress(raw, COMPRESSION_LEVEL)).decode("ascii")
+    return f"{PREFIX}{VERSION_ZLIB}{payload}"
+
+
+def encode(text):
+    """Return the value to store for `text`: the compressed text form, or the text itself."""
+    if text is None:
+        return text
+    if text.startswith(PREFIX):
+        return _pack(text.encode("utf-8"))
+    if not COMPRESSION_ENABLED:
+        return text
+    raw = text.encode("utf-8")
+    if len(raw) < MIN_COMPRESS_BYTES:
+        return text
+    packed = _pack(raw)
+    return packed if len(packed) < len(raw) else text
+
+
+def _unpack(version: int, payload: bytes) -> str:
+    if version == VERSION_ZLIB:
+        return zlib.decompress(payload).decode("utf-8")
+    raise ValueError(f"Unknown content encoding version {version}")
+
+
+def decode(stored):
+    """Inverse of encode; also accepts plain rows and the legacy binary layout."""
+    if stored is None:
+        return stored
+    if isinstance(stored, str):
+        if not stored.startswith(PREFIX):
+            return stored
+        return _unpack(int(stored[len(PREFIX)]), base64.b64decode(stored[len(PREFIX) + 1:]))
+    stored = bytes(stored)
+    if not is_encoded(stored):
+        return stored.decode("utf-8")
+    return _unpack(stored[3], stored[4:])
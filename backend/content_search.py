@@ -0,0 +1,172 @@
+import json
+import re
+
+from sqlalchemy import DateTime, Float, Integer, String, event, text
+
+import content_codec
+from database import SQLALCHEMY_DATABASE_URL, engine, is_sqlite
+from models import SavedContent
+
+# FTS5 is SQLite-only; on other databases the search endpoint is disabled
+SEARCH_ENABLED = is_sqlite(SQLALCHEMY_DATABASE_URL)
+FTS_TABLE = "saved_contents_fts"
+# Column weights for bm25: owner, kind, title, body. Stored as the table's
+# rank function so ORDER BY rank can use FTS5's sorted-result fast path.
+_RANK = "bm25(0.0, 0.0, 10.0, 1.0)"
+_BODY_COLUMN = 3
+HIGHLIGHT_START = "<mark>"
+HIGHLIGHT_END = "</mark>"
+
+# One row per saved item, rowid = saved_contents.id. owner ("u<user id>")
+# and kind (content_type) are matched as terms, so per-user searches are
+# an intersection of doclists instead of a scan over everyone's matches.
+_CREATE_SQL = (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+    "owner, kind, title, body, "
+    "tokenize = 'porter unicode61 remove_diacritics 2', prefix = '2 3')"
+)
+
+
+def _collect_strings(value, out):
+    if isinstance(value, str):
+        out.append(value)
+    elif isinstance(value, dict):
+        for item in value.values():
+            _collect_strings(item, out)
+    elif isinstance(value, list):
+        for item in value:
+            _collect_strings(item, out)
+
+
+def extract_text(content: str) -> str:
+    """Searchable text of a saved item: the string values of JSON content, or the Markdown text."""
+    if not content:
+        return ""
+    stripped = content.lstrip()
+    if stripped[:1] in ("{", "["):
+        try:
+            parts = []
+            _collect_strings(json.loads(stripped), parts)
+            return "\n".join(parts)
+        except ValueError:
+            pass
+    # Keep link text, drop URLs; the tokenizer ignores the remaining Markdown punctuation
+    return re.sub(r"\]\([^)]*\)", "]", content)
+
+
+def index_entry(item_id, user_id, content_type, title, content):
+    return {
+        "id": item_id,
+        "owner": f"u{user_id}",
+        "kind": content_type or "",
+        "title": title or "",
+        "body": extract_text(content),
+    }
+
+
+def index_entries(connection, entries):
+    """Add or replace index entries built with index_entry, in the caller's transaction."""
+    if not entries:
+        return
+    connection.execute(text(f"DELETE FROM {FTS_TABLE} WHERE rowid = :id"), [{"id": entry["id"]} for entry in entries])
+    connection.execute(
+        text(f"INSERT INTO {FTS_TABLE} (rowid, owner, kind, title, body) VALUES (:id, :owner, :kind, :title, :body)"),
+        entries,
+    )
+
+
+@event.listens_for(SavedContent, "after_insert")
+@event.listens_for(SavedContent, "after_update")
+def _index_item(mapper, connection, target):
+    if not SEARCH_ENABLED:
+        return
+    index_entries(connection, [
+        index_entry(target.id, target.user_id, target.content_type, target.title, target.content_data)
+    ])
+
+
+@event.listens_for(SavedContent, "after_delete")
+def _unindex_item(mapper, connection, target):
+    if not SEARCH_ENABLED:
+        return
+    connection.execute(text(f"DELETE FROM {FTS_TABLE} WHERE rowid = :id"), {"id": target.id})
+
+
+def rebuild_index(batch_size: int = 500):
+    """Re-index every saved item, in id order, one batch per transaction."""
+    table = SavedContent.__table__
+    with engine.begin() as conn:
+        conn.execute(text(f"DELETE FROM {FTS_TABLE}"))
+    last_id = 0
+    while True:
+        with engine.begin() as conn:
+            rows = conn.execute(
+                table.select().where(table.c.id > last_id).order_by(table.c.id).limit(batch_size)
+            ).mappings().all()
+            if not rows:
+                break
+            last_id = rows[-1]["id"]
+            index_entries(conn, [
+                index_entry(
+                    row["id"], row["user_id"], row["content_type"], row["title"],
+                    content_codec.decode(row["content_data"]),
+                )
+                for row in rows
+            ])
+    with engine.begin() as conn:
+        conn.execute(text(f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('optimize')"))
+
+
+def init_index():
+    """Create the FTS table, indexing existing rows the first time."""
+    if not SEARCH_ENABLED:
+        return
+    with engine.begin() as conn:
+        exists = conn.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"), {"name": FTS_TABLE}
+        ).first()
+        if not exists:
+            conn.execute(text(_CREATE_SQL))
+            conn.execute(text(f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rank) VALUES ('rank', :rank)"), {"rank": _RANK})
+    if not exists:
+        rebuild_index()
+
+
+def build_match_query(q: str, user_id: int, content_type: str = None):
+    """Turn free text into a safe FTS5 query scoped to one user.
+
+    Every word must match; the last one also matches as a prefix so results
+    show up while the user is still typing.
+    """
+    terms = re.findall(r"\w+", q or "")
+    if not terms:
+        return None
+    quoted = [f'"{term}"' for term in terms]
+    quoted[-1] += "*"
+    scope = [f'owner : "u{user_id}"']
+    if content_type:
+        scope.append('kind : "' + content_type.replace('"', '""') + '"')
+    return " AND ".join(scope) + " AND {title body} : (" + " ".join(quoted) + ")"
+
+
+SEARCH_SQL = text(
+    f"""
+    SELECT s.id, s.content_type, s.title, s.created_at, hits.snippet, hits.score
+    FROM (
+        SELECT rowid AS id,
+               snippet({FTS_TABLE}, {_BODY_COLUMN}, '{HIGHLIGHT_START}', '{HIGHLIGHT_END}', '…', 24) AS snippet,
+               rank AS score
+        FROM {FTS_TABLE}
+        WHERE {FTS_TABLE} MATCH :query
+        ORDER BY rank
+        LIMIT :limit OFFSET :offset
+    ) AS hits
+    JOIN saved_contents AS s ON s.id = hits.id AND s.user_id = :user_id
+    ORDER BY hits.score
+    """
+).columns(id=Integer, content_type=String, title=String, created_at=DateTime, snippet=String, score=Float)
+
+
+if __name__ == "__main__":
+    rebuild_index()
+    print(f"Rebuilt {FTS_TABLE}")
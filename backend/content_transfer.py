@@ -0,0 +1,155 @@
+import json
+import os
+import time
+from datetime import datetime
+
+from sqlalchemy import insert, select
+
+import content_codec
+import content_search
+import review_queue
+from database import get_async_engine
+from models import SavedContent
+
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "500"))
+IMPORT_MAX_BATCH_SIZE = int(os.getenv("IMPORT_MAX_BATCH_SIZE", "5000"))
+# One NDJSON line is one item; anything longer is rejected instead of buffered
+IMPORT_MAX_LINE_BYTES = int(os.getenv("IMPORT_MAX_LINE_BYTES", str(8 * 1024 * 1024)))
+EXPORT_FETCH_SIZE = int(os.getenv("EXPORT_FETCH_SIZE", "500"))
+
+table = SavedContent.__table__
+
+
+class ImportFailed(ValueError):
+    """A line of the upload could not be imported."""
+
+    def __init__(self, line_no: int, message: str, imported: int):
+        super().__init__(f"Line {line_no}: {message}")
+        self.line_no = line_no
+        self.imported = imported # rows committed before the bad line
+
+
+async def export_lines(user_id: int):
+    """Yield the user's saved items as NDJSON lines, oldest first.
+
+    Rows come from a server-side cursor EXPORT_FETCH_SIZE at a time, so
+    memory stays flat however many items the user has. The connection is
+    opened here rather than taken from the request's session because the
+    response body is produced after the endpoint has returned.
+    """
+    query = (
+        select(table.c.content_type, table.c.title, table.c.content_data, table.c.created_at)
+        .where(table.c.user_id == user_id)
+        .order_by(table.c.created_at, table.c.id)
+        .execution_options(yield_per=EXPORT_FETCH_SIZE)
+    )
+    async with get_async_engine().connect() as conn:
+        result = await conn.stream(query)
+        async for row in result:
+            yield json.dumps({
+                "content_type": row.content_type,
+                "title": row.title,
+                "content_data": content_codec.decode(row.content_data),
+                "created_at": row.created_at.isoformat() if row.created_at else None,
+            }) + "\n"
+
+
+async def iter_lines(chunks):
+    """Split a stream of byte chunks into lines without buffering the whole body.
+
+    Only each new chunk is searched for newlines; the pieces of an
+    unfinished line are joined once, when it ends.
+    """
+    pending, pending_bytes = [], 0 # pieces of the current line
+    async for chunk in chunks:
+        start = 0
+        while (end := chunk.find(b"\n", start)) >= 0:
+            pending.append(chunk[start:end])
+            yield b"".join(pending)
+            pending, pending_bytes = [], 0
+            start = end + 1
+        if start < len(chunk):
+            pending.append(chunk[start:])
+            pending_bytes += len(chunk) - start
+            if pending_bytes > IMPORT_MAX_LINE_BYTES:
+                raise ValueError(f"Line longer than {IMPORT_MAX_LINE_BYTES} bytes")
+    if pending:
+        yield b"".join(pending)
+
+
+def parse_item(line: bytes, user_id: int) -> dict:
+    item = json.loads(line)
+    if not isinstance(item, dict):
+        raise ValueError("expected a JSON object")
+    row = {"user_id": user_id}
+    for field in ("content_type", "title", "content_data"):
+        if not isinstance(item.get(field), str):
+            raise ValueError(f"'{field}' must be a string")
+        row[field] = item[field]
+    created_at = item.get("created_at")
+    if created_at is not None and not isinstance(created_at, str):
+        raise ValueError("'created_at' must be an ISO 8601 string")
+    row["created_at"] = datetime.fromisoformat(created_at) if created_at else datetime.utcnow()
+    return row
+
+
+async def _insert_batch(rows):
+    stored = [{**row, "content_data": content_codec.encode(row["content_data"])} for row in rows]
+    async with get_async_engine().begin() as conn:
+        result = await conn.execute(insert(table).returning(table.c.id, sort_by_parameter_order=True), stored)
+        ids = result.scalars().all()
+        if content_search.SEARCH_ENABLED:
+            entries = [
+                content_search.index_entry(
+                    item_id, row["user_id"], row["content_type"], row["title"], row["content_data"]
+                )
+                for item_id, row in zip(ids, rows)
+            ]
+            await conn.run_sync(content_search.index_entries, entries)
+        for item_id, row in zip(ids, rows):
+            if row["content_type"] == review_queue.FLASHCARD_CONTENT_TYPE:
+                await review_queue.add_cards(
+                    conn, row["user_id"], review_queue.cards_from_content(row["content_data"]), item_id
+                )
+
+
+async def import_lines(chunks, user_id: int, batch_size: int = IMPORT_BATCH_SIZE) -> dict:
+    """Insert the NDJSON items in `chunks` for `user_id`, one transaction per batch.
+
+    Blank lines are skipped. A bad line stops the import with ImportFailed;
+    batches committed before it stay imported.
+    """
+    started = time.perf_counter()
+    imported = batches = line_no = 0
+    batch = []
+    lines = iter_lines(chunks)
+    while True:
+        try:
+            line = await lines.__anext__()
+        except StopAsyncIteration:
+            break
+        except ValueError as e:
+            raise ImportFailed(line_no + 1, str(e), imported)
+        line_no += 1
+        if not line.strip():
+            continue
+        try:
+            batch.append(parse_item(line, user_id))
+        except ValueError as e:
+            raise ImportFailed(line_no, str(e), imported)
+        if len(batch) >= batch_size:
+            await _insert_batch(batch)
+            imported += len(batch)
+            batches += 1
+            batch = []
+    if batch:
+        await _insert_batch(batch)
+        imported += len(batch)
+        batches += 1
+    seconds = time.perf_counter() - started
+    return {
+        "imported": imported,
+        "batches": batches,
+        "seconds": round(seconds, 3),
+        "rows_per_second": round(imported / seconds, 1) if seconds > 0 else None,
+    }
@@ -1,18 +1,142 @@
-from sqlalchemy import create_engine
+import os
+
+from sqlalchemy import create_engine, event, inspect, text
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
 
-SQLALCHEMY_DATABASE_URL = "sqlite:///./studybuddy.db"
+SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./studybuddy.db")
+# Async driver URL; derived from DATABASE_URL when not set (sqlite -> sqlite+aiosqlite)
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL", "")
+
+SQLITE_TUNING = os.getenv("SQLITE_TUNING", "1") == "1"
+# How long a writer waits for the lock before failing with "database is locked"
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "10000"))
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+SQLITE_CACHE_SIZE_KB = int(os.getenv("SQLITE_CACHE_SIZE_KB", str(64 * 1024)))
+
+
+def is_sqlite(url: str) -> bool:
+    return url.startswith("sqlite")
+
+
+def _sqlite_pragmas(dbapi_connection, connection_record):
+    """Per-connection SQLite settings.
+
+    WAL lets readers run alongside the single writer instead of blocking on
+    the rollback journal, and synchronous=NORMAL is durable under WAL except
+    for the last transactions before a power loss. busy_timeout makes a
+    writer wait for the lock rather than fail immediately.
+    """
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+    if SQLITE_TUNING:
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+        cursor.execute(f"PRAGMA cache_size=-{SQLITE_CACHE_SIZE_KB}")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.close()
 
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
-)
+
+def make_engine(url: str = SQLALCHEMY_DATABASE_URL):
+    if not is_sqlite(url):
+        return create_engine(url, pool_pre_ping=True)
+    new_engine = create_engine(
+        url,
+        connect_args={"check_same_thread": False, "timeout": SQLITE_BUSY_TIMEOUT_MS / 1000},
+    )
+    event.listen(new_engine, "connect", _sqlite_pragmas)
+    return new_engine
+
+
+engine = make_engine()
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
 
+# Indexes that later ones replaced. create_all never drops anything, so
+# without this older databases would keep maintaining them on every write.
+OBSOLETE_INDEXES = [
+    "ix_saved_contents_user_created", # now ix_saved_contents_user_listing
+    "ix_saved_contents_user_type_created", # now ix_saved_contents_user_type_listing
+    "ix_review_cards_user_due", # now ix_review_cards_user_due_lease
+]
+# Nullable columns added to existing tables, as (table, column); create_all only creates new tables
+ADDED_COLUMNS = [
+    ("review_cards", "leased_until"),
+]
+
+def add_missing_columns():
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table_name, column_name in ADDED_COLUMNS:
+            table = Base.metadata.tables.get(table_name)
+            if table is None or column_name in {column["name"] for column in inspector.get_columns(table_name)}:
+                continue
+            column = table.c[column_name]
+            column_type = column.type.compile(dialect=engine.dialect)
+            conn.execute(text(f"ALTER TABLE {table_name} ADD COLUMN {column_name} {column_type}"))
+
+def init_db():
+    """Create missing tables, columns and indexes, and drop the obsolete indexes."""
+    Base.metadata.create_all(bind=engine)
+    add_missing_columns()
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+    with engine.begin() as conn:
+        for name in OBSOLETE_INDEXES:
+            conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+
+def async_url(url: str = SQLALCHEMY_DATABASE_URL) -> str:
+    if ASYNC_DATABASE_URL:
+        return ASYNC_DATABASE_URL
+    for sync_prefix, async_prefix in (
+        ("sqlite:", "sqlite+aiosqlite:"),
+        ("postgresql:", "postgresql+asyncpg:"),
+        ("postgresql+psycopg2:", "postgresql+asyncpg:"),
+    ):
+        if url.startswith(sync_prefix):
+            return async_prefix + url[len(sync_prefix):]
+    return url
+
+
+_async_engine = None
+_async_sessionmaker = None
+
+
+def make_async_engine(url: str = None):
+    url = url or async_url()
+    if not is_sqlite(url):
+        return create_async_engine(url, pool_pre_ping=True)
+    new_engine = create_async_engine(url, connect_args={"timeout": SQLITE_BUSY_TIMEOUT_MS / 1000})
+    event.listen(new_engine.sync_engine, "connect", _sqlite_pragmas)
+    return new_engine
+
+
+def get_async_engine():
+    """The shared async engine, created on first use.
+
+    Creating it is what loads the async driver (aiosqlite, asyncpg), so
+    scripts that only use the sync engine run without those installed.
+    """
+    global _async_engine, _async_sessionmaker
+    if _async_engine is None:
+        _async_engine = make_async_engine()
+        _async_sessionmaker = async_sessionmaker(_async_engine, autoflush=False, expire_on_commit=False)
+    return _async_engine
+
+
+async def get_async_db():
+    """Dependency for async endpoints: an AsyncSession on the async driver."""
+    get_async_engine()
+    async with _async_sessionmaker() as db:
+        yield db
@@ -1,37 +1,11 @@
-import json
-import os
-import re
+import item_generation
+import llm_scheduler
 
-from google import genai
-from dotenv import load_dotenv
 
-# Load keys from .env if present
-load_dotenv()
+def build_flashcards_prompt(source: str, topic_clean: str):
+    basis = item_generation.describe_input(source, topic_clean)
 
-def get_api_key(name):
-    """Retrieve API key from environment or streamlit secrets."""
-    return os.getenv(name) 
-
-client = genai.Client(api_key=get_api_key("GEMINI_API_KEY"))
-
-STUDY_ONLY_MESSAGE = "This is for study purposes only."
-
-def generate_flashcards(text: str = "", topic: str = ""):
-    source = (text or "").strip()
-    topic_clean = (topic or "").strip()
-
-    if not source and not topic_clean:
-        return {"error": "Please provide either study text or a study topic to generate flashcards."}
-
-    basis = (
-        f"Topic: {topic_clean}"
-        if topic_clean and not source
-        else f"Text:\n{source}"
-        if source and not topic_clean
-        else f"Topic: {topic_clean}\n\nText:\n{source}"
-    )
-
-    prompt = f"""You are a flashcard generator for study material only. If the given input is NOT educational or study-related, respond with exactly this JSON and nothing else (no markdown, no code block):
+    return f"""You are a flashcard generator for study material only. If the given input is NOT educational or study-related, respond with exactly this JSON and nothing else (no markdown, no code block):
 {{"study_only": true, "message": "This is for study purposes only."}}
 
 Otherwise, generate exactly 10 flashcards based on the material. Each flashcard should have a 'front' (a concept, term, or question) and a 'back' (the definition, explanation, or answer). Keep the text concise and easy to read quickly.
@@ -45,27 +19,25 @@ Input:
 {basis}
 """
 
-    response = client.models.generate_content(
-        model="gemini-2.5-flash",
-        contents=prompt,
-    )
-    raw = (response.text or "").strip()
 
-    # Strip markdown code block if present
-    if raw.startswith("```"):
-        raw = re.sub(r"^```(?:json)?\s*", "", raw)
-        raw = re.sub(r"\s*```\s*$", "", raw)
+def is_valid_flashcard(item: dict) -> bool:
+    return all(isinstance(item.get(side), str) and item[side].strip() for side in ("front", "back"))
+
+
+FLASHCARDS = item_generation.ItemKind(
+    key="flashcards",
+    item="flashcard",
+    build_prompt=build_flashcards_prompt,
+    is_valid=is_valid_flashcard,
+    missing_input="Please provide either study text or a study topic to generate flashcards.",
+    none_generated="No flashcards were generated.",
+)
 
-    try:
-        data = json.loads(raw)
-    except json.JSONDecodeError:
-        return {"error": raw or "Invalid response from model."}
 
-    if data.get("study_only"):
-        return {"study_only": True, "message": data.get("message", STUDY_ONLY_MESSAGE)}
+async def generate_flashcards(text: str = "", topic: str = "", use_cache: bool = True, priority: int = llm_scheduler.STANDARD):
+    return await item_generation.generate(FLASHCARDS, text, topic, use_cache, priority)
 
-    flashcards = data.get("flashcards") or []
-    if not flashcards:
-        return {"error": "No flashcards were generated."}
 
-    return {"flashcards": flashcards}
+def stream_flashcards(text: str = "", topic: str = "", use_cache: bool = True):
+    """Async generator of flashcard events; see item_generation.stream."""
+    return item_generation.stream(FLASHCARDS, text, topic, use_cache)
@@ -0,0 +1,116 @@
+import json_stream
+import llm_cache
+import llm_gateway
+import llm_scheduler
+
+STUDY_ONLY_MESSAGE = "This is for study purposes only."
+
+
+class ItemKind:
+    """A generated list of study items (quiz questions, flashcards).
+
+    The model is asked, through `build_prompt(source, topic)`, for
+    {"<key>": [...]} or a study_only refusal; `is_valid(item)` drops
+    elements of the wrong shape. `item` names one element in stream
+    events, and the messages are returned as errors.
+    """
+
+    def __init__(self, key: str, item: str, build_prompt, is_valid, missing_input: str, none_generated: str):
+        self.key = key
+        self.item = item
+        self.build_prompt = build_prompt
+        self.is_valid = is_valid
+        self.missing_input = missing_input
+        self.none_generated = none_generated
+
+
+def describe_input(source: str, topic: str) -> str:
+    """The "Input:" section of an item prompt: the topic, the text, or both."""
+    if topic and not source:
+        return f"Topic: {topic}"
+    if source and not topic:
+        return f"Text:\n{source}"
+    return f"Topic: {topic}\n\nText:\n{source}"
+
+
+def _inputs(text, topic):
+    return (text or "").strip(), (topic or "").strip()
+
+
+def with_variant(prompt: str, variant: int) -> str:
+    """Ask for one of several distinct sets for the same input."""
+    return (
+        f"{prompt}\nThis is variant #{variant} of several sets for this input. "
+        "Vary which aspects you cover and how you phrase the items, so that it differs from the other variants.\n"
+    )
+
+
+async def generate(kind: ItemKind, text: str = "", topic: str = "", use_cache: bool = True,
+                   priority: int = llm_scheduler.STANDARD, variant: int = None) -> dict:
+    """Return {kind.key: items}, {"study_only": True, "message"} or {"error"}.
+
+    Complete items of a truncated or malformed response are kept, but the
+    response itself is dropped from the cache. A `variant` number makes the
+    prompt ask for a distinct set; such responses are neither read from
+    nor written to the cache.
+    """
+    source, topic_clean = _inputs(text, topic)
+    if not source and not topic_clean:
+        return {"error": kind.missing_input}
+
+    prompt = kind.build_prompt(source, topic_clean)
+    if variant is not None:
+        prompt = with_variant(prompt, variant)
+        use_cache = False
+    raw = (await llm_gateway.generate(prompt, use_cache=use_cache, priority=priority, store=variant is None)).strip()
+
+    data, items = json_stream.parse_items(raw, kind.key)
+    items = [item for item in items if kind.is_valid(item)]
+    if data is None:
+        # Don't keep serving an unparseable response from the cache
+        await llm_cache.discard(llm_gateway.DEFAULT_MODEL, prompt)
+        if not items:
+            return {"error": raw or "Invalid response from model."}
+        return {kind.key: items}
+
+    if data.get("study_only"):
+        return {"study_only": True, "message": data.get("message", STUDY_ONLY_MESSAGE)}
+
+    if not items:
+        return {"error": kind.none_generated}
+
+    return {kind.key: items}
+
+
+async def stream(kind: ItemKind, text: str = "", topic: str = "", use_cache: bool = True):
+    """Yield each item as soon as the model has finished writing it.
+
+    Yields {"type": kind.item, "index", kind.item: item} per valid item,
+    then one of {"type": "done", "count"}, {"type": "study_only",
+    "message"} or {"type": "error", "detail"}. Items completed before a
+    malformed tail are kept.
+    """
+    source, topic_clean = _inputs(text, topic)
+    if not source and not topic_clean:
+        yield {"type": "error", "detail": kind.missing_input}
+        return
+
+    prompt = kind.build_prompt(source, topic_clean)
+    parser = json_stream.ArrayItemParser(kind.key)
+    count = 0
+    async for chunk in llm_gateway.stream(prompt, use_cache=use_cache):
+        for item in parser.feed(chunk):
+            if kind.is_valid(item):
+                yield {"type": kind.item, "index": count, kind.item: item}
+                count += 1
+
+    data, _ = json_stream.parse_items(parser.buffer, kind.key)
+    if data is None:
+        await llm_cache.discard(llm_gateway.DEFAULT_MODEL, prompt)
+    elif data.get("study_only"):
+        yield {"type": "study_only", "message": data.get("message", STUDY_ONLY_MESSAGE)}
+        return
+    if not count:
+        yield {"type": "error", "detail": parser.buffer.strip() or kind.none_generated}
+        return
+    yield {"type": "done", "count": count}
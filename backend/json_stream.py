@@ -0,0 +1,100 @@
+import json
+import re
+
+_FENCE_RE = re.compile(r"^```(?:json)?\s*|\s*```\s*$")
+
+
+def strip_fences(raw: str) -> str:
+    """Remove a surrounding markdown code fence, if the model added one."""
+    raw = (raw or "").strip()
+    if raw.startswith("```"):
+        raw = _FENCE_RE.sub("", raw)
+    return raw
+
+
+class ArrayItemParser:
+    """Incrementally pick complete objects out of `{"<key>": [ {...}, {...} ]}`.
+
+    feed() takes the model output chunk by chunk and returns the elements
+    of the array under `array_key` whose closing brace has arrived. Only
+    string and bracket state is tracked, so anything before the first `{`
+    (such as a code fence) is ignored, and a malformed tail costs only the
+    item it is in.
+    """
+
+    def __init__(self, array_key: str):
+        self.array_key = array_key
+        self.buffer = ""
+        self._pos = 0
+        self._stack = [] # open brackets
+        self._in_string = False
+        self._escape = False
+        self._string_start = None
+        self._last_key = None # last string seen directly in the root object
+        self._array_depth = None # stack depth inside the target array
+        self._item_start = None
+
+    def feed(self, chunk: str):
+        self.buffer += chunk
+        items = []
+        buffer = self.buffer
+        for i in range(self._pos, len(buffer)):
+            char = buffer[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    if len(self._stack) == 1 and self._string_start is not None:
+                        try:
+                            self._last_key = json.loads(buffer[self._string_start:i + 1])
+                        except ValueError:
+                            self._last_key = None
+                continue
+            if char == '"':
+                if self._stack:
+                    self._in_string = True
+                    self._string_start = i
+            elif char in "{[":
+                if not self._stack and char != "{":
+                    continue
+                if char == "{" and self._array_depth is not None and len(self._stack) == self._array_depth:
+                    self._item_start = i
+                self._stack.append(char)
+                if char == "[" and len(self._stack) == 2 and self._last_key == self.array_key:
+                    self._array_depth = 2
+            elif char in "}]":
+                if not self._stack:
+                    continue
+                self._stack.pop()
+                if self._array_depth is not None:
+                    if char == "}" and self._item_start is not None and len(self._stack) == self._array_depth:
+                        try:
+                            items.append(json.loads(buffer[self._item_start:i + 1]))
+                        except ValueError:
+                            pass # a malformed item is skipped, the rest still count
+                        self._item_start = None
+                    elif char == "]" and len(self._stack) < self._array_depth:
+                        self._array_depth = None
+        self._pos = len(buffer)
+        return [item for item in items if isinstance(item, dict)]
+
+
+def parse_items(raw: str, array_key: str):
+    """Return (document, items) for a complete model response.
+
+    document is the parsed JSON object, or None if the response is not
+    valid JSON; items are the array elements, salvaged one by one from a
+    truncated or malformed response when the whole does not parse.
+    """
+    raw = strip_fences(raw)
+    try:
+        document = json.loads(raw)
+    except ValueError:
+        document = None
+    if isinstance(document, dict):
+        items = document.get(array_key) or []
+        return document, [item for item in items if isinstance(item, dict)]
+    return None, ArrayItemParser(array_key).feed(raw)
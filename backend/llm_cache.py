@@ -0,0 +1,157 @@
+import asyncio
+import hashlib
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+from models import LLMCacheEntry
+from sql_cache import SqlCacheTable
+
+CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "1") == "1"
+TTL_SECONDS = int(os.getenv("LLM_CACHE_TTL_SECONDS", str(24 * 60 * 60)))
+MEMORY_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MEMORY_ENTRIES", "512"))
+DISK_MAX_ENTRIES = int(os.getenv("LLM_CACHE_DISK_ENTRIES", "20000"))
+
+# Trim the SQLite table back to DISK_MAX_ENTRIES every this many writes
+# instead of counting rows on every insert.
+_EVICT_EVERY = 100
+
+_memory = OrderedDict()  # key -> (stored_at, text)
+_memory_lock = threading.Lock()
+
+_stats = {
+    "memory_hits": 0,
+    "disk_hits": 0,
+    "misses": 0,
+    "bypassed": 0,
+    "writes": 0,
+    "memory_evictions": 0,
+    "disk_evictions": 0,
+}
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Collapse whitespace so formatting-only differences share a cache entry."""
+    return re.sub(r"\s+", " ", prompt or "").strip()
+
+
+def make_key(model: str, prompt: str) -> str:
+    digest = hashlib.sha256(normalize_prompt(prompt).encode("utf-8")).hexdigest()
+    return f"{model}:{digest}"
+
+
+def _memory_get(key):
+    with _memory_lock:
+        entry = _memory.get(key)
+        if entry is None:
+            return None
+        stored_at, text = entry
+        if time.time() - stored_at > TTL_SECONDS:
+            del _memory[key]
+            return None
+        _memory.move_to_end(key)
+        return text
+
+
+def _memory_put(key, text, stored_at=None):
+    with _memory_lock:
+        _memory[key] = (stored_at or time.time(), text)
+        _memory.move_to_end(key)
+        while len(_memory) > MEMORY_MAX_ENTRIES:
+            _memory.popitem(last=False)
+            _stats["memory_evictions"] += 1
+
+
+def _disk_evict(db):
+    """Delete expired rows, then the least recently used rows over the size bound."""
+    cutoff = datetime.utcnow() - timedelta(seconds=TTL_SECONDS)
+    expired = _table.purge(db, LLMCacheEntry.created_at < cutoff)
+    evicted = _table.trim(db, db.query(LLMCacheEntry).count() - DISK_MAX_ENTRIES)
+    _stats["disk_evictions"] += expired + evicted
+
+
+_table = SqlCacheTable(LLMCacheEntry, _disk_evict, _EVICT_EVERY)
+
+
+def _disk_get(key):
+    with _table.session() as db:
+        entry = db.get(LLMCacheEntry, key)
+        if entry is None:
+            return None
+        if entry.created_at < datetime.utcnow() - timedelta(seconds=TTL_SECONDS):
+            db.delete(entry)
+            db.commit()
+            return None
+        entry.last_used_at = datetime.utcnow()
+        db.commit()
+        return entry.response, entry.created_at
+
+
+def _disk_put(key, model, text):
+    with _table.session() as db:
+        now = datetime.utcnow()
+        _table.store(db, LLMCacheEntry(key=key, model=model, response=text, created_at=now, last_used_at=now))
+
+
+def _disk_delete(key):
+    with _table.session() as db:
+        _table.delete(db, key)
+
+
+async def get(model: str, prompt: str):
+    """Return the cached response text for this prompt, or None on a miss."""
+    if not CACHE_ENABLED:
+        return None
+    key = make_key(model, prompt)
+    text = _memory_get(key)
+    if text is not None:
+        _stats["memory_hits"] += 1
+        return text
+    found = await asyncio.to_thread(_disk_get, key)
+    if found is not None:
+        text, created_at = found
+        _stats["disk_hits"] += 1
+        age = (datetime.utcnow() - created_at).total_seconds()
+        _memory_put(key, text, stored_at=time.time() - age)
+        return text
+    _stats["misses"] += 1
+    return None
+
+
+async def put(model: str, prompt: str, text: str):
+    if not CACHE_ENABLED or not text:
+        return
+    key = make_key(model, prompt)
+    _memory_put(key, text)
+    _stats["writes"] += 1
+    await asyncio.to_thread(_disk_put, key, model, text)
+
+
+async def discard(model: str, prompt: str):
+    """Drop an entry, e.g. when the caller could not parse the cached response."""
+    key = make_key(model, prompt)
+    with _memory_lock:
+        _memory.pop(key, None)
+    await asyncio.to_thread(_disk_delete, key)
+
+
+def record_bypass():
+    _stats["bypassed"] += 1
+
+
+def stats():
+    lookups = _stats["memory_hits"] + _stats["disk_hits"] + _stats["misses"]
+    hits = _stats["memory_hits"] + _stats["disk_hits"]
+    with _memory_lock:
+        memory_size = len(_memory)
+    return {
+        **_stats,
+        "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+        "memory_size": memory_size,
+        "memory_max_entries": MEMORY_MAX_ENTRIES,
+        "disk_max_entries": DISK_MAX_ENTRIES,
+        "ttl_seconds": TTL_SECONDS,
+    }
@@ -0,0 +1,142 @@
+import asyncio
+import os
+import threading
+
+from google import genai
+from google.genai import types
+from dotenv import load_dotenv
+
+import llm_cache
+from llm_scheduler import STANDARD, estimate_tokens, scheduler
+from provider_errors import classify
+
+# Load keys from .env if present
+load_dotenv()
+
+DEFAULT_MODEL = os.getenv("GEMINI_MODEL", "gemini-2.5-flash")
+TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "120"))
+
+_client = None
+_client_lock = threading.Lock()
+
+_sync_loop = None
+_sync_loop_lock = threading.Lock()
+
+
+def get_api_key(name):
+    """Retrieve API key from environment or streamlit secrets."""
+    return os.getenv(name)
+
+
+def get_client():
+    """Return the process-wide Gemini client, creating it on first use.
+
+    A single client means a single HTTP connection pool shared by every
+    generator module instead of one per module.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = genai.Client(
+                    api_key=get_api_key("GEMINI_API_KEY"),
+                    http_options=types.HttpOptions(timeout=int(TIMEOUT_SECONDS * 1000)),
+                )
+    return _client
+
+
+async def generate(prompt: str, model: str = DEFAULT_MODEL, use_cache: bool = True, priority: int = STANDARD,
+                   store: bool = True) -> str:
+    """Run a single non-streaming generation and return the response text.
+
+    Responses are served from llm_cache unless use_cache is False, and
+    written to it unless store is False. Uncached calls go through the
+    scheduler, which orders them by `priority`, enforces the rate limits
+    and retries quota errors.
+    """
+    if use_cache:
+        cached = await llm_cache.get(model, prompt)
+        if cached is not None:
+            return cached
+    else:
+        llm_cache.record_bypass()
+
+    response = await scheduler.run(
+        lambda: get_client().aio.models.generate_content(
+            model=model,
+            contents=prompt,
+        ),
+        priority=priority,
+        tokens=estimate_tokens(prompt),
+    )
+    text = response.text or ""
+    if store:
+        await llm_cache.put(model, prompt, text)
+    return text
+
+
+async def stream(prompt: str, model: str = DEFAULT_MODEL, use_cache: bool = True, priority: int = STANDARD):
+    """Yield response text chunks as the model produces them.
+
+    A cached response is yielded as a single chunk. A fresh one is only
+    written to the cache once the stream has completed; closing the
+    generator early closes the upstream request as well. The scheduler
+    slot is held until the stream is exhausted or closed, and quota errors
+    are only retried before the first chunk has been sent.
+    """
+    if use_cache:
+        cached = await llm_cache.get(model, prompt)
+        if cached is not None:
+            yield cached
+            return
+    else:
+        llm_cache.record_bypass()
+
+    parts = []
+    tokens = estimate_tokens(prompt)
+    attempt = 0
+    while True:
+        async with scheduler.slot(priority, tokens) as usage:
+            try:
+                chunks = await get_client().aio.models.generate_content_stream(
+                    model=model,
+                    contents=prompt,
+                )
+                try:
+                    async for chunk in chunks:
+                        if chunk.usage_metadata:
+                            usage(chunk.usage_metadata.total_token_count)
+                        if chunk.text:
+                            parts.append(chunk.text)
+                            yield chunk.text
+                finally:
+                    aclose = getattr(chunks, "aclose", None)
+                    if aclose is not None:
+                        await aclose()
+                break
+            except Exception as e:
+                error = classify(e)
+                delay = None if parts else scheduler.retry_delay(error, attempt)
+                if delay is None:
+                    if error is e:
+                        raise
+                    raise error from e
+        attempt += 1
+        await asyncio.sleep(delay)
+    await llm_cache.put(model, prompt, "".join(parts))
+
+
+def run_sync(coro):
+    """Run a gateway coroutine from synchronous code (e.g. the Streamlit app).
+
+    All sync callers share one background event loop so the pooled async
+    client is never used across different loops.
+    """
+    global _sync_loop
+    if _sync_loop is None:
+        with _sync_loop_lock:
+            if _sync_loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, daemon=True).start()
+                _sync_loop = loop
+    return asyncio.run_coroutine_threadsafe(coro, _sync_loop).result()
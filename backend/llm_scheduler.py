@@ -0,0 +1,231 @@
+import asyncio
+import heapq
+import itertools
+import math
+import os
+import random
+import time
+from contextlib import asynccontextmanager
+
+from provider_errors import ProviderOverloadedError, QuotaExceededError, classify
+
+# Priority classes: lower values are dispatched first. They only order the
+# wait queue; a call that is already running keeps its slot until it ends.
+INTERACTIVE = 0  # chat
+STANDARD = 1  # summaries, quizzes, flashcards
+BACKGROUND = 2  # study plans and pre-generation
+
+MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+REQUESTS_PER_MINUTE = float(os.getenv("LLM_REQUESTS_PER_MINUTE", "60"))
+TOKENS_PER_MINUTE = float(os.getenv("LLM_TOKENS_PER_MINUTE", "1000000"))
+MAX_QUEUE = int(os.getenv("LLM_MAX_QUEUE", "100"))
+MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+BACKOFF_BASE_SECONDS = float(os.getenv("LLM_BACKOFF_BASE_SECONDS", "1"))
+BACKOFF_MAX_SECONDS = float(os.getenv("LLM_BACKOFF_MAX_SECONDS", "30"))
+EXPECTED_OUTPUT_TOKENS = int(os.getenv("LLM_EXPECTED_OUTPUT_TOKENS", "1024"))
+
+
+def estimate_tokens(prompt: str) -> int:
+    """Budget for one call: ~4 chars per prompt token plus the expected output."""
+    return len(prompt) // 4 + EXPECTED_OUTPUT_TOKENS
+
+
+class TokenBucket:
+    """Refills `rate_per_minute` units per minute, holding at most one minute's worth."""
+
+    def __init__(self, rate_per_minute: float):
+        self.capacity = rate_per_minute
+        self.rate = rate_per_minute / 60.0
+        self.tokens = rate_per_minute
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay_for(self, amount: float) -> float:
+        """Seconds until `amount` units are available (0 if they are now)."""
+        self._refill()
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def consume(self, amount: float):
+        """Take `amount` units; a negative amount refunds an over-estimate."""
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens - amount)
+
+
+class Scheduler:
+    """Admission control for model calls.
+
+    Callers wait in a priority queue (FIFO within a class) until a
+    concurrency slot is free and both the request and token buckets can
+    cover the call. When the queue is full, new calls are rejected with
+    ProviderOverloadedError instead of waiting indefinitely. A quota
+    error from the provider pauses dispatching for its retry delay, so
+    queued calls do not run into the same 429.
+    """
+
+    def __init__(self, max_concurrency=MAX_CONCURRENCY, requests_per_minute=REQUESTS_PER_MINUTE,
+                 tokens_per_minute=TOKENS_PER_MINUTE, max_queue=MAX_QUEUE):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self._queue = []  # (priority, seq, future, tokens)
+        self._seq = itertools.count()
+        self._waiting = 0
+        self._running = 0
+        self._paused_until = 0.0
+        self._timer = None
+        self._stats = {"dispatched": 0, "shed": 0, "retries": 0, "quota_errors": 0}
+
+    @property
+    def queue_length(self) -> int:
+        return self._waiting
+
+    def is_idle(self) -> bool:
+        """True when nothing is queued and a call could be dispatched right now."""
+        return (
+            self._waiting == 0
+            and self._running < self.max_concurrency
+            and time.monotonic() >= self._paused_until
+            and self.requests.delay_for(1) == 0
+        )
+
+    def _retry_after_estimate(self) -> int:
+        per_second = max(self.requests.rate, 1e-6)
+        return max(1, math.ceil(self._waiting / per_second / max(self.max_concurrency, 1)))
+
+    async def acquire(self, priority: int, tokens: int):
+        if self._waiting >= self.max_queue:
+            self._stats["shed"] += 1
+            raise ProviderOverloadedError(
+                "The AI service is busy. Please try again shortly.",
+                retry_after=self._retry_after_estimate(),
+            )
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._queue, (priority, next(self._seq), future, tokens))
+        self._waiting += 1
+        self._pump()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Dispatched just before the cancellation arrived: hand the slot back
+                self.release()
+            else:
+                self._waiting -= 1
+            raise
+
+    def release(self, token_correction: int = 0):
+        """Free a concurrency slot and settle the difference between actual and estimated tokens."""
+        self._running -= 1
+        if token_correction:
+            self.tokens.consume(token_correction)
+        self._pump()
+
+    def _pump(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        while self._queue and self._running < self.max_concurrency:
+            priority, seq, future, tokens = self._queue[0]
+            if future.done():
+                heapq.heappop(self._queue)  # waiter was cancelled
+                continue
+            delay = max(
+                self._paused_until - time.monotonic(),
+                self.requests.delay_for(1),
+                self.tokens.delay_for(tokens),
+            )
+            if delay > 0:
+                self._timer = asyncio.get_running_loop().call_later(delay, self._pump)
+                return
+            heapq.heappop(self._queue)
+            self.requests.consume(1)
+            self.tokens.consume(tokens)
+            self._waiting -= 1
+            self._running += 1
+            self._stats["dispatched"] += 1
+            future.set_result(None)
+
+    def retry_delay(self, error: Exception, attempt: int):
+        """Return how long to wait before retrying `error`, or None if it should be raised.
+
+        Only quota errors are retried: honour the provider's retry-after when
+        given, otherwise use full-jitter exponential backoff.
+        """
+        if not isinstance(error, QuotaExceededError):
+            return None
+        self._stats["quota_errors"] += 1
+        if attempt >= MAX_RETRIES:
+            return None
+        backoff = random.uniform(0, min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** attempt))
+        delay = error.retry_after + random.uniform(0, BACKOFF_BASE_SECONDS) if error.retry_after else backoff
+        self._paused_until = max(self._paused_until, time.monotonic() + delay)
+        self._stats["retries"] += 1
+        return delay
+
+    @asynccontextmanager
+    async def slot(self, priority: int, tokens: int):
+        """Hold one dispatched slot for the duration of the block.
+
+        The block may call `usage(total_tokens)` on the yielded object to
+        report the real token count once it is known.
+        """
+        await self.acquire(priority, tokens)
+        usage = _Usage(tokens)
+        try:
+            yield usage
+        finally:
+            self.release(usage.actual - tokens if usage.actual else 0)
+
+    async def run(self, call, priority: int = STANDARD, tokens: int = EXPECTED_OUTPUT_TOKENS):
+        """Await `call()` under admission control, retrying quota errors with backoff.
+
+        `call` should return the SDK response; its usage metadata, when
+        present, corrects the token bucket.
+        """
+        attempt = 0
+        while True:
+            async with self.slot(priority, tokens) as usage:
+                try:
+                    response = await call()
+                    usage(getattr(getattr(response, "usage_metadata", None), "total_token_count", None))
+                    return response
+                except Exception as e:
+                    error = classify(e)
+                    delay = self.retry_delay(error, attempt)
+                    if delay is None:
+                        if error is e:
+                            raise
+                        raise error from e
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    def stats(self):
+        return {
+            **self._stats,
+            "queued": self._waiting,
+            "running": self._running,
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "paused_for_seconds": round(max(0.0, self._paused_until - time.monotonic()), 2),
+        }
+
+
+class _Usage:
+    def __init__(self, estimate):
+        self.estimate = estimate
+        self.actual = None
+
+    def __call__(self, total_tokens):
+        if total_tokens:
+            self.actual = total_tokens
+
+
+scheduler = Scheduler()
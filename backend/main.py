@@ -1,27 +1,75 @@
-from fastapi import FastAPI, Depends, HTTPException, status, UploadFile, File, Form
+from fastapi import FastAPI, Depends, HTTPException, status, UploadFile, File, Form, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from datetime import timedelta, datetime
+import asyncio
+import base64
+import contextlib
+import json
+import math
 import os
-from pydantic import BaseModel
-from typing import Optional, List
+from pydantic import BaseModel, Field, ValidationError
+from typing import Literal, Optional, List, Union
 import secrets
+import weakref
 
-from database import engine, get_db, Base
+from database import init_db, get_db, get_async_db
 from models import User, SavedContent
-from auth import verify_password, get_password_hash, create_access_token, get_current_user, ACCESS_TOKEN_EXPIRE_MINUTES
+from auth import (
+    verify_password_async, get_password_hash_async, password_needs_rehash, create_access_token,
+    get_current_user, auth_stats, Principal, ACCESS_TOKEN_EXPIRE_MINUTES,
+)
 
 import ai_chat
+import audio_preprocess
+import content_search
+import content_transfer
+import llm_cache
+import llm_scheduler
+import plan_schedule
+import pregen_pool
+import provider_errors
+import singleflight
 import summarizer
 import quiz_generator
+import review_queue
+import semantic_cache
 import flashcard_generator
 import speech_to_text
 import study_planner
+import transcript_cache
+import uploads
+
+# Create tables and indexes
+init_db()
+content_search.init_index()
+
+@contextlib.asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Run the background workers for as long as the app is serving."""
+    pregen_pool.pool.start()
+    try:
+        yield
+    finally:
+        await pregen_pool.pool.stop()
 
-# Create tables
-Base.metadata.create_all(bind=engine)
+app = FastAPI(title="AI Study Buddy API", lifespan=lifespan)
 
-app = FastAPI(title="AI Study Buddy API")
+BATCH_MAX_TASKS = int(os.getenv("BATCH_MAX_TASKS", "20"))
+BATCH_MAX_CONCURRENCY_PER_USER = int(os.getenv("BATCH_MAX_CONCURRENCY_PER_USER", "3"))
+SAVED_CONTENT_PAGE_SIZE = int(os.getenv("SAVED_CONTENT_PAGE_SIZE", "50"))
+SAVED_CONTENT_MAX_PAGE_SIZE = int(os.getenv("SAVED_CONTENT_MAX_PAGE_SIZE", "200"))
+# Long WAV uploads are segmented, so only audio sent in one request needs the provider's 10MB cap
+TRANSCRIBE_MAX_BYTES = int(os.getenv("TRANSCRIBE_MAX_BYTES", str(200 * 1024 * 1024)))
+TRANSCRIBE_MAX_SINGLE_BYTES = int(os.getenv("TRANSCRIBE_MAX_SINGLE_BYTES", str(10 * 1024 * 1024)))
+SEARCH_PAGE_SIZE = int(os.getenv("SEARCH_PAGE_SIZE", "20"))
+SEARCH_MAX_OFFSET = int(os.getenv("SEARCH_MAX_OFFSET", "1000"))
+# user id -> asyncio.Semaphore shared by that user's batches; an entry goes away with the last batch holding it
+_batch_semaphores = weakref.WeakValueDictionary()
 
 # CORS middleware
 app.add_middleware(
@@ -30,7 +78,13 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Next-Offset"],
 )
+# Reject oversized audio while it streams in, not after buffering it. Only uploads
+# recognized as WAV from their first bytes get the higher segmented limit.
+app.add_middleware(uploads.UploadSizeLimit, limits={
+    "/api/transcribe": uploads.SizeLimit(TRANSCRIBE_MAX_SINGLE_BYTES, wav_max_bytes=TRANSCRIBE_MAX_BYTES),
+})
 
 # Pydantic Schemas
 class UserCreate(BaseModel):
@@ -48,14 +102,17 @@ class Token(BaseModel):
 
 class ChatRequest(BaseModel):
     question: str
-    level: str = "Beginner"
+    level: Literal["Beginner", "Intermediate", "Advanced"] = "Beginner"
+    no_cache: bool = False
 
 class SummarizeRequest(BaseModel):
     text: str
+    no_cache: bool = False
 
 class QuizRequest(BaseModel):
     text: str = ""
     topic: str = ""
+    no_cache: bool = False
 
 class PlannerRequest(BaseModel):
     topics: str
@@ -63,47 +120,184 @@ class PlannerRequest(BaseModel):
     end_date: str = ""
     hours_per_day: str = "2"
     days_per_week: str = "7"
+    no_cache: bool = False
+
+class BatchTask(BaseModel):
+    id: str = ""
+    type: str # chat, summarize, quiz, flashcards or plan
+    payload: dict = {}
+
+class BatchRequest(BaseModel):
+    tasks: List[BatchTask]
 
 class SavedContentCreate(BaseModel):
     content_type: str
     title: str
     content_data: str
 
-class SavedContentResponse(BaseModel):
+class SavedContentSummary(BaseModel):
     id: int
     content_type: str
     title: str
-    content_data: str
     created_at: datetime
-    
+
     class Config:
         from_attributes = True
 
+class SavedContentResponse(SavedContentSummary):
+    content_data: str
+
+class SavedContentSearchHit(SavedContentSummary):
+    snippet: str # body excerpt, matches wrapped in <mark></mark>
+    score: float # bm25, lower is better
+
+class ReviewCardCreate(BaseModel):
+    front: str = Field(..., min_length=1)
+    back: str = Field(..., min_length=1)
+
+class ReviewEnrollRequest(BaseModel):
+    content_id: Optional[int] = None # a saved flashcard set
+    cards: List[ReviewCardCreate] = Field(default_factory=list, max_length=review_queue.REVIEW_MAX_CARDS_PER_SET)
+
+class ReviewGradeRequest(BaseModel):
+    card_id: int
+    quality: int = Field(..., ge=0, le=5) # SM-2: 0-2 forgotten, 3 hard, 4 good, 5 easy
+
+class ReviewCardResponse(BaseModel):
+    id: int
+    content_id: Optional[int]
+    front: str
+    back: str
+    due_at: int # unix seconds
+    interval_days: float
+    ease: float
+    reps: int
+    lapses: int
+    last_reviewed_at: Optional[int]
+
+    class Config:
+        from_attributes = True
+
+def classify_api_error(e: Exception):
+    """Map an upstream exception to the (status_code, detail) we report to clients."""
+    if isinstance(e, HTTPException):
+        return e.status_code, e.detail
+    if isinstance(e, plan_schedule.PlanInputError):
+        return 400, str(e)
+    e = provider_errors.classify(e)
+    if isinstance(e, provider_errors.QuotaExceededError):
+        return 429, "API Rate Limit Exceeded: You have exceeded your free tier quota. Please try again later or check your API keys."
+    if isinstance(e, provider_errors.ProviderOverloadedError):
+        return 503, str(e)
+    return 500, str(e)
+
+def retry_after_seconds(e: Exception) -> Optional[int]:
+    """Whole seconds the client should wait before retrying, when the error says so."""
+    retry_after = getattr(provider_errors.classify(e), "retry_after", None)
+    return math.ceil(retry_after) if retry_after else None
+
+def error_payload(e: Exception) -> dict:
+    """{"status", "detail"} for errors reported inside a stream, plus "retry_after" when known."""
+    status_code, detail = classify_api_error(e)
+    payload = {"status": status_code, "detail": detail}
+    retry_after = retry_after_seconds(e)
+    if retry_after:
+        payload["retry_after"] = retry_after
+    return payload
+
 def handle_api_error(e: Exception):
-    error_str = str(e)
-    if "429" in error_str or "RESOURCE_EXHAUSTED" in error_str or "Quota exceeded" in error_str:
-        raise HTTPException(status_code=429, detail="API Rate Limit Exceeded: You have exceeded your free tier quota. Please try again later or check your API keys.")
-    raise HTTPException(status_code=500, detail=error_str)
+    status_code, detail = classify_api_error(e)
+    retry_after = retry_after_seconds(e)
+    headers = {"Retry-After": str(retry_after)} if retry_after else None
+    raise HTTPException(status_code=status_code, detail=detail, headers=headers)
+
+async def run_coalesced(key, no_cache: bool, fn):
+    """Share one upstream call between identical concurrent requests.
+
+    Requests that bypass the cache always get their own fresh generation.
+    """
+    if no_cache:
+        return await fn()
+    return await singleflight.generations.do(key, fn)
+
+def sse_event(data, event: Optional[str] = None) -> str:
+    lines = f"event: {event}\n" if event else ""
+    return f"{lines}data: {json.dumps(data)}\n\n"
+
+def sse_response(http_request: Request, chunks):
+    """Relay an async generator of text chunks to the client as Server-Sent Events.
+
+    Each chunk is sent as a JSON-encoded `data:` line, followed by a final
+    `done` event, or an `error` event ({"status", "detail"}, plus
+    "retry_after" seconds when known) if generation fails midway. When the
+    client goes away the chunk generator is closed, which cancels the
+    upstream model call.
+    """
+    async def events():
+        try:
+            async for chunk in chunks:
+                if await http_request.is_disconnected():
+                    break
+                yield sse_event(chunk)
+            else:
+                yield sse_event({}, event="done")
+        except Exception as e:
+            yield sse_event(error_payload(e), event="error")
+        finally:
+            await chunks.aclose()
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+def ndjson_response(http_request: Request, events):
+    """Relay an async generator of dicts to the client as NDJSON, one object per line.
+
+    A failure midway is sent as a final {"type": "error", "status", "detail"}
+    line (with "retry_after" seconds when the provider gave one); when the client goes away the generator is closed, which cancels
+    the upstream model call.
+    """
+    async def lines():
+        try:
+            async for event in events:
+                if await http_request.is_disconnected():
+                    break
+                yield json.dumps(event) + "\n"
+        except Exception as e:
+            yield json.dumps({"type": "error", **error_payload(e)}) + "\n"
+        finally:
+            await events.aclose()
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson", headers={"X-Accel-Buffering": "no"})
 
 
 @app.post("/api/register")
-def register(user: UserCreate, db: Session = Depends(get_db)):
-    db_user = db.query(User).filter(User.email == user.email).first()
+async def register(user: UserCreate, db: Session = Depends(get_db)):
+    db_user = await run_in_threadpool(lambda: db.query(User).filter(User.email == user.email).first())
     if db_user:
         raise HTTPException(status_code=400, detail="Email already registered")
-    hashed_password = get_password_hash(user.password)
+    hashed_password = await get_password_hash_async(user.password)
     new_user = User(name=user.name, email=user.email, hashed_password=hashed_password)
-    db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+
+    def insert_user():
+        db.add(new_user)
+        db.commit()
+
+    await run_in_threadpool(insert_user)
     return {"message": "User registered successfully"}
 
 @app.post("/api/login", response_model=Token)
-def login(login_data: LoginData, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.email == login_data.email).first()
-    if not user or not verify_password(login_data.password, user.hashed_password):
+async def login(login_data: LoginData, db: Session = Depends(get_db)):
+    user = await run_in_threadpool(lambda: db.query(User).filter(User.email == login_data.email).first())
+    if not user or not await verify_password_async(login_data.password, user.hashed_password):
         raise HTTPException(status_code=400, detail="Incorrect email or password")
-    
+
+    if password_needs_rehash(user.hashed_password):
+        user.hashed_password = await get_password_hash_async(login_data.password)
+        await run_in_threadpool(db.commit)
+
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
         data={"sub": user.email}, expires_delta=access_token_expires
@@ -112,85 +306,254 @@ def login(login_data: LoginData, db: Session = Depends(get_db)):
 
 
 @app.get("/api/me")
-def read_users_me(current_user: User = Depends(get_current_user)):
+def read_users_me(current_user: Principal = Depends(get_current_user)):
     return {"email": current_user.email, "name": current_user.name}
 
+@app.get("/api/metrics")
+def metrics(current_user: Principal = Depends(get_current_user)):
+    return {
+        "llm_cache": llm_cache.stats(),
+        "singleflight": singleflight.generations.stats(),
+        "scheduler": llm_scheduler.scheduler.stats(),
+        "auth": auth_stats(),
+        "transcript_cache": transcript_cache.stats(),
+        "audio_preprocess": audio_preprocess.stats(),
+        "pregen_pool": pregen_pool.pool.stats(),
+        "semantic_cache": semantic_cache.cache.stats(),
+        "review_queue": review_queue.stats(),
+    }
+
+async def run_chat(request: ChatRequest):
+    answer = await run_coalesced(
+        singleflight.make_key("chat", text=request.question, level=request.level),
+        request.no_cache,
+        lambda: ai_chat.study_chat(request.question, request.level, use_cache=not request.no_cache),
+    )
+    return {"answer": answer}
+
+async def run_summarize(request: SummarizeRequest):
+    summary = await run_coalesced(
+        singleflight.make_key("summarize", text=request.text),
+        request.no_cache,
+        lambda: summarizer.summarize_text(request.text, use_cache=not request.no_cache),
+    )
+    return {"summary": summary}
+
+def take_pregenerated(kind: str, request: QuizRequest):
+    """Serve topic-only requests from the pre-generation pool, counting them towards its ranking."""
+    if request.text.strip() or not request.topic.strip():
+        return None
+    pregen_pool.pool.record(kind, request.topic)
+    if request.no_cache:
+        return None
+    return pregen_pool.pool.take(kind, request.topic)
+
+async def run_quiz(request: QuizRequest):
+    pregenerated = take_pregenerated("quiz", request)
+    if pregenerated is not None:
+        return pregenerated
+    result = await run_coalesced(
+        singleflight.make_key("quiz", text=request.text, topic=request.topic),
+        request.no_cache,
+        lambda: quiz_generator.generate_quiz(request.text, request.topic, use_cache=not request.no_cache),
+    )
+    if "error" in result:
+        raise HTTPException(status_code=400, detail=result["error"])
+    return result
+
+async def run_flashcards(request: QuizRequest):
+    pregenerated = take_pregenerated("flashcards", request)
+    if pregenerated is not None:
+        return pregenerated
+    result = await run_coalesced(
+        singleflight.make_key("flashcards", text=request.text, topic=request.topic),
+        request.no_cache,
+        lambda: flashcard_generator.generate_flashcards(request.text, request.topic, use_cache=not request.no_cache),
+    )
+    if "error" in result:
+        raise HTTPException(status_code=400, detail=result["error"])
+    return result
+
+async def run_plan(request: PlannerRequest):
+    schedule, plan_text = await study_planner.build_study_plan(
+        topics=request.topics,
+        start_date=request.start_date,
+        end_date=request.end_date,
+        hours_per_day=request.hours_per_day,
+        days_per_week=request.days_per_week,
+        use_cache=not request.no_cache,
+    )
+    # schedule is the same plan as structured JSON (None for non-study topics)
+    return {"plan": plan_text, "schedule": schedule}
+
+# Task type -> (request schema, runner) for /api/batch
+BATCH_RUNNERS = {
+    "chat": (ChatRequest, run_chat),
+    "summarize": (SummarizeRequest, run_summarize),
+    "quiz": (QuizRequest, run_quiz),
+    "flashcards": (QuizRequest, run_flashcards),
+    "plan": (PlannerRequest, run_plan),
+}
+
 @app.post("/api/chat")
-def chat(request: ChatRequest, current_user: User = Depends(get_current_user)):
+async def chat(request: ChatRequest, current_user: Principal = Depends(get_current_user)):
     try:
-        answer = ai_chat.study_chat(request.question, request.level)
-        return {"answer": answer}
+        return await run_chat(request)
     except Exception as e:
         handle_api_error(e)
 
+@app.post("/api/chat/stream")
+async def chat_stream(request: ChatRequest, http_request: Request, current_user: Principal = Depends(get_current_user)):
+    chunks = ai_chat.stream_study_chat(request.question, request.level, use_cache=not request.no_cache)
+    return sse_response(http_request, chunks)
+
 @app.post("/api/summarize")
-def summarize(request: SummarizeRequest, current_user: User = Depends(get_current_user)):
+async def summarize(request: SummarizeRequest, current_user: Principal = Depends(get_current_user)):
     try:
-        summary = summarizer.summarize_text(request.text)
-        return {"summary": summary}
+        return await run_summarize(request)
     except Exception as e:
         handle_api_error(e)
 
+@app.post("/api/summarize/stream")
+async def summarize_stream(request: SummarizeRequest, http_request: Request, current_user: Principal = Depends(get_current_user)):
+    chunks = summarizer.stream_summary(request.text, use_cache=not request.no_cache)
+    return sse_response(http_request, chunks)
+
 @app.post("/api/quiz")
-def generate_quiz(request: QuizRequest, current_user: User = Depends(get_current_user)):
+async def generate_quiz(request: QuizRequest, current_user: Principal = Depends(get_current_user)):
     try:
-        result = quiz_generator.generate_quiz(request.text, request.topic)
-        if "error" in result:
-             raise HTTPException(status_code=400, detail=result["error"])
-        return result
+        return await run_quiz(request)
     except Exception as e:
         handle_api_error(e)
 
+@app.post("/api/quiz/stream")
+async def quiz_stream(request: QuizRequest, http_request: Request, current_user: Principal = Depends(get_current_user)):
+    """NDJSON: each question as soon as it is complete, then a done, study_only or error line."""
+    events = quiz_generator.stream_quiz(request.text, request.topic, use_cache=not request.no_cache)
+    return ndjson_response(http_request, events)
+
 @app.post("/api/flashcards")
-def generate_flashcards(request: QuizRequest, current_user: User = Depends(get_current_user)):
+async def generate_flashcards(request: QuizRequest, current_user: Principal = Depends(get_current_user)):
     try:
-        result = flashcard_generator.generate_flashcards(request.text, request.topic)
-        if "error" in result:
-             raise HTTPException(status_code=400, detail=result["error"])
-        return result
+        return await run_flashcards(request)
     except Exception as e:
         handle_api_error(e)
 
+@app.post("/api/flashcards/stream")
+async def flashcards_stream(request: QuizRequest, http_request: Request, current_user: Principal = Depends(get_current_user)):
+    """NDJSON: each flashcard as soon as it is complete, then a done, study_only or error line."""
+    events = flashcard_generator.stream_flashcards(request.text, request.topic, use_cache=not request.no_cache)
+    return ndjson_response(http_request, events)
+
 @app.post("/api/plan")
-def plan(request: PlannerRequest, current_user: User = Depends(get_current_user)):
-    try:
-        plan_text = study_planner.generate_study_plan(
-            topics=request.topics,
-            start_date=request.start_date,
-            end_date=request.end_date,
-            hours_per_day=request.hours_per_day,
-            days_per_week=request.days_per_week
-        )
-        return {"plan": plan_text}
+async def plan(request: PlannerRequest, current_user: Principal = Depends(get_current_user)):
+    try:
+        return await run_plan(request)
     except Exception as e:
         handle_api_error(e)
 
+@app.post("/api/plan/stream")
+async def plan_stream(request: PlannerRequest, http_request: Request, current_user: Principal = Depends(get_current_user)):
+    chunks = study_planner.stream_study_plan(
+        topics=request.topics,
+        start_date=request.start_date,
+        end_date=request.end_date,
+        hours_per_day=request.hours_per_day,
+        days_per_week=request.days_per_week,
+        use_cache=not request.no_cache,
+    )
+    return sse_response(http_request, chunks)
+
+@app.post("/api/batch")
+async def batch(request: BatchRequest, current_user: Principal = Depends(get_current_user)):
+    """Run several generation tasks concurrently and stream results as NDJSON.
+
+    Each line is one task result, in completion order:
+    {"id", "type", "status", "result"} on success or {"id", "type", "status", "error"}
+    on failure (plus "retry_after" seconds for rate limits), so one failing
+    task does not affect the others.
+    """
+    if len(request.tasks) > BATCH_MAX_TASKS:
+        raise HTTPException(status_code=400, detail=f"A batch can contain at most {BATCH_MAX_TASKS} tasks.")
+
+    semaphore = _batch_semaphores.setdefault(current_user.id, asyncio.Semaphore(BATCH_MAX_CONCURRENCY_PER_USER))
+
+    async def run_task(index: int, task: BatchTask):
+        line = {"id": task.id or str(index), "type": task.type}
+        runner = BATCH_RUNNERS.get(task.type)
+        if runner is None:
+            return {**line, "status": 400, "error": f"Unknown task type: {task.type}"}
+        schema, run = runner
+        try:
+            task_request = schema(**task.payload)
+        except ValidationError as e:
+            return {**line, "status": 422, "error": json.loads(e.json())}
+        try:
+            async with semaphore:
+                result = await run(task_request)
+            return {**line, "status": 200, "result": result}
+        except Exception as e:
+            payload = error_payload(e)
+            return {**line, "status": payload.pop("status"), "error": payload.pop("detail"), **payload}
+
+    async def lines():
+        pending = [asyncio.ensure_future(run_task(i, task)) for i, task in enumerate(request.tasks)]
+        try:
+            for finished in asyncio.as_completed(pending):
+                yield json.dumps(await finished) + "\n"
+        finally:
+            # Client went away: stop the tasks that have not finished yet
+            for task in pending:
+                task.cancel()
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
 @app.post("/api/transcribe")
-async def transcribe(audio: UploadFile = File(...), model: str = Form(None), current_user: User = Depends(get_current_user)):
-    try:
-        # Wrap the file in a dummy object that has `.read()` and `.type` that speech_to_text.py expects
-        class DummyFile:
-            def __init__(self, file_content, c_type):
-                self.content = file_content
-                self.type = c_type
-                self._pos = 0
-            def read(self):
-                return self.content
-            def seek(self, pos):
-                pass
-                
-        content = await audio.read()
-        if len(content) > 10 * 1024 * 1024: # 10MB limit
-            raise HTTPException(status_code=413, detail="File too large. Maximum size is 10MB.")
-            
-        dummy_file = DummyFile(content, audio.content_type)
-        transcript = speech_to_text.transcribe_audio(dummy_file, model)
-        return {"transcript": transcript}
+async def transcribe(
+    http_request: Request,
+    audio: UploadFile = File(...),
+    model: str = Form(None),
+    stream: bool = Form(False),
+    current_user: Principal = Depends(get_current_user),
+):
+    """Transcribe an audio upload.
+
+    WAV uploads are downmixed, resampled and trimmed of silence before
+    being sent, and long ones are split and transcribed in parallel.
+    With stream=true the response is Server-Sent Events: one event per
+    segment as it finishes, then one with the stitched transcript. The
+    transcript comes with "cached": true when identical audio was already
+    transcribed with the same model.
+    """
+    # The body was already size-checked while streaming in (UploadSizeLimit) and
+    # spooled to a temporary file by the multipart parser; read it from there.
+    # WAV uploads are only opened here; segments are read from the file as they are sent.
+    try:
+        audio_file = uploads.AudioUpload(audio.file, audio.content_type)
+        key = await run_in_threadpool(speech_to_text.cache_key, audio_file, model)
+        cached = await run_in_threadpool(transcript_cache.get, key)
+        if cached is not None:
+            result = {"transcript": cached, "cached": True}
+        else:
+            decoded = await run_in_threadpool(speech_to_text.load_audio, audio_file)
+            if decoded is None and (audio.size or 0) > TRANSCRIBE_MAX_SINGLE_BYTES:
+                # Started like a WAV but could not be read as 16-bit PCM
+                raise HTTPException(status_code=413, detail=uploads.too_large_detail(TRANSCRIBE_MAX_SINGLE_BYTES))
+            if stream and decoded is not None and speech_to_text.is_long(decoded):
+                # The stream reads its own handle, as the upload may be closed once this handler returns
+                owned = await run_in_threadpool(lambda: speech_to_text.load_audio(uploads.reopen(audio.file)))
+                return sse_response(http_request, speech_to_text.stream_transcription(owned, model, key))
+            result = await run_in_threadpool(speech_to_text.transcribe_decoded, audio_file, decoded, model, key)
+        if stream:
+            async def single():
+                yield result
+            return sse_response(http_request, single())
+        return result
     except Exception as e:
         handle_api_error(e)
 
 @app.post("/api/saved-content", response_model=SavedContentResponse)
-def save_content(request: SavedContentCreate, current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+async def save_content(request: SavedContentCreate, current_user: Principal = Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
     try:
         new_content = SavedContent(
             user_id=current_user.id,
@@ -199,30 +562,216 @@ def save_content(request: SavedContentCreate, current_user: User = Depends(get_c
             content_data=request.content_data
         )
         db.add(new_content)
-        db.commit()
-        db.refresh(new_content)
+        if request.content_type == review_queue.FLASHCARD_CONTENT_TYPE:
+            await db.flush()
+            await review_queue.add_cards(
+                db, current_user.id, review_queue.cards_from_content(request.content_data), new_content.id
+            )
+        await db.commit()
         return new_content
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.get("/api/saved-content", response_model=List[SavedContentResponse])
-def get_saved_content(current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+def encode_cursor(item) -> str:
+    raw = f"{item.created_at.isoformat()}|{item.id}"
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor: str):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode("utf-8")
+        created_at, item_id = raw.rsplit("|", 1)
+        return datetime.fromisoformat(created_at), int(item_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+@app.get("/api/saved-content", response_model=List[Union[SavedContentResponse, SavedContentSummary]])
+async def get_saved_content(
+    response: Response,
+    limit: int = Query(SAVED_CONTENT_PAGE_SIZE, ge=1, le=SAVED_CONTENT_MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    content_type: Optional[str] = None,
+    fields: Literal["full", "summary"] = "full",
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """Newest items first, one page at a time.
+
+    When more items exist, the X-Next-Cursor response header holds the
+    cursor to pass back for the next page. fields=summary leaves out
+    content_data (fetch it with GET /api/saved-content/{id}).
+    """
+    if fields == "summary":
+        query = select(SavedContent.id, SavedContent.content_type, SavedContent.title, SavedContent.created_at)
+    else:
+        query = select(SavedContent)
+    query = query.where(SavedContent.user_id == current_user.id)
+    if content_type:
+        query = query.where(SavedContent.content_type == content_type)
+    if cursor:
+        query = query.where(tuple_(SavedContent.created_at, SavedContent.id) < tuple_(*decode_cursor(cursor)))
+    query = query.order_by(SavedContent.created_at.desc(), SavedContent.id.desc()).limit(limit + 1)
+    try:
+        result = await db.execute(query)
+        items = result.scalars().all() if fields == "full" else result.all()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    if len(items) > limit:
+        items = items[:limit]
+        response.headers["X-Next-Cursor"] = encode_cursor(items[-1])
+    if fields == "summary":
+        return [SavedContentSummary.model_validate(item) for item in items]
+    return items
+
+@app.get("/api/saved-content/export")
+async def export_saved_content(current_user: Principal = Depends(get_current_user)):
+    """All of the user's saved items as NDJSON, oldest first, streamed from the database."""
+    return StreamingResponse(
+        content_transfer.export_lines(current_user.id),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": 'attachment; filename="saved-content.ndjson"'},
+    )
+
+@app.post("/api/saved-content/import")
+async def import_saved_content(
+    request: Request,
+    batch_size: int = Query(content_transfer.IMPORT_BATCH_SIZE, ge=1, le=content_transfer.IMPORT_MAX_BATCH_SIZE),
+    current_user: Principal = Depends(get_current_user),
+):
+    """Import an NDJSON body in the export format, one transaction per batch_size items.
+
+    Returns the number of rows imported and the throughput in rows per second.
+    """
+    try:
+        return await content_transfer.import_lines(request.stream(), current_user.id, batch_size)
+    except content_transfer.ImportFailed as e:
+        raise HTTPException(status_code=400, detail={"error": str(e), "imported": e.imported})
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/saved-content/search", response_model=List[SavedContentSearchHit])
+async def search_saved_content(
+    response: Response,
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(SEARCH_PAGE_SIZE, ge=1, le=SAVED_CONTENT_MAX_PAGE_SIZE),
+    offset: int = Query(0, ge=0, le=SEARCH_MAX_OFFSET),
+    content_type: Optional[str] = None,
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """Best matches first, ranked by bm25 over title and content.
+
+    When more matches exist, the X-Next-Offset response header holds the
+    offset to pass back for the next page.
+    """
+    if not content_search.SEARCH_ENABLED:
+        raise HTTPException(status_code=501, detail="Search is only available on SQLite")
+    match = content_search.build_match_query(q, current_user.id, content_type)
+    if match is None:
+        return []
     try:
-        contents = db.query(SavedContent).filter(SavedContent.user_id == current_user.id).order_by(SavedContent.created_at.desc()).all()
-        return contents
+        result = await db.execute(
+            content_search.SEARCH_SQL,
+            {"query": match, "user_id": current_user.id, "limit": limit + 1, "offset": offset},
+        )
+        hits = result.mappings().all()
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    if len(hits) > limit:
+        hits = hits[:limit]
+        response.headers["X-Next-Offset"] = str(offset + limit)
+    return [SavedContentSearchHit.model_validate(dict(hit)) for hit in hits]
+
+@app.get("/api/saved-content/{content_id}", response_model=SavedContentResponse)
+async def get_saved_content_item(content_id: int, current_user: Principal = Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
+    content = await db.scalar(
+        select(SavedContent).where(SavedContent.id == content_id, SavedContent.user_id == current_user.id)
+    )
+    if not content:
+        raise HTTPException(status_code=404, detail="Content not found")
+    return content
 
 @app.delete("/api/saved-content/{content_id}")
-def delete_saved_content(content_id: int, current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+async def delete_saved_content(content_id: int, current_user: Principal = Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
     try:
-        content = db.query(SavedContent).filter(SavedContent.id == content_id, SavedContent.user_id == current_user.id).first()
+        content = await db.scalar(
+            select(SavedContent).where(SavedContent.id == content_id, SavedContent.user_id == current_user.id)
+        )
         if not content:
             raise HTTPException(status_code=404, detail="Content not found")
-        db.delete(content)
-        db.commit()
+        await review_queue.remove_set(db, content_id)
+        await db.delete(content)
+        await db.commit()
         return {"message": "Content deleted successfully"}
     except HTTPException as e:
         raise e
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/api/review/cards")
+async def enroll_review_cards(request: ReviewEnrollRequest, current_user: Principal = Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
+    """Add cards to the user's review queue, due now.
+
+    Pass content_id to enroll a saved flashcard set (sets saved with
+    content_type "flashcards" are enrolled automatically), and/or cards
+    to add individual ones.
+    """
+    cards = [(card.front.strip(), card.back.strip()) for card in request.cards]
+    try:
+        if request.content_id is not None:
+            content = await db.scalar(
+                select(SavedContent).where(SavedContent.id == request.content_id, SavedContent.user_id == current_user.id)
+            )
+            if not content:
+                raise HTTPException(status_code=404, detail="Content not found")
+            if await review_queue.is_enrolled(db, content.id):
+                raise HTTPException(status_code=409, detail="This flashcard set is already in the review queue")
+            from_set = review_queue.cards_from_content(content.content_data)
+            if not from_set:
+                raise HTTPException(status_code=400, detail="No flashcards found in this item")
+            added = await review_queue.add_cards(db, current_user.id, from_set, content.id)
+        else:
+            added = 0
+        added += await review_queue.add_cards(db, current_user.id, cards)
+        await db.commit()
+        return {"added": added}
+    except HTTPException as e:
+        raise e
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/review/next", response_model=List[ReviewCardResponse])
+async def next_review_cards(
+    limit: int = Query(review_queue.REVIEW_PAGE_SIZE, ge=1, le=review_queue.REVIEW_MAX_PAGE_SIZE),
+    lease: int = Query(review_queue.REVIEW_LEASE_SECONDS, ge=0, le=review_queue.REVIEW_MAX_LEASE_SECONDS),
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """The next due cards, read from the (user_id, due_at, id, leased_until) index.
+
+    Returned cards stay out of the queue for `lease` seconds, or until
+    graded; lease=0 only looks without taking them.
+    """
+    try:
+        cards = await review_queue.next_due(db, current_user.id, limit, lease)
+        await db.commit()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    return [ReviewCardResponse.model_validate(card) for card in cards]
+
+@app.post("/api/review/grade", response_model=ReviewCardResponse)
+async def grade_review_card(request: ReviewGradeRequest, current_user: Principal = Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
+    """Record a review and return the card's new schedule.
+
+    Only cards that are due or were handed out by /api/review/next can be
+    graded; others get 409.
+    """
+    try:
+        card = await review_queue.grade(db, current_user.id, request.card_id, request.quality)
+        await db.commit()
+    except review_queue.CardNotDueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    if card is None:
+        raise HTTPException(status_code=404, detail="Card not found")
+    return ReviewCardResponse.model_validate(card)
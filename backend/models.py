@@ -1,7 +1,8 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Boolean
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Boolean, Index, Float
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from database import Base
+import content_codec
 
 class User(Base):
     __tablename__ = "users"
@@ -20,7 +21,69 @@ class SavedContent(Base):
     user_id = Column(Integer, ForeignKey("users.id"))
     content_type = Column(String, index=True) # e.g., 'quiz', 'summary', 'plan', 'notes', 'chat'
     title = Column(String)
-    content_data = Column(String) # JSON string or plain text
+    # JSON string or plain text, stored as-is or zlib-compressed by content_codec
+    content_raw = Column("content_data", String)
     created_at = Column(DateTime, default=datetime.utcnow)
 
     user = relationship("User", back_populates="saved_contents")
+
+    @property
+    def content_data(self):
+        # Decompressed on access, so queries that never read it pay nothing
+        return content_codec.decode(self.content_raw)
+
+    @content_data.setter
+    def content_data(self, value):
+        self.content_raw = content_codec.encode(value)
+
+    __table_args__ = (
+        # Keyset pagination of a user's items, newest first, optionally by type.
+        # The trailing columns make fields=summary listings index-only.
+        Index("ix_saved_contents_user_listing", "user_id", "created_at", "id", "content_type", "title"),
+        Index("ix_saved_contents_user_type_listing", "user_id", "content_type", "created_at", "id", "title"),
+    )
+
+
+class LLMCacheEntry(Base):
+    __tablename__ = "llm_cache"
+
+    key = Column(String, primary_key=True) # model name + sha256 of the normalized prompt
+    model = Column(String)
+    response = Column(String)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+    last_used_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+
+class TranscriptCacheEntry(Base):
+    __tablename__ = "transcript_cache"
+
+    key = Column(String, primary_key=True) # sha256 of the model id and the audio bytes
+    model = Column(String)
+    transcript = Column(String)
+    size = Column(Integer) # UTF-8 bytes of transcript, summed for eviction
+    created_at = Column(DateTime, default=datetime.utcnow)
+    last_used_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+
+class ReviewCard(Base):
+    __tablename__ = "review_cards"
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    content_id = Column(Integer, ForeignKey("saved_contents.id"), index=True) # saved flashcard set it came from
+    front = Column(String, nullable=False)
+    back = Column(String, nullable=False)
+    # SM-2 scheduling state
+    due_at = Column(Integer, nullable=False) # unix seconds, so grading can compute it in portable SQL
+    leased_until = Column(Integer) # unix seconds; handed out by /api/review/next and off the queue until then
+    interval_days = Column(Float, nullable=False, default=0.0)
+    ease = Column(Float, nullable=False, default=2.5)
+    reps = Column(Integer, nullable=False, default=0) # successful reviews in a row
+    lapses = Column(Integer, nullable=False, default=0)
+    last_reviewed_at = Column(Integer) # unix seconds
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        # The due queue: a range scan of one user's cards in due order, leases checked in the index
+        Index("ix_review_cards_user_due_lease", "user_id", "due_at", "id", "leased_until"),
+    )
@@ -0,0 +1,220 @@
+import math
+import re
+from datetime import date, timedelta
+
+DEFAULT_PLAN_DAYS = 28
+MAX_PLAN_DAYS = 366
+SLOT_HOURS = 0.5 # allocation granularity
+# Every this many study days, one is given over to reviewing what came before
+REVIEW_EVERY = 7
+WEEKDAYS = ("Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday")
+
+_WEIGHT_RE = re.compile(r"^(.*?)\s*(?:\(\s*x\s*(\d+(?:\.\d+)?)\s*\)|\bx\s*(\d+(?:\.\d+)?))\s*$", re.IGNORECASE)
+_NUMBER_RE = re.compile(r"\d+(?:\.\d+)?")
+
+
+class PlanInputError(ValueError):
+    """The plan inputs cannot be scheduled (bad dates, no topics, ...)."""
+
+
+def parse_topics(topics: str):
+    """Split "Algebra x2, Geometry, Statistics (x3)" into [(name, weight), ...].
+
+    Topics are separated by commas, semicolons or new lines; an optional
+    trailing "(xn)" or "x n" gives a relative weight (default 1). Other
+    numbers, as in "Physics Chapter: 5", are part of the name.
+    """
+    parsed = []
+    for part in re.split(r"[,;\n]+", topics or ""):
+        part = part.strip(" \t-*•")
+        if not part:
+            continue
+        match = _WEIGHT_RE.match(part)
+        name, weight = (match.group(1).strip(), float(match.group(2) or match.group(3))) if match else (part, 1.0)
+        if name and weight > 0:
+            parsed.append((name, weight))
+    if not parsed:
+        raise PlanInputError("Please list at least one topic to study.")
+    return parsed
+
+
+def parse_date(value: str, default: date):
+    if not (value or "").strip():
+        return default
+    try:
+        return date.fromisoformat(value.strip()[:10])
+    except ValueError:
+        raise PlanInputError(f"Invalid date '{value}'. Use YYYY-MM-DD.")
+
+
+def parse_number(value, default: float, low: float, high: float) -> float:
+    match = _NUMBER_RE.search(str(value or ""))
+    number = float(match.group()) if match else default
+    return min(high, max(low, number))
+
+
+def study_weekdays(days_per_week: int):
+    """Weekday numbers (Monday = 0) to study on, spread evenly so rest days are not bunched."""
+    return {math.floor(i * 7 / days_per_week) for i in range(days_per_week)}
+
+
+def allocate_hours(topics, total_hours: float):
+    """Split total_hours across weighted topics in SLOT_HOURS units.
+
+    Every topic gets one unit; the rest are shared by weight (largest
+    remainder). Raises PlanInputError when there are fewer units than
+    topics.
+    """
+    units = int(round(total_hours / SLOT_HOURS))
+    if units < len(topics):
+        raise PlanInputError(
+            f"{len(topics)} topics need at least {_hours(len(topics) * SLOT_HOURS)} of study time, but this plan "
+            f"only has {_hours(units * SLOT_HOURS)}. Add days or hours per day, or list fewer topics."
+        )
+    spare = units - len(topics)
+    total_weight = sum(weight for _, weight in topics)
+    exact = [spare * weight / total_weight for _, weight in topics]
+    shares = [int(share) for share in exact]
+    by_remainder = sorted(range(len(topics)), key=lambda i: exact[i] - shares[i], reverse=True)
+    for i in by_remainder[:spare - sum(shares)]:
+        shares[i] += 1
+    return [(share + 1) * SLOT_HOURS for share in shares]
+
+
+def build_schedule(topics: str, start_date: str = "", end_date: str = "",
+                   hours_per_day="2", days_per_week="7", today: date = None):
+    """Lay out a day-by-day plan without any model call.
+
+    Study days follow days_per_week, every REVIEW_EVERY-th study day and
+    the last one are review days, and the remaining hours are split across
+    topics by weight and filled in order, so each topic is studied in
+    consecutive sessions; every topic gets at least one. Each study slot is one topic on one day, with
+    its part number within that topic; the model only writes a short
+    focus for each (topic, part).
+    """
+    today = today or date.today()
+    start = parse_date(start_date, today)
+    end = parse_date(end_date, start + timedelta(days=DEFAULT_PLAN_DAYS - 1))
+    if end < start:
+        raise PlanInputError("The end date must not be before the start date.")
+    if (end - start).days + 1 > MAX_PLAN_DAYS:
+        raise PlanInputError(f"Plans can cover at most {MAX_PLAN_DAYS} days.")
+    hours = parse_number(hours_per_day, 2, SLOT_HOURS, 16)
+    hours = round(hours / SLOT_HOURS) * SLOT_HOURS
+    per_week = int(parse_number(days_per_week, 7, 1, 7))
+    weighted = parse_topics(topics)
+
+    weekdays = study_weekdays(per_week)
+    calendar = [start + timedelta(days=n) for n in range((end - start).days + 1)]
+    study_dates = [day for day in calendar if day.weekday() in weekdays]
+    if not study_dates:
+        # A short range can miss every study weekday; study on its first day anyway
+        study_dates = [start]
+    review_dates = set()
+    if len(study_dates) >= 3:
+        review_dates = {study_dates[-1]}
+        review_dates.update(study_dates[n] for n in range(REVIEW_EVERY - 1, len(study_dates) - 1, REVIEW_EVERY))
+    learning_dates = [day for day in study_dates if day not in review_dates]
+
+    topic_hours = allocate_hours(weighted, hours * len(learning_dates))
+    queue = [[name, remaining] for (name, _), remaining in zip(weighted, topic_hours) if remaining > 0]
+    parts = {name: 0 for name, _ in weighted}
+
+    days, since_review = [], []
+    for day in calendar:
+        entry = {"date": day.isoformat(), "weekday": WEEKDAYS[day.weekday()], "type": "rest", "slots": []}
+        if day in review_dates:
+            covered = list(dict.fromkeys(since_review)) or [name for name, _ in weighted]
+            entry["type"] = "review"
+            entry["slots"] = [{"topic": ", ".join(covered), "hours": hours, "kind": "review"}]
+            since_review = []
+        elif day in learning_dates:
+            entry["type"] = "study"
+            left = hours
+            while left > 0 and queue:
+                name, remaining = queue[0]
+                taken = min(left, remaining)
+                parts[name] += 1
+                entry["slots"].append({"topic": name, "hours": taken, "kind": "study", "part": parts[name]})
+                since_review.append(name)
+                left -= taken
+                queue[0][1] -= taken
+                if queue[0][1] <= 0:
+                    queue.pop(0)
+        days.append(entry)
+
+    for entry in days:
+        for slot in entry["slots"]:
+            if slot["kind"] == "study":
+                slot["parts"] = parts[slot["topic"]]
+
+    return {
+        "start_date": start.isoformat(),
+        "end_date": end.isoformat(),
+        "hours_per_day": hours,
+        "days_per_week": per_week,
+        "topics": [
+            {"name": name, "weight": weight, "hours": allocated, "sessions": parts[name]}
+            for (name, weight), allocated in zip(weighted, topic_hours)
+        ],
+        "study_days": len(learning_dates),
+        "review_days": len(review_dates),
+        "rest_days": len(calendar) - len(study_dates),
+        "days": days,
+    }
+
+
+def study_sessions(schedule):
+    """Distinct (topic, part, parts) study sessions, in plan order."""
+    seen = {}
+    for entry in schedule["days"]:
+        for slot in entry["slots"]:
+            if slot["kind"] == "study":
+                seen.setdefault((slot["topic"], slot["part"]), slot["parts"])
+    return [(topic, part, parts) for (topic, part), parts in seen.items()]
+
+
+def _hours(value: float) -> str:
+    return f"{value:g} h"
+
+
+def _days(count: int, kind: str) -> str:
+    return f"{count} {kind} day" + ("" if count == 1 else "s")
+
+
+def render_markdown(schedule, overview: str = "", tips=()):
+    """Render a filled schedule as the Markdown plan shown to students."""
+    lines = ["### Overview"]
+    if overview:
+        lines.append(overview)
+    lines.append(
+        f"{schedule['start_date']} to {schedule['end_date']}: {_days(schedule['study_days'], 'study')}, "
+        f"{_days(schedule['review_days'], 'review')} and {_days(schedule['rest_days'], 'rest')} at "
+        f"{_hours(schedule['hours_per_day'])} per study day."
+    )
+    lines.append("")
+    lines.extend(f"- **{topic['name']}**: {_hours(topic['hours'])} over {topic['sessions']} sessions" for topic in schedule["topics"])
+
+    week_start = None
+    for entry in schedule["days"]:
+        day = date.fromisoformat(entry["date"])
+        monday = day - timedelta(days=day.weekday())
+        if monday != week_start:
+            week_start = monday
+            lines += ["", f"### Week of {max(monday, date.fromisoformat(schedule['start_date'])).isoformat()}"]
+        label = f"**{entry['weekday']} {entry['date']}**"
+        if entry["type"] == "rest":
+            lines.append(f"- {label}: Rest day")
+            continue
+        for slot in entry["slots"]:
+            if slot["kind"] == "review":
+                text = f"Review {slot['topic']}"
+            else:
+                text = f"{slot['topic']} (part {slot['part']}/{slot['parts']})"
+            focus = f" - {slot['focus']}" if slot.get("focus") else ""
+            lines.append(f"- {label}: {text}, {_hours(slot['hours'])}{focus}")
+
+    if tips:
+        lines += ["", "### Tips"]
+        lines.extend(f"- {tip}" for tip in tips)
+    return "\n".join(lines)
@@ -0,0 +1,177 @@
+import asyncio
+import itertools
+import logging
+import os
+import time
+from collections import defaultdict, deque
+
+import flashcard_generator
+import item_generation
+import llm_scheduler
+import quiz_generator
+from llm_scheduler import scheduler
+from singleflight import normalize
+
+logger = logging.getLogger(__name__)
+
+POOL_ENABLED = os.getenv("PREGEN_ENABLED", "1") == "1"
+TOP_TOPICS = int(os.getenv("PREGEN_TOP_TOPICS", "10"))
+VARIANTS_PER_TOPIC = int(os.getenv("PREGEN_VARIANTS", "3"))
+TTL_SECONDS = int(os.getenv("PREGEN_TTL_SECONDS", str(6 * 60 * 60)))
+# A variant is retired after being served this many times, so the pool keeps rotating
+MAX_SERVES = int(os.getenv("PREGEN_MAX_SERVES", "5"))
+# Topics need this many recent requests before they are worth pre-generating
+MIN_REQUESTS = float(os.getenv("PREGEN_MIN_REQUESTS", "3"))
+# Request counts halve every this many seconds, so the ranking follows current demand
+DECAY_SECONDS = float(os.getenv("PREGEN_DECAY_SECONDS", "3600"))
+INTERVAL_SECONDS = float(os.getenv("PREGEN_INTERVAL_SECONDS", "5"))
+
+_MAX_TRACKED_TOPICS = 1000
+
+GENERATORS = {
+    "quiz": quiz_generator.QUIZ,
+    "flashcards": flashcard_generator.FLASHCARDS,
+}
+
+
+class Variant:
+    def __init__(self, result):
+        self.result = result
+        self.created_at = time.monotonic()
+        self.serves = 0
+
+
+class PregenPool:
+    """Warm pool of pre-generated quizzes and flashcard sets for popular topics.
+
+    Topic-only requests are counted with exponential decay. While the
+    scheduler is idle, the worker generates fresh variants (at BACKGROUND
+    priority, each prompt numbered so the sets differ, and kept out of the
+    response cache) for the TOP_TOPICS most requested (kind, topic) pairs
+    until each has VARIANTS_PER_TOPIC. take() serves variants round-robin and retires
+    them after MAX_SERVES serves or TTL_SECONDS.
+    """
+
+    def __init__(self):
+        self._counts = {} # (kind, topic) -> (decayed count, updated at)
+        self._variants = defaultdict(deque) # (kind, topic) -> deque of Variant
+        self._topics = {} # (kind, topic) -> topic as first requested, for generation
+        self._task = None
+        self._variant_numbers = itertools.count(1)
+        self._stats = {
+            "hits": 0, "misses": 0, "generated": 0, "expired": 0, "retired": 0, "failures": 0, "discarded": 0,
+        }
+
+    def _decayed(self, key, now):
+        count, updated_at = self._counts.get(key, (0.0, now))
+        return count * 0.5 ** ((now - updated_at) / DECAY_SECONDS)
+
+    def record(self, kind: str, topic: str):
+        key = (kind, normalize(topic))
+        now = time.monotonic()
+        self._counts[key] = (self._decayed(key, now) + 1, now)
+        self._topics.setdefault(key, topic.strip())
+        if len(self._counts) > _MAX_TRACKED_TOPICS:
+            coldest = min(self._counts, key=lambda k: self._decayed(k, now))
+            self._forget(coldest)
+
+    def _forget(self, key):
+        self._counts.pop(key, None)
+        self._topics.pop(key, None)
+        self._variants.pop(key, None)
+
+    def _prune(self, key, now):
+        variants = self._variants.get(key)
+        while variants and now - variants[0].created_at > TTL_SECONDS:
+            variants.popleft()
+            self._stats["expired"] += 1
+        return variants
+
+    def take(self, kind: str, topic: str):
+        """Return a pre-generated result for this topic, or None on a miss."""
+        key = (kind, normalize(topic))
+        variants = self._prune(key, time.monotonic())
+        if not variants:
+            self._stats["misses"] += 1
+            return None
+        variant = variants.popleft()
+        variant.serves += 1
+        if variant.serves < MAX_SERVES:
+            variants.append(variant)
+        else:
+            self._stats["retired"] += 1
+        self._stats["hits"] += 1
+        return variant.result
+
+    def top_topics(self):
+        now = time.monotonic()
+        ranked = sorted(((self._decayed(key, now), key) for key in self._counts), reverse=True)
+        return [key for count, key in ranked[:TOP_TOPICS] if count >= MIN_REQUESTS]
+
+    def next_to_fill(self):
+        now = time.monotonic()
+        for key in self.top_topics():
+            variants = self._prune(key, now)
+            if len(variants or ()) < VARIANTS_PER_TOPIC:
+                return key
+        return None
+
+    async def fill_one(self, key) -> bool:
+        kind, _ = key
+        item_kind = GENERATORS[kind]
+        topic = self._topics[key]
+        try:
+            result = await item_generation.generate(
+                item_kind, topic=topic, priority=llm_scheduler.BACKGROUND, variant=next(self._variant_numbers),
+            )
+        except Exception:
+            self._stats["failures"] += 1
+            logger.exception("Pre-generating %s for %r failed", kind, topic)
+            return False
+        if not result.get(item_kind.key):
+            # Errors and study-only refusals are not worth serving from the pool
+            self._stats["failures"] += 1
+            return False
+        if key not in self._counts:
+            # The topic went cold and was forgotten while this was generating
+            self._stats["discarded"] += 1
+            return False
+        self._variants[key].append(Variant(result))
+        self._stats["generated"] += 1
+        return True
+
+    async def run(self):
+        """Refill the pool one variant at a time whenever the scheduler is idle."""
+        while True:
+            await asyncio.sleep(INTERVAL_SECONDS)
+            while scheduler.is_idle():
+                key = self.next_to_fill()
+                if key is None or not await self.fill_one(key):
+                    break
+
+    def start(self):
+        if POOL_ENABLED and self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self.run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self):
+        lookups = self._stats["hits"] + self._stats["misses"]
+        return {
+            **self._stats,
+            "hit_rate": round(self._stats["hits"] / lookups, 4) if lookups else 0.0,
+            "topics_tracked": len(self._counts),
+            "topics_pooled": sum(1 for variants in self._variants.values() if variants),
+            "variants": sum(len(variants) for variants in self._variants.values()),
+            "top_topics": [f"{kind}:{topic}" for kind, topic in self.top_topics()],
+        }
+
+
+pool = PregenPool()
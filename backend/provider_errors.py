@@ -0,0 +1,54 @@
+import re
+from typing import Optional
+
+from google.genai import errors as genai_errors
+
+
+class ProviderError(Exception):
+    """An upstream model provider call failed."""
+
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class QuotaExceededError(ProviderError):
+    """The provider rejected the call with a rate-limit / quota error (HTTP 429)."""
+
+
+class ProviderOverloadedError(ProviderError):
+    """Our own scheduler shed the call because its wait queue is full."""
+
+
+def _parse_seconds(value) -> Optional[float]:
+    if value is None:
+        return None
+    match = re.match(r"^\s*(\d+(?:\.\d+)?)\s*s?\s*$", str(value))
+    return float(match.group(1)) if match else None
+
+
+def _genai_retry_after(error) -> Optional[float]:
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if headers is not None:
+        seconds = _parse_seconds(headers.get("retry-after"))
+        if seconds is not None:
+            return seconds
+    details = error.details if isinstance(error.details, dict) else {}
+    if isinstance(details.get("error"), dict):
+        details = details["error"]
+    entries = details.get("details")
+    for detail in entries if isinstance(entries, list) else []:
+        if isinstance(detail, dict) and detail.get("@type", "").endswith("google.rpc.RetryInfo"):
+            return _parse_seconds(detail.get("retryDelay"))
+    return None
+
+
+def classify(error: Exception) -> Exception:
+    """Translate a provider SDK exception into one of ours; other errors pass through."""
+    if isinstance(error, ProviderError):
+        return error
+    if isinstance(error, genai_errors.APIError):
+        if error.code == 429 or error.status == "RESOURCE_EXHAUSTED":
+            return QuotaExceededError(str(error), retry_after=_genai_retry_after(error))
+    return error
@@ -1,38 +1,11 @@
-import json
-import os
-import re
+import item_generation
+import llm_scheduler
 
-from google import genai
-from dotenv import load_dotenv
 
-# Load keys from .env if present
-load_dotenv()
+def build_quiz_prompt(source: str, topic_clean: str):
+    basis = item_generation.describe_input(source, topic_clean)
 
-def get_api_key(name):
-    """Retrieve API key from environment or streamlit secrets."""
-    return os.getenv(name) 
-
-client = genai.Client(api_key=get_api_key("GEMINI_API_KEY"))
-
-STUDY_ONLY_MESSAGE = "This is for study purposes only."
-
-
-def generate_quiz(text: str = "", topic: str = ""):
-    source = (text or "").strip()
-    topic_clean = (topic or "").strip()
-
-    if not source and not topic_clean:
-        return {"error": "Please provide either study text or a study topic to generate a quiz."}
-
-    basis = (
-        f"Topic: {topic_clean}"
-        if topic_clean and not source
-        else f"Text:\n{source}"
-        if source and not topic_clean
-        else f"Topic: {topic_clean}\n\nText:\n{source}"
-    )
-
-    prompt = f"""You are a quiz generator for study material only. If the given input is NOT educational or study-related, respond with exactly this JSON and nothing else (no markdown, no code block):
+    return f"""You are a quiz generator for study material only. If the given input is NOT educational or study-related, respond with exactly this JSON and nothing else (no markdown, no code block):
 {{"study_only": true, "message": "This is for study purposes only."}}
 
 Otherwise, generate exactly 5 multiple-choice study questions based on the input. Return ONLY valid JSON in this exact shape (no markdown, no code fence):
@@ -47,27 +20,31 @@ Input:
 {basis}
 """
 
-    response = client.models.generate_content(
-        model="gemini-2.5-flash",
-        contents=prompt,
+
+def is_valid_question(item: dict) -> bool:
+    options = item.get("options")
+    index = item.get("correct_index")
+    return (
+        isinstance(item.get("question"), str)
+        and isinstance(options, list) and len(options) >= 2 and all(isinstance(option, str) for option in options)
+        and isinstance(index, int) and not isinstance(index, bool) and 0 <= index < len(options)
     )
-    raw = (response.text or "").strip()
 
-    # Strip markdown code block if present
-    if raw.startswith("```"):
-        raw = re.sub(r"^```(?:json)?\s*", "", raw)
-        raw = re.sub(r"\s*```\s*$", "", raw)
 
-    try:
-        data = json.loads(raw)
-    except json.JSONDecodeError:
-        return {"error": raw or "Invalid response from model."}
+QUIZ = item_generation.ItemKind(
+    key="questions",
+    item="question",
+    build_prompt=build_quiz_prompt,
+    is_valid=is_valid_question,
+    missing_input="Please provide either study text or a study topic to generate a quiz.",
+    none_generated="No questions were generated.",
+)
+
 
-    if data.get("study_only"):
-        return {"study_only": True, "message": data.get("message", STUDY_ONLY_MESSAGE)}
+async def generate_quiz(text: str = "", topic: str = "", use_cache: bool = True, priority: int = llm_scheduler.STANDARD):
+    return await item_generation.generate(QUIZ, text, topic, use_cache, priority)
 
-    questions = data.get("questions") or []
-    if not questions:
-        return {"error": "No questions were generated."}
 
-    return {"questions": questions}
+def stream_quiz(text: str = "", topic: str = "", use_cache: bool = True):
+    """Async generator of question events; see item_generation.stream."""
+    return item_generation.stream(QUIZ, text, topic, use_cache)
@@ -0,0 +1,178 @@
+import json
+import os
+import time
+
+from sqlalchemy import Integer, case, cast, delete, exists, func, insert, or_, select, update
+
+from models import ReviewCard
+
+# Saved items of this type are flashcard sets; saving one enrolls its cards
+FLASHCARD_CONTENT_TYPE = "flashcards"
+REVIEW_PAGE_SIZE = int(os.getenv("REVIEW_PAGE_SIZE", "20"))
+REVIEW_MAX_PAGE_SIZE = int(os.getenv("REVIEW_MAX_PAGE_SIZE", "100"))
+# Cards handed out by /api/review/next leave the queue for this long; ungraded ones then come back
+REVIEW_LEASE_SECONDS = int(os.getenv("REVIEW_LEASE_SECONDS", "600"))
+REVIEW_MAX_LEASE_SECONDS = int(os.getenv("REVIEW_MAX_LEASE_SECONDS", "86400"))
+# A failed card is shown again this soon instead of a day later
+REVIEW_RELEARN_SECONDS = int(os.getenv("REVIEW_RELEARN_SECONDS", "600"))
+REVIEW_MAX_CARDS_PER_SET = int(os.getenv("REVIEW_MAX_CARDS_PER_SET", "500"))
+
+MIN_EASE = 1.3
+DAY_SECONDS = 86400
+
+table = ReviewCard.__table__
+CARD_COLUMNS = (
+    table.c.id, table.c.content_id, table.c.front, table.c.back, table.c.due_at,
+    table.c.interval_days, table.c.ease, table.c.reps, table.c.lapses, table.c.last_reviewed_at,
+)
+
+_stats = {"cards_added": 0, "fetches": 0, "cards_served": 0, "grades": 0, "lapses": 0, "rejected_grades": 0}
+
+
+class CardNotDueError(ValueError):
+    """The card is neither due nor handed out for review, so there is nothing to grade."""
+
+
+def cards_from_content(content_data: str):
+    """(front, back) pairs of a saved flashcard set.
+
+    Accepts the /api/flashcards response ({"flashcards": [...]}) or a bare
+    list of {"front", "back"} objects; anything else yields no cards.
+    """
+    try:
+        data = json.loads(content_data)
+    except (TypeError, ValueError):
+        return []
+    if isinstance(data, dict):
+        data = data.get("flashcards")
+    if not isinstance(data, list):
+        return []
+    cards = []
+    for card in data[:REVIEW_MAX_CARDS_PER_SET]:
+        if isinstance(card, dict) and isinstance(card.get("front"), str) and isinstance(card.get("back"), str):
+            if card["front"].strip() and card["back"].strip():
+                cards.append((card["front"].strip(), card["back"].strip()))
+    return cards
+
+
+async def add_cards(db, user_id: int, cards, content_id: int = None, now: int = None) -> int:
+    """Insert new cards, due immediately. The caller commits."""
+    if not cards:
+        return 0
+    now = int(time.time()) if now is None else now
+    await db.execute(insert(table), [
+        {
+            "user_id": user_id, "content_id": content_id, "front": front, "back": back,
+            "due_at": now, "interval_days": 0.0, "ease": 2.5, "reps": 0, "lapses": 0,
+        }
+        for front, back in cards
+    ])
+    _stats["cards_added"] += len(cards)
+    return len(cards)
+
+
+async def is_enrolled(db, content_id: int) -> bool:
+    return bool(await db.scalar(select(exists().where(table.c.content_id == content_id))))
+
+
+async def remove_set(db, content_id: int):
+    """Delete the cards enrolled from a saved flashcard set. The caller commits."""
+    await db.execute(delete(table).where(table.c.content_id == content_id))
+
+
+async def next_due(db, user_id: int, limit: int = REVIEW_PAGE_SIZE, lease_seconds: int = REVIEW_LEASE_SECONDS, now: int = None):
+    """The `limit` most overdue of the user's cards whose due time has passed.
+
+    Reads one range of ix_review_cards_user_due_lease, so the cost depends
+    on `limit`, not on how many cards the user or the table holds. With a
+    lease the same statement sets the cards' leased_until lease_seconds
+    ahead, taking them off the queue so another device or a repeated call
+    gets the next ones; their due time is left alone, and grading sets the
+    real schedule. Leases are capped at REVIEW_MAX_LEASE_SECONDS. The
+    caller commits.
+    """
+    now = int(time.time()) if now is None else now
+    lease_seconds = min(lease_seconds, REVIEW_MAX_LEASE_SECONDS)
+    due = (
+        select(table.c.id)
+        .where(
+            table.c.user_id == user_id,
+            table.c.due_at <= now,
+            or_(table.c.leased_until.is_(None), table.c.leased_until <= now),
+        )
+        .order_by(table.c.due_at, table.c.id)
+        .limit(limit)
+    )
+    _stats["fetches"] += 1
+    if lease_seconds <= 0:
+        query = select(*CARD_COLUMNS).where(table.c.id.in_(due.scalar_subquery())).order_by(table.c.due_at, table.c.id)
+    else:
+        # Postgres skips rows another transaction is leasing; SQLite serializes writers anyway.
+        # RETURNING gives no order, so a leased batch comes back in no particular order.
+        leased = due.with_for_update(skip_locked=True).scalar_subquery()
+        query = update(table).where(table.c.id.in_(leased)).values(leased_until=now + lease_seconds).returning(*CARD_COLUMNS)
+    rows = (await db.execute(query)).all()
+    _stats["cards_served"] += len(rows)
+    return rows
+
+
+def _ease_delta(quality: int) -> float:
+    return 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02)
+
+
+async def grade(db, user_id: int, card_id: int, quality: int, now: int = None):
+    """Apply an SM-2 review (quality 0-5) to one card in a single UPDATE ... RETURNING.
+
+    Quality 3 and up counts as recalled: the interval goes 1 day, 6 days,
+    then the previous interval times the ease, and the ease moves by the
+    SM-2 formula (never below 1.3). Below 3 the card lapses: repetitions
+    restart and it is due again after REVIEW_RELEARN_SECONDS. Every SET
+    expression reads the row's old values, so no prior SELECT is needed.
+    Only a card that is due or currently leased can be graded, so a
+    repeated grade cannot stretch the interval again; grading ends the
+    lease. Returns the updated row, or None if the user has no such card,
+    and raises CardNotDueError for a card that is not up for review. The
+    caller commits.
+    """
+    now = int(time.time()) if now is None else now
+    c = table.c
+    if quality < 3:
+        values = {
+            "reps": 0,
+            "lapses": c.lapses + 1,
+            "interval_days": 0.0,
+            "due_at": now + REVIEW_RELEARN_SECONDS,
+        }
+    else:
+        interval = case(
+            (c.reps == 0, 1.0),
+            (c.reps == 1, 6.0),
+            else_=func.round(c.interval_days * c.ease),
+        )
+        new_ease = c.ease + _ease_delta(quality)
+        values = {
+            "reps": c.reps + 1,
+            "interval_days": interval,
+            "ease": case((new_ease < MIN_EASE, MIN_EASE), else_=new_ease),
+            "due_at": now + cast(interval * DAY_SECONDS, Integer),
+        }
+    result = await db.execute(
+        update(table)
+        .where(c.id == card_id, c.user_id == user_id, or_(c.due_at <= now, c.leased_until > now))
+        .values(last_reviewed_at=now, leased_until=None, **values)
+        .returning(*CARD_COLUMNS)
+    )
+    row = result.first()
+    if row is None:
+        if await db.scalar(select(exists().where(c.id == card_id, c.user_id == user_id))):
+            _stats["rejected_grades"] += 1
+            raise CardNotDueError("This card is not due for review yet")
+        return None
+    _stats["grades"] += 1
+    if quality < 3:
+        _stats["lapses"] += 1
+    return row
+
+
+def stats():
+    return dict(_stats)
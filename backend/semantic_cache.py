@@ -0,0 +1,223 @@
+import math
+import os
+import re
+import threading
+import time
+import zlib
+
+import numpy as np
+
+CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "1") == "1"
+# Cosine similarity a past question needs to be served for a new one
+THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.85"))
+# Entries per level; the least recently used entry is replaced when full
+MAX_ENTRIES = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "20000"))
+DIMENSIONS = int(os.getenv("SEMANTIC_CACHE_DIMENSIONS", "256"))
+# One partition each; answers for any other level are not cached
+LEVELS = ("Beginner", "Intermediate", "Advanced")
+
+_INITIAL_ROWS = 256
+_WORD_RE = re.compile(r"[a-z0-9]+")
+# Filler that changes the phrasing of a study question but not what is asked
+STOPWORDS = frozenset(
+    "a about actually an and any are as at be between can could define definition describe details detail "
+    "difference do does explain explanation for give help how i in is it its know learn me mean meaning my "
+    "of on or overview please pls plz process quick quickly s short simple simply steps tell that the this to "
+    "understand versus vs want what whats work works you your".split()
+)
+
+
+def _stem(word: str) -> str:
+    """Drop a plural ending, so "cells" and "cell" count as the same word."""
+    if len(word) > 4 and word.endswith("ies"):
+        return word[:-3] + "y"
+    if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+        return word[:-1]
+    return word
+
+
+def tokens(text: str):
+    return [_stem(word) for word in _WORD_RE.findall((text or "").lower()) if word not in STOPWORDS]
+
+
+def _bucket(feature: str) -> int:
+    return zlib.crc32(feature.encode("utf-8")) % DIMENSIONS
+
+
+def _features(words):
+    """Hashed whole words plus the character trigrams of each, each part of unit norm per word.
+
+    The trigrams score words that share most of their letters as close;
+    whether two questions ask the same thing is decided by their words
+    (see SemanticCache.lookup), so "disadvantages" is not "advantages".
+    """
+    features = {}
+    for word in words:
+        index = _bucket(f"w:{word}")
+        features[index] = features.get(index, 0.0) + 1.0
+        padded = f"#{word}#"
+        trigrams = [padded[i:i + 3] for i in range(len(padded) - 2)]
+        weight = 1.0 / math.sqrt(len(trigrams))
+        for gram in trigrams:
+            index = _bucket(gram)
+            features[index] = features.get(index, 0.0) + weight
+    return features
+
+
+class _Partition:
+    """Vectors of one level's cached questions, grown by doubling up to max_entries rows.
+
+    `squares` holds the element-wise squares of `vectors`, so the IDF-weighted
+    norm of every entry is one matrix-vector product.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        rows = min(_INITIAL_ROWS, max_entries)
+        self.vectors = np.zeros((rows, DIMENSIONS), dtype=np.float32)
+        self.squares = np.zeros((rows, DIMENSIONS), dtype=np.float32)
+        self.last_used = np.zeros(rows, dtype=np.float64)
+        self.answers = []
+        self.questions = []
+        self.features = []
+        self.size = 0
+
+    def slot(self):
+        """Row for a new entry, and the evicted entry's features if one had to go."""
+        if self.size < len(self.vectors):
+            self.size += 1
+            self.answers.append(None)
+            self.questions.append(None)
+            self.features.append(None)
+            return self.size - 1, None
+        if self.size < self.max_entries:
+            rows = min(self.max_entries, len(self.vectors) * 2)
+            vectors = np.zeros((rows, DIMENSIONS), dtype=np.float32)
+            vectors[:self.size] = self.vectors
+            squares = np.zeros((rows, DIMENSIONS), dtype=np.float32)
+            squares[:self.size] = self.squares
+            last_used = np.zeros(rows, dtype=np.float64)
+            last_used[:self.size] = self.last_used
+            self.vectors, self.squares, self.last_used = vectors, squares, last_used
+            return self.slot()
+        row = int(np.argmin(self.last_used[:self.size]))
+        return row, self.features[row]
+
+
+class SemanticCache:
+    """Near-duplicate cache for chat answers, keyed by (question, level).
+
+    Questions become hashed feature vectors (stopwords dropped, plurals
+    stemmed, whole-word and character trigram features, sublinear term
+    frequency). Entries keep only their unit-length term frequencies; a
+    lookup applies the current IDF from the cached questions to both the
+    query and every entry, so all scores are cosines under the same
+    weighting however old the entry. An entry above the threshold is only
+    served if it has exactly the query's content words, in any order.
+    Each level keeps at most max_entries questions.
+    """
+
+    def __init__(self, threshold: float = THRESHOLD, max_entries: int = MAX_ENTRIES):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self._partitions = {} # level -> _Partition
+        self._doc_freq = np.zeros(DIMENSIONS, dtype=np.float64)
+        self._docs = 0
+        self._lock = threading.Lock()
+        self._stats = {
+            "hits": 0, "misses": 0, "word_mismatches": 0, "stores": 0, "evictions": 0, "lookup_seconds": 0.0,
+        }
+
+    @staticmethod
+    def _vector(features):
+        """Unit-length term frequencies, without IDF."""
+        if not features:
+            return None
+        vector = np.zeros(DIMENSIONS, dtype=np.float32)
+        indices = np.fromiter(features.keys(), dtype=np.int64)
+        weights = np.fromiter(features.values(), dtype=np.float64)
+        # Sublinear only above one occurrence; trigram weights are fractions of one
+        vector[indices] = np.where(weights > 1.0, 1.0 + np.log(np.maximum(weights, 1.0)), weights)
+        norm = float(np.linalg.norm(vector))
+        return vector / norm if norm else None
+
+    def _similarities(self, partition, vector):
+        """Cosine similarity of the query to every entry, both weighted by the current IDF."""
+        idf = (np.log((1.0 + self._docs) / (1.0 + self._doc_freq)) + 1.0).astype(np.float32)
+        squared = idf * idf
+        norms = np.sqrt(partition.squares[:partition.size] @ squared)
+        return (partition.vectors[:partition.size] @ (vector * squared)) / (norms * float(np.linalg.norm(vector * idf)))
+
+    def lookup(self, question: str, level: str):
+        """Return the cached answer for the most similar question at this level, or None."""
+        if not CACHE_ENABLED:
+            return None
+        started = time.perf_counter()
+        with self._lock:
+            try:
+                partition = self._partitions.get(level)
+                words = tokens(question)
+                vector = self._vector(_features(words)) if partition else None
+                if vector is None or not partition.size:
+                    self._stats["misses"] += 1
+                    return None
+                similarities = self._similarities(partition, vector)
+                candidates = np.flatnonzero(similarities >= self.threshold)
+                wanted = set(words)
+                for row in candidates[np.argsort(-similarities[candidates])]:
+                    if set(tokens(partition.questions[row])) == wanted:
+                        partition.last_used[row] = time.monotonic()
+                        self._stats["hits"] += 1
+                        return partition.answers[row]
+                self._stats["misses"] += 1
+                if len(candidates):
+                    self._stats["word_mismatches"] += 1
+                return None
+            finally:
+                self._stats["lookup_seconds"] += time.perf_counter() - started
+
+    def store(self, question: str, level: str, answer: str):
+        if not CACHE_ENABLED or not answer or level not in LEVELS:
+            return
+        features = _features(tokens(question))
+        if not features:
+            return
+        with self._lock:
+            partition = self._partitions.get(level)
+            if partition is None:
+                partition = self._partitions[level] = _Partition(self.max_entries)
+            row, evicted = partition.slot()
+            if evicted is not None:
+                self._doc_freq[list(evicted)] -= 1
+                self._docs -= 1
+                self._stats["evictions"] += 1
+            self._doc_freq[list(features)] += 1
+            self._docs += 1
+            vector = self._vector(features)
+            partition.vectors[row] = vector
+            partition.squares[row] = vector * vector
+            partition.last_used[row] = time.monotonic()
+            partition.answers[row] = answer
+            partition.questions[row] = question
+            partition.features[row] = features
+            self._stats["stores"] += 1
+
+    def stats(self):
+        lookups = self._stats["hits"] + self._stats["misses"]
+        with self._lock:
+            sizes = {level: partition.size for level, partition in self._partitions.items()}
+        return {
+            "hits": self._stats["hits"],
+            "misses": self._stats["misses"],
+            "word_mismatches": self._stats["word_mismatches"],
+            "stores": self._stats["stores"],
+            "evictions": self._stats["evictions"],
+            "hit_rate": round(self._stats["hits"] / lookups, 4) if lookups else 0.0,
+            "avg_lookup_ms": round(self._stats["lookup_seconds"] / lookups * 1000, 3) if lookups else 0.0,
+            "entries": sizes,
+            "threshold": self.threshold,
+            "max_entries_per_level": self.max_entries,
+        }
+
+
+cache = SemanticCache()
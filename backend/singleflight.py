@@ -0,0 +1,56 @@
+import asyncio
+import re
+from collections import defaultdict
+
+
+def normalize(value: str) -> str:
+    return re.sub(r"\s+", " ", value or "").strip().lower()
+
+
+def make_key(endpoint: str, text: str = "", topic: str = "", level: str = ""):
+    """Key identical generation requests on (endpoint, text, topic, level)."""
+    return (endpoint, normalize(text), normalize(topic), normalize(level))
+
+
+class SingleFlight:
+    """Coalesce concurrent calls with the same key onto one in-flight task.
+
+    The first caller for a key starts the work; callers arriving while it
+    is still running await the same task and get the same result (or
+    exception). The task is shielded, so a caller that disconnects does
+    not cancel the work for everyone else.
+    """
+
+    def __init__(self):
+        self._inflight = {}
+        self._stats = defaultdict(lambda: {"calls": 0, "executed": 0, "coalesced": 0})
+
+    async def do(self, key, fn):
+        endpoint_stats = self._stats[key[0]]
+        endpoint_stats["calls"] += 1
+        task = self._inflight.get(key)
+        if task is None:
+            endpoint_stats["executed"] += 1
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._finish(key, t))
+        else:
+            endpoint_stats["coalesced"] += 1
+        return await asyncio.shield(task)
+
+    def _finish(self, key, task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            # Mark the exception as retrieved in case every waiter went away
+            task.exception()
+
+    def stats(self):
+        return {
+            "inflight": len(self._inflight),
+            "endpoints": {name: dict(values) for name, values in self._stats.items()},
+            "coalesced": sum(values["coalesced"] for values in self._stats.values()),
+        }
+
+
+generations = SingleFlight()
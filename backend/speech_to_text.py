@@ -1,72 +1,312 @@
+import asyncio
+import io
 import os
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 
 
+import requests
 from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
 from huggingface_hub import InferenceClient
 
+import audio_preprocess
+import audio_segments
+import transcript_cache
+from provider_errors import QuotaExceededError
+
 load_dotenv()
 
 DEFAULT_PROVIDER = os.getenv("HF_PROVIDER", "fal-ai")
 DEFAULT_HF_ASR_MODEL = os.getenv("HF_ASR_MODEL", "openai/whisper-large-v3")
+MAX_PARALLEL_SEGMENTS = int(os.getenv("TRANSCRIBE_MAX_PARALLEL_SEGMENTS", "4"))
+# Overridable so the fallback can be pointed at a local stub server
+ROUTER_URL = os.getenv("HF_ROUTER_URL", "https://router.huggingface.co/hf-inference/models").rstrip("/")
+REQUEST_TIMEOUT_SECONDS = float(os.getenv("TRANSCRIBE_TIMEOUT_SECONDS", "300"))
+HEDGE_AFTER_SECONDS = float(os.getenv("TRANSCRIBE_HEDGE_AFTER_SECONDS", "0"))
+HTTP_POOL_SIZE = int(os.getenv("TRANSCRIBE_HTTP_POOL_SIZE", "16"))
+
+_session = None
+_inference_clients = {} # (provider, token) -> InferenceClient
+_clients_lock = threading.Lock()
+_hedge_pool = ThreadPoolExecutor(max_workers=HTTP_POOL_SIZE, thread_name_prefix="asr-hedge")
+
+
+class SegmentFile(io.BytesIO):
+    """In-memory WAV for one segment, shaped like the uploads transcribe_audio takes."""
+
+    type = "audio/wav"
+
+
+def load_audio(uploaded_file):
+    """WavSource reading a 16-bit PCM WAV upload on demand; None for other formats."""
+    return audio_segments.open_wav(uploaded_file)
+
+
+def is_long(audio) -> bool:
+    return audio.duration >= audio_segments.SEGMENT_MIN_SECONDS
+
+
+def plan(audio):
+    """Frame ranges of a WavSource to transcribe separately, and the loudness to judge silence by.
+
+    A short recording is one range and preprocessing measures its own
+    loudness (None). A long one takes a streaming pass for frame energies,
+    which place the cuts and give one loudness for all of its segments.
+    """
+    if not is_long(audio):
+        return [(0, audio.frames)], None
+    energy, frame = audio_segments.source_energy(audio)
+    ranges = audio_segments.plan_segments(audio.frames, audio.sample_rate, energy, frame)
+    return ranges, audio_preprocess.loudness(energy)
+
+
+def segment_file(audio, start: int, end: int, loud: float = None):
+    """Frames [start, end) as an in-memory WAV, preprocessed unless AUDIO_PREPROCESS=0.
+
+    Returns the file and the seconds of silence preprocessing removed.
+    """
+    pcm = audio_segments.PcmAudio(audio.read(start, end), audio.sample_rate)
+    removed = 0.0
+    if audio_preprocess.PREPROCESS_ENABLED:
+        processed = audio_preprocess.preprocess(pcm, loud)
+        removed = pcm.duration - processed.duration
+        pcm = processed
+    return SegmentFile(audio_segments.encode_wav(pcm.samples, pcm.sample_rate)), removed
+
+
+def transcribe_segment(audio, start: int, end: int, model: str | None = None, loud: float = None):
+    """Read, encode and transcribe one range; returns (text, bytes sent, seconds removed).
+
+    The segment only exists while this runs, so however long the recording,
+    at most MAX_PARALLEL_SEGMENTS segments are in memory at once.
+    """
+    segment, removed = segment_file(audio, start, end, loud)
+    sent = len(segment.getbuffer())
+    return transcribe_single(segment, model), sent, removed
+
+
+def cache_key(uploaded_file, model: str | None = None) -> str:
+    return transcript_cache.make_key(uploaded_file, model or DEFAULT_HF_ASR_MODEL)
+
+
+def transcribe(uploaded_file, model: str | None = None) -> dict:
+    """Transcribe an upload, returning {"transcript", "cached"}.
+
+    Identical audio sent to the same model is answered from
+    transcript_cache without calling the provider. WAV uploads are first
+    shrunk by audio_preprocess (the result then also has "preprocessing"
+    with the bytes saved). Long recordings are split and transcribed in
+    parallel: segments are cut at silences with a short overlap, sent
+    MAX_PARALLEL_SEGMENTS at a time and stitched back in order.
+    """
+    key = cache_key(uploaded_file, model)
+    cached = transcript_cache.get(key)
+    if cached is not None:
+        return {"transcript": cached, "cached": True}
+    return transcribe_decoded(uploaded_file, load_audio(uploaded_file), model, key)
+
+
+def transcribe_decoded(uploaded_file, audio, model: str | None = None, key: str | None = None) -> dict:
+    """transcribe() for an upload already opened with load_audio, storing the result under `key`."""
+    result = {"cached": False}
+    if audio is None or (not is_long(audio) and not audio_preprocess.PREPROCESS_ENABLED):
+        transcript = transcribe_single(uploaded_file, model)
+    else:
+        ranges, loud = plan(audio)
+        with ThreadPoolExecutor(max_workers=MAX_PARALLEL_SEGMENTS) as pool:
+            segments = list(pool.map(lambda r: transcribe_segment(audio, r[0], r[1], model, loud), ranges))
+        transcript = audio_segments.stitch([text for text, _, _ in segments])
+        if audio_preprocess.PREPROCESS_ENABLED:
+            result["preprocessing"] = audio_preprocess.record(
+                audio.source_bytes, sum(sent for _, sent, _ in segments), sum(removed for _, _, removed in segments)
+            )
+    if key:
+        transcript_cache.put(key, model or DEFAULT_HF_ASR_MODEL, transcript)
+    return {"transcript": transcript, **result}
 
 
 def transcribe_audio(uploaded_file, model: str | None = None) -> str:
+    return transcribe(uploaded_file, model)["transcript"]
+
+
+async def stream_transcription(audio, model: str | None = None, key: str | None = None):
+    """Yield partial transcripts of a long WavSource as its segments finish.
+
+    Each segment yields {"segment", "segments", "text"} in completion order,
+    followed by {"transcript": ..., "cached": False, ...} with the stitched
+    result, which is stored under `key` in transcript_cache. The generator
+    owns `audio` and closes it when done; closing the generator early
+    cancels the segments not yet started.
     """
-    Transcribe using Hugging Face Inference Providers via `huggingface_hub`.
+    try:
+        ranges, loud = await asyncio.to_thread(plan, audio)
+        semaphore = asyncio.Semaphore(MAX_PARALLEL_SEGMENTS)
 
-    Required env:
-      - HF_TOKEN (or HF_API_TOKEN)
-    Optional env:
-      - HF_PROVIDER (default: fal-ai)
-      - HF_ASR_MODEL (default: openai/whisper-large-v3)
+        async def run(index, start, end):
+            async with semaphore:
+                return index, await asyncio.to_thread(transcribe_segment, audio, start, end, model, loud)
+
+        tasks = [asyncio.create_task(run(index, start, end)) for index, (start, end) in enumerate(ranges)]
+        segments = [None] * len(ranges)
+        try:
+            for finished in asyncio.as_completed(tasks):
+                index, segment = await finished
+                segments[index] = segment
+                yield {"segment": index, "segments": len(ranges), "text": segment[0]}
+        finally:
+            for task in tasks:
+                task.cancel()
+        transcript = audio_segments.stitch([text for text, _, _ in segments])
+        if key:
+            await asyncio.to_thread(transcript_cache.put, key, model or DEFAULT_HF_ASR_MODEL, transcript)
+        result = {"transcript": transcript, "cached": False}
+        if audio_preprocess.PREPROCESS_ENABLED:
+            result["preprocessing"] = audio_preprocess.record(
+                audio.source_bytes, sum(sent for _, sent, _ in segments), sum(removed for _, _, removed in segments)
+            )
+        yield result
+    finally:
+        audio.close()
+
+
+def get_session():
+    """Process-wide requests session, so router calls reuse kept-alive TLS connections."""
+    global _session
+    if _session is None:
+        with _clients_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=4, pool_maxsize=HTTP_POOL_SIZE)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _session = session
+    return _session
+
+
+def get_inference_client(provider: str, token: str):
+    """One InferenceClient per (provider, token), created on first use and then reused.
+
+    Calls time out like the router requests, so a hung provider cannot hold
+    a hedge pool thread forever.
     """
-    def get_api_key(name):
-        return os.getenv(name) 
+    key = (provider, token)
+    client = _inference_clients.get(key)
+    if client is None:
+        with _clients_lock:
+            client = _inference_clients.get(key)
+            if client is None:
+                client = _inference_clients[key] = InferenceClient(
+                    provider=provider, api_key=token, timeout=REQUEST_TIMEOUT_SECONDS
+                )
+    return client
+
 
-    token = get_api_key("HF_TOKEN") or get_api_key("HF_API_TOKEN") or get_api_key("HUGGINGFACEHUB_API_TOKEN")
+def get_token():
+    token = os.getenv("HF_TOKEN") or os.getenv("HF_API_TOKEN") or os.getenv("HUGGINGFACEHUB_API_TOKEN")
     if not token:
         raise RuntimeError(
             "HF_TOKEN is missing. Create a Hugging Face access token and set it in your .env as HF_TOKEN=..."
         )
+    return token
 
-    # Hugging Face Inference API often requires knowing the MIME type or filename.
-    # We can pass the raw bytes directly to requests if InferenceClient fails, 
-    # but the easiest fix for InferenceClient is to use standard HTTP post.
-    import requests
-    
-    headers = {"Authorization": f"Bearer {token}"}
-    model_id = model or DEFAULT_HF_ASR_MODEL
-    
-    if DEFAULT_PROVIDER:
-        # If using another provider route 
-        try:
-            client = InferenceClient(provider=DEFAULT_PROVIDER, api_key=token)
-            audio_bytes = uploaded_file.read()
-            output = client.automatic_speech_recognition(audio_bytes, model=model_id)
-            if hasattr(output, "text") or (isinstance(output, dict) and "text" in output):
-                return (getattr(output, "text", "") if hasattr(output, "text") else output.get("text", "")).strip()
-        except Exception:
-            pass # fallback below
-            
-    # Reset file pointer if read above
-    uploaded_file.seek(0)
-    
-    # Fallback to direct HTTP request to default API
-    API_URL = f"https://router.huggingface.co/hf-inference/models/{model_id}"
-    if hasattr(uploaded_file, "type") and uploaded_file.type:
-        headers["Content-Type"] = uploaded_file.type
-    audio_bytes = uploaded_file.read()
-    response = requests.post(API_URL, headers=headers, data=audio_bytes)
-    
-    if response.status_code != 200:
-        raise RuntimeError(f"Hugging Face API Error {response.status_code}: {response.text}")
-        
-    output = response.json()
 
+def _output_text(output):
     # output can be a dict-like or an object; handle both.
     if hasattr(output, "text"):
         return (getattr(output, "text") or "").strip()
     if isinstance(output, dict) and "text" in output:
         return (output.get("text") or "").strip()
+    return None
+
+
+def transcribe_with_provider(payload, model_id: str, token: str):
+    """Transcribe through DEFAULT_PROVIDER; None if the response carries no text."""
+    client = get_inference_client(DEFAULT_PROVIDER, token)
+    return _output_text(client.automatic_speech_recognition(payload, model=model_id))
+
+
+def transcribe_with_router(payload, content_type, model_id: str, token: str) -> str:
+    """Transcribe through the hf-inference router with a plain HTTP POST."""
+    headers = {"Authorization": f"Bearer {token}"}
+    if content_type:
+        headers["Content-Type"] = content_type
+    # requests streams file-like bodies from their current position
+    response = get_session().post(
+        f"{ROUTER_URL}/{model_id}", headers=headers, data=payload, timeout=REQUEST_TIMEOUT_SECONDS
+    )
+
+    if response.status_code == 429:
+        retry_after = response.headers.get("Retry-After")
+        raise QuotaExceededError(
+            f"Hugging Face API Error 429: {response.text}",
+            retry_after=float(retry_after) if retry_after and retry_after.isdigit() else None,
+        )
+    if response.status_code != 200:
+        raise RuntimeError(f"Hugging Face API Error {response.status_code}: {response.text}")
+
+    output = response.json()
+    text = _output_text(output)
+    return text if text is not None else str(output).strip()
+
+
+def _hedged(payload, content_type, model_id: str, token: str) -> str:
+    """Race the router against a slow provider call and return the first transcript.
+
+    The router request only starts if the provider has not answered within
+    HEDGE_AFTER_SECONDS. The losing call is left to finish in the background.
+    """
+    primary = _hedge_pool.submit(transcribe_with_provider, payload, model_id, token)
+    done, _ = wait([primary], timeout=HEDGE_AFTER_SECONDS)
+    if done and primary.exception() is None and primary.result() is not None:
+        return primary.result()
+    pending = {_hedge_pool.submit(transcribe_with_router, payload, content_type, model_id, token)}
+    if not done:
+        pending.add(primary)
+    error = None
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is not None:
+                # Surface the router's error, as the sequential path does
+                if future is not primary:
+                    error = future.exception()
+            elif future.result() is not None:
+                return future.result()
+    raise error
+
+
+def transcribe_single(uploaded_file, model: str | None = None) -> str:
+    """
+    Transcribe using Hugging Face Inference Providers via `huggingface_hub`,
+    falling back to the hf-inference router.
+
+    Required env:
+      - HF_TOKEN (or HF_API_TOKEN)
+    Optional env:
+      - HF_PROVIDER (default: fal-ai; empty to only use the router)
+      - HF_ASR_MODEL (default: openai/whisper-large-v3)
+      - TRANSCRIBE_HEDGE_AFTER_SECONDS (default: 0, off) start the router
+        request when the provider has not answered within this many seconds
+    """
+    token = get_token()
+    model_id = model or DEFAULT_HF_ASR_MODEL
+    content_type = getattr(uploaded_file, "type", None)
+
+    if DEFAULT_PROVIDER and HEDGE_AFTER_SECONDS > 0:
+        # Both requests need the audio at once, so it is read into memory here
+        payload = uploaded_file.getvalue() if hasattr(uploaded_file, "getvalue") else uploaded_file.read()
+        return _hedged(payload, content_type, model_id, token)
+
+    if DEFAULT_PROVIDER:
+        try:
+            # Pass the file object itself so the audio is not copied into memory
+            text = transcribe_with_provider(uploaded_file, model_id, token)
+            if text is not None:
+                return text
+        except Exception:
+            pass # fallback below
+        # Reset file pointer if read above
+        uploaded_file.seek(0)
 
-    return str(output).strip()
+    return transcribe_with_router(uploaded_file, content_type, model_id, token)
@@ -0,0 +1,101 @@
+import threading
+from contextlib import contextmanager
+
+from sqlalchemy.exc import IntegrityError
+
+from database import SessionLocal, engine
+
+# Rows deleted per statement, and per transaction, when a cache table is trimmed
+EVICT_BATCH_SIZE = 500
+
+
+class SqlCacheTable:
+    """The database side of a cache kept in the app database.
+
+    `model` needs a string primary key `key` and a `last_used_at` column.
+    The table is created on first use, so the cache also works on databases
+    made before it existed. Every `evict_every` stored rows, `evict(db)` is
+    called to bring the table back within its bounds; purge() and trim()
+    let it do so a bounded batch at a time.
+    """
+
+    def __init__(self, model, evict, evict_every: int):
+        self.model = model
+        self.evict = evict
+        self.evict_every = evict_every
+        self._lock = threading.Lock()
+        self._ready = False
+        self._writes_since_evict = 0
+
+    def _ensure_table(self):
+        if not self._ready:
+            with self._lock:
+                if not self._ready:
+                    self.model.__table__.create(bind=engine, checkfirst=True)
+                    self._ready = True
+
+    @contextmanager
+    def session(self):
+        self._ensure_table()
+        db = SessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    def store(self, db, entry) -> bool:
+        """Upsert `entry`, evicting when due. False if a concurrent writer stored the key first."""
+        db.merge(entry)
+        try:
+            db.commit()
+        except IntegrityError:
+            # Both inserted the same new key; the other row is as good as ours
+            db.rollback()
+            return False
+        with self._lock:
+            self._writes_since_evict += 1
+            due = self._writes_since_evict >= self.evict_every
+            if due:
+                self._writes_since_evict = 0
+        if due:
+            self.evict(db)
+        return True
+
+    def delete(self, db, key: str):
+        db.query(self.model).filter(self.model.key == key).delete(synchronize_session=False)
+        db.commit()
+
+    def purge(self, db, condition) -> int:
+        """Delete the rows matching `condition`, one batch per transaction; returns how many."""
+        deleted = 0
+        while True:
+            keys = [key for key, in db.query(self.model.key).filter(condition).limit(EVICT_BATCH_SIZE)]
+            if not keys:
+                return deleted
+            deleted += self._delete_keys(db, keys)
+
+    def trim(self, db, excess: int, weight=None) -> int:
+        """Delete least recently used rows until they add up to `excess`, one batch per transaction.
+
+        Each row counts 1, or the value of its `weight` column. Returns the
+        number of rows deleted.
+        """
+        deleted = 0
+        columns = [self.model.key] if weight is None else [self.model.key, weight]
+        while excess > 0:
+            rows = db.query(*columns).order_by(self.model.last_used_at.asc()).limit(EVICT_BATCH_SIZE).all()
+            if not rows:
+                break
+            keys = []
+            for row in rows:
+                if excess <= 0:
+                    break
+                keys.append(row[0])
+                excess -= 1 if weight is None else (row[1] or 0)
+            deleted += self._delete_keys(db, keys)
+        return deleted
+
+    def _delete_keys(self, db, keys) -> int:
+        deleted = db.query(self.model).filter(self.model.key.in_(keys)).delete(synchronize_session=False)
+        db.commit()
+        return deleted
@@ -1,55 +1,187 @@
-import os
-
+import json
 from datetime import date
-from google import genai
-from dotenv import load_dotenv
 
-# Load keys from .env if present
-load_dotenv()
+import json_stream
+import llm_cache
+import llm_gateway
+import llm_scheduler
+import plan_schedule
 
-def get_api_key(name):
-    """Retrieve API key from environment or streamlit secrets."""
-    return os.getenv(name) 
+STUDY_ONLY_MESSAGE = "This is for study purposes only."
 
-client = genai.Client(api_key=get_api_key("GEMINI_API_KEY"))
 
-STUDY_ONLY_MESSAGE = "This is for study purposes only."
+def build_fill_prompt(schedule):
+    """Ask only for short texts: one focus line per study session, an overview and tips.
+
+    The dates, hours and order are already fixed locally, so the answer is a
+    small JSON object instead of a full written plan. Sessions come first
+    and as an array, so a streamed answer can be shown one session at a time.
+    """
+    sessions = "\n".join(
+        f"{n}|{topic}|part {part} of {parts}"
+        for n, (topic, part, parts) in enumerate(plan_schedule.study_sessions(schedule), 1)
+    )
+    topics = ", ".join(topic["name"] for topic in schedule["topics"])
+    return f"""You are a study planner. Only help with educational subjects and exam/learning goals.
+If the topics are NOT related to education or studying (e.g. hobbies, work tasks, non-academic), respond with exactly this JSON and nothing else:
+{{"study_only": true}}
+
+Otherwise, a schedule has already been made for these topics: {topics}
+It runs from {schedule["start_date"]} to {schedule["end_date"]}, {schedule["hours_per_day"]:g} hours per study day.
+Each line below is one study session as id|topic|part. Split every topic into a sensible progression of subtopics across its parts.
+
+{sessions}
+
+Return ONLY valid JSON in this exact shape (no markdown, no code fence):
+{{"sessions": [{{"id": 1, "focus": "what to study in session 1, at most 12 words"}}, ...], "overview": "2-3 sentences about the plan", "tips": ["short tip", "short tip", "short tip"]}}
+"""
+
+
+def parse_fill(raw: str):
+    """The model's JSON answer, or None if it does not parse."""
+    try:
+        return json.loads(json_stream.strip_fences(raw))
+    except ValueError:
+        return None
+
+
+def is_valid_fill(fill) -> bool:
+    """Whether the model's answer has the requested shape: sessions and tips lists, overview a string."""
+    return (
+        isinstance(fill, dict)
+        and isinstance(fill.get("sessions"), list)
+        and isinstance(fill.get("tips", []), list)
+        and isinstance(fill.get("overview", ""), str)
+    )
+
+
+def session_focus(item):
+    """(session id, focus text) of one element of the answer's sessions, or None."""
+    if not isinstance(item, dict) or not isinstance(item.get("focus"), str) or not item["focus"].strip():
+        return None
+    session_id = item.get("id")
+    if isinstance(session_id, bool) or not isinstance(session_id, (int, str)):
+        return None
+    return str(session_id).strip(), item["focus"].strip()
+
+
+def session_labels(schedule):
+    """Session id (as in the fill prompt) -> "Monday 2026-03-02: Algebra (part 1/3)"."""
+    ids = {session[:2]: str(n) for n, session in enumerate(plan_schedule.study_sessions(schedule), 1)}
+    labels = {}
+    for entry in schedule["days"]:
+        for slot in entry["slots"]:
+            if slot["kind"] == "study":
+                labels.setdefault(
+                    ids[(slot["topic"], slot["part"])],
+                    f"{entry['weekday']} {entry['date']}: {slot['topic']} (part {slot['part']}/{slot['parts']})",
+                )
+    return labels
+
+
+def apply_fill(schedule, fill):
+    """Copy the model's per-session focus texts into the schedule's slots.
+
+    A fill of the wrong shape (see is_valid_fill) adds no texts.
+    """
+    if not is_valid_fill(fill):
+        fill = {}
+    focus = dict(filter(None, map(session_focus, fill.get("sessions") or [])))
+    ids = {session[:2]: str(n) for n, session in enumerate(plan_schedule.study_sessions(schedule), 1)}
+    for entry in schedule["days"]:
+        for slot in entry["slots"]:
+            if slot["kind"] == "study":
+                text = focus.get(ids[(slot["topic"], slot["part"])])
+                if text:
+                    slot["focus"] = text
+    schedule["overview"] = (fill.get("overview") or "").strip()
+    tips = fill.get("tips") or []
+    schedule["tips"] = [tip.strip() for tip in tips if isinstance(tip, str) and tip.strip()][:5]
+    return schedule
 
 
-def generate_study_plan(
+async def build_study_plan(
     topics: str,
     start_date: str = "",
     end_date: str = "",
     hours_per_day: str = "2",
     days_per_week: str = "7",
+    use_cache: bool = True,
 ):
-    """Generate a structured study plan. Topics must be study-related."""
-    start = start_date or str(date.today())
-    end = end_date or "Not specified"
-    prompt = f"""You are a study planner. Only create plans for educational subjects and exam/learning goals.
-If the topics given are NOT related to education or studying (e.g. hobbies, work tasks, non-academic), respond with exactly this sentence and nothing else: {STUDY_ONLY_MESSAGE}
-
-Otherwise, create a clear, practical study plan with:
-1. A short overview (2–3 sentences) of the plan.
-2. A schedule from the start date to the end date (today → deadline). Use week-by-week or day-by-day depending on the timeframe, with:
-   - What to study each period (specific topics/subtasks)
-   - Suggested time per topic/session
-   - Optional short tips (spaced repetition, practice problems, etc.)
-3. A brief closing reminder (e.g. rest, review days).
-
-User inputs:
-- Topics or subjects to cover: {topics}
-- Start date: {start}
-- End date / deadline: {end}
-- Hours available per day: {hours_per_day}
-- Study days per week: {days_per_week}
-
-Format the plan in clear sections with headings. Use bullet points and short paragraphs. Keep it actionable and realistic for the time given.
-"""
+    """Return (schedule, markdown) for a study plan, or (None, STUDY_ONLY_MESSAGE).
 
-    response = client.models.generate_content(
-        model="gemini-2.5-flash",
-        contents=prompt,
-    )
+    The calendar is laid out by plan_schedule; the model is asked once for
+    short per-session texts. If its answer cannot be parsed or has the
+    wrong shape, the plan is still returned, without those texts. Raises
+    plan_schedule.PlanInputError for inputs that cannot be scheduled.
+    """
+    schedule = plan_schedule.build_schedule(topics, start_date, end_date, hours_per_day, days_per_week, date.today())
+    prompt = build_fill_prompt(schedule)
+    fill = parse_fill(await llm_gateway.generate(prompt, use_cache=use_cache, priority=llm_scheduler.BACKGROUND))
+    if isinstance(fill, dict) and fill.get("study_only"):
+        return None, STUDY_ONLY_MESSAGE
+    if not is_valid_fill(fill):
+        # Don't keep serving an unusable response from the cache
+        await llm_cache.discard(llm_gateway.DEFAULT_MODEL, prompt)
+        fill = None
+    schedule = apply_fill(schedule, fill)
+    return schedule, plan_schedule.render_markdown(schedule, schedule["overview"], schedule["tips"])
+
+
+async def generate_study_plan(
+    topics: str,
+    start_date: str = "",
+    end_date: str = "",
+    hours_per_day: str = "2",
+    days_per_week: str = "7",
+    use_cache: bool = True,
+):
+    """Generate a structured study plan as Markdown. Topics must be study-related."""
+    _, plan = await build_study_plan(topics, start_date, end_date, hours_per_day, days_per_week, use_cache)
+    return plan
+
+
+async def stream_study_plan(
+    topics: str,
+    start_date: str = "",
+    end_date: str = "",
+    hours_per_day: str = "2",
+    days_per_week: str = "7",
+    use_cache: bool = True,
+):
+    """Yield the study plan as Markdown chunks.
+
+    The locally built calendar is sent first, one section at a time, before
+    the model is called. Then each session's focus line is sent under
+    "Session focus" as soon as the model has written it, followed by the
+    overview and tips. For non-study topics the calendar is followed by
+    STUDY_ONLY_MESSAGE. Raises plan_schedule.PlanInputError before
+    yielding anything for inputs that cannot be scheduled.
+    """
+    schedule = plan_schedule.build_schedule(topics, start_date, end_date, hours_per_day, days_per_week, date.today())
+    for n, section in enumerate(plan_schedule.render_markdown(schedule).split("\n\n### ")):
+        yield section if n == 0 else "\n\n### " + section
+
+    prompt = build_fill_prompt(schedule)
+    labels = session_labels(schedule)
+    parser = json_stream.ArrayItemParser("sessions")
+    heading = "\n\n### Session focus"
+    async for chunk in llm_gateway.stream(prompt, use_cache=use_cache, priority=llm_scheduler.BACKGROUND):
+        for item in parser.feed(chunk):
+            focus = session_focus(item)
+            if focus and focus[0] in labels:
+                yield f"{heading}\n- **{labels[focus[0]]}** - {focus[1]}"
+                heading = ""
 
-    return (response.text or "").strip()
+    fill = parse_fill(parser.buffer)
+    if isinstance(fill, dict) and fill.get("study_only"):
+        yield f"\n\n{STUDY_ONLY_MESSAGE}"
+        return
+    if not is_valid_fill(fill):
+        await llm_cache.discard(llm_gateway.DEFAULT_MODEL, prompt)
+        return
+    schedule = apply_fill(schedule, fill)
+    if schedule["overview"]:
+        yield f"\n\n### Summary\n{schedule['overview']}"
+    if schedule["tips"]:
+        yield "\n\n### Tips\n" + "\n".join(f"- {tip}" for tip in schedule["tips"])
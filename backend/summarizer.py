@@ -1,19 +1,29 @@
+import asyncio
 import os
+import re
 
-from google import genai
-from dotenv import load_dotenv
+import llm_gateway
 
-# Load keys from .env if present
-load_dotenv()
+STUDY_ONLY_MESSAGE = "This is for study purposes only."
 
-def get_api_key(name):
-    """Retrieve API key from environment or streamlit secrets."""
-    return os.getenv(name) 
+# Notes longer than this (in estimated tokens) go through the map-reduce path
+CHUNK_TOKEN_BUDGET = int(os.getenv("SUMMARY_CHUNK_TOKENS", "6000"))
+MAX_PARALLEL_CHUNKS = int(os.getenv("SUMMARY_MAX_PARALLEL_CHUNKS", "4"))
 
-client = genai.Client(api_key=get_api_key("GEMINI_API_KEY"))
+FORMATTING_RULES = """FORMATTING RULES:
+1. Use '###' for main section headings.
+2. Use '####' or bold text for sub-headings.
+3. Use bullet points (-) for lists and ensure each point is on a new line.
+4. Use proper spacing (newlines) between paragraphs and sections.
+5. DO NOT use asterisks (*) as decorators or separators within a paragraph.
+6. Use bold text for key terms only.
+7. Ensure the output is clean and highly readable Markdown."""
 
-def summarize_text(text):
-    prompt = f"""You are a strict academic note-taking assistant. You only process formal educational material (e.g. academia, sciences, math, programming, history, literature, medicine, business).
+_HEADING_RE = re.compile(r"^\s{0,3}#{1,6}\s", re.MULTILINE)
+
+
+def build_summary_prompt(text):
+    return f"""You are a strict academic note-taking assistant. You only process formal educational material (e.g. academia, sciences, math, programming, history, literature, medicine, business).
 
 CRITICAL RULE: If the following text is about pop-culture, movies, television, entertainment, gaming, casual conversation, or ANY non-academic topic, you MUST reject it. 
 
@@ -22,22 +32,183 @@ This is for study purposes only.
 
 Otherwise, if it strictly passes the rule, summarize the educational content into clear, well-structured study notes.
 
-FORMATTING RULES:
-1. Use '###' for main section headings.
-2. Use '####' or bold text for sub-headings.
-3. Use bullet points (-) for lists and ensure each point is on a new line.
-4. Use proper spacing (newlines) between paragraphs and sections.
-5. DO NOT use asterisks (*) as decorators or separators within a paragraph.
-6. Use bold text for key terms only.
-7. Ensure the output is clean and highly readable Markdown.
+{FORMATTING_RULES}
 
 Text:
 {text}
 """
 
-    response = client.models.generate_content(
-        model="gemini-2.5-flash",
-        contents=prompt,
-    )
 
-    return response.text
+def build_chunk_prompt(chunk):
+    # The prompt deliberately carries no chunk index or count, so an unchanged
+    # section hashes to the same cache key even when other sections are edited.
+    return f"""You are a strict academic note-taking assistant. The text below is one section of a longer document.
+
+If this section is not academic study material (e.g. pop-culture, entertainment, casual conversation), respond with EXACTLY this sentence and nothing else:
+{STUDY_ONLY_MESSAGE}
+
+Otherwise, condense it into concise study notes that keep every key term, definition, formula and fact. Do not add an introduction or conclusion.
+
+{FORMATTING_RULES}
+
+Section:
+{chunk}
+"""
+
+
+def build_merge_prompt(partial_notes):
+    joined = "\n\n---\n\n".join(partial_notes)
+    return f"""You are a strict academic note-taking assistant. Below are study notes written for consecutive sections of one document, separated by '---'.
+
+Merge them into a single set of clear, well-structured study notes. Remove repetition, keep the original order of topics, and keep every key term and fact.
+
+{FORMATTING_RULES}
+
+Section notes:
+{joined}
+"""
+
+
+def estimate_tokens(text):
+    """Rough token count (about 4 characters per token) used for chunk budgeting."""
+    return len(text) // 4 + 1
+
+
+def _split_oversized(block, budget):
+    """Split a block that alone exceeds the budget at sentence, then character, boundaries."""
+    max_chars = budget * 4
+    pieces, current = [], ""
+    for sentence in re.split(r"(?<=[.!?])\s+", block):
+        while len(sentence) > max_chars:
+            pieces.append(sentence[:max_chars])
+            sentence = sentence[max_chars:]
+        if current and len(current) + len(sentence) + 1 > max_chars:
+            pieces.append(current)
+            current = ""
+        current = f"{current} {sentence}" if current else sentence
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def split_into_chunks(text, budget=None):
+    """Split notes into chunks of at most `budget` estimated tokens.
+
+    Notes within the budget are one chunk. Longer notes break at Markdown
+    headings: adjacent sections are packed greedily up to the budget, and
+    only a section that alone exceeds it is split further, at blank-line
+    paragraph boundaries. Editing a section can move the chunk boundaries
+    after it, but the chunks before it (and their cache entries) stay the
+    same.
+    """
+    budget = budget or CHUNK_TOKEN_BUDGET
+    text = (text or "").strip()
+    if not text:
+        return []
+    if estimate_tokens(text) <= budget:
+        return [text]
+    starts = [m.start() for m in _HEADING_RE.finditer(text)]
+    if not starts or starts[0] != 0:
+        starts.insert(0, 0)
+    sections = [text[a:b].strip() for a, b in zip(starts, starts[1:] + [len(text)])]
+
+    chunks, packed = [], ""
+    for section in filter(None, sections):
+        candidate = f"{packed}\n\n{section}" if packed else section
+        if estimate_tokens(candidate) <= budget:
+            packed = candidate
+            continue
+        if packed:
+            chunks.append(packed)
+        if estimate_tokens(section) <= budget:
+            packed = section
+            continue
+        packed = ""
+        current = ""
+        for paragraph in re.split(r"\n\s*\n", section):
+            paragraph = paragraph.strip()
+            if not paragraph:
+                continue
+            candidate = f"{current}\n\n{paragraph}" if current else paragraph
+            if estimate_tokens(candidate) <= budget:
+                current = candidate
+                continue
+            if current:
+                chunks.append(current)
+            if estimate_tokens(paragraph) <= budget:
+                current = paragraph
+            else:
+                chunks.extend(_split_oversized(paragraph, budget))
+                current = ""
+        if current:
+            chunks.append(current)
+    if packed:
+        chunks.append(packed)
+    return chunks
+
+
+async def _map_chunks(chunks, use_cache):
+    semaphore = asyncio.Semaphore(MAX_PARALLEL_CHUNKS)
+
+    async def summarize_chunk(chunk):
+        async with semaphore:
+            return (await llm_gateway.generate(build_chunk_prompt(chunk), use_cache=use_cache)).strip()
+
+    notes = await asyncio.gather(*(summarize_chunk(chunk) for chunk in chunks))
+    return [note for note in notes if note and note != STUDY_ONLY_MESSAGE]
+
+
+async def _reduce_to_budget(notes, use_cache):
+    """Merge partial notes group-wise until they fit into one final merge prompt."""
+    while len(notes) > 1 and estimate_tokens("\n\n".join(notes)) > CHUNK_TOKEN_BUDGET:
+        groups, current = [], []
+        for note in notes:
+            if current and estimate_tokens("\n\n".join(current + [note])) > CHUNK_TOKEN_BUDGET:
+                groups.append(current)
+                current = []
+            current.append(note)
+        groups.append(current)
+        if len(groups) == len(notes):
+            break  # every note already fills the budget on its own
+        semaphore = asyncio.Semaphore(MAX_PARALLEL_CHUNKS)
+
+        async def merge(group):
+            if len(group) == 1:
+                return group[0]
+            async with semaphore:
+                return (await llm_gateway.generate(build_merge_prompt(group), use_cache=use_cache)).strip()
+
+        notes = list(await asyncio.gather(*(merge(group) for group in groups)))
+    return notes
+
+
+async def summarize_text(text, use_cache=True):
+    chunks = split_into_chunks(text or "")
+    if len(chunks) <= 1:
+        prompt = build_summary_prompt(text)
+        return await llm_gateway.generate(prompt, use_cache=use_cache)
+
+    notes = await _reduce_to_budget(await _map_chunks(chunks, use_cache), use_cache)
+    if not notes:
+        return STUDY_ONLY_MESSAGE
+    if len(notes) == 1:
+        return notes[0]
+    return await llm_gateway.generate(build_merge_prompt(notes), use_cache=use_cache)
+
+
+async def stream_summary(text, use_cache=True):
+    """Yield the summary as text chunks while the model generates it.
+
+    Long notes are mapped first; only the final merge pass is streamed.
+    """
+    chunks = split_into_chunks(text or "")
+    if len(chunks) <= 1:
+        prompt = build_summary_prompt(text)
+    else:
+        notes = await _reduce_to_budget(await _map_chunks(chunks, use_cache), use_cache)
+        if len(notes) <= 1:
+            yield notes[0] if notes else STUDY_ONLY_MESSAGE
+            return
+        prompt = build_merge_prompt(notes)
+    async for chunk in llm_gateway.stream(prompt, use_cache=use_cache):
+        yield chunk
@@ -0,0 +1,9 @@
+import os
+import sys
+import tempfile
+
+# Modules are imported the way the app imports them, from the backend directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Keep the tests away from studybuddy.db
+os.environ.setdefault("DATABASE_URL", "sqlite:///" + os.path.join(tempfile.mkdtemp(), "test.db"))
@@ -0,0 +1,61 @@
+import zlib
+
+import pytest
+
+import content_codec
+
+
+LONG_TEXT = "Photosynthesis converts light energy into chemical energy. " * 40
+
+
+def test_long_text_round_trips_compressed():
+    stored = content_codec.encode(LONG_TEXT)
+    assert isinstance(stored, str)
+    assert stored.startswith(content_codec.PREFIX)
+    assert len(stored) < len(LONG_TEXT)
+    assert content_codec.decode(stored) == LONG_TEXT
+
+
+def test_stored_form_is_plain_text():
+    # No NUL bytes, so it fits a VARCHAR/TEXT column on Postgres as well
+    assert "\x00" not in content_codec.encode(LONG_TEXT)
+
+
+def test_short_text_is_stored_as_is():
+    assert content_codec.encode("short note") == "short note"
+    assert content_codec.decode("short note") == "short note"
+
+
+def test_incompressible_text_is_stored_as_is():
+    text = "".join(chr(0x4E00 + (i * 7919) % 20000) for i in range(400))
+    assert content_codec.encode(text) == text
+
+
+def test_text_that_looks_encoded_stays_unambiguous():
+    text = content_codec.PREFIX + "1 not really compressed"
+    stored = content_codec.encode(text)
+    assert stored != text
+    assert content_codec.decode(stored) == text
+
+
+def test_none_passes_through():
+    assert content_codec.encode(None) is None
+    assert content_codec.decode(None) is None
+
+
+def test_legacy_binary_rows_still_decode():
+    legacy = content_codec.LEGACY_MAGIC + bytes([content_codec.VERSION_ZLIB]) + zlib.compress(LONG_TEXT.encode())
+    assert content_codec.is_encoded(legacy)
+    assert content_codec.decode(legacy) == LONG_TEXT
+    assert content_codec.decode(memoryview(b"plain bytes")) == "plain bytes"
+
+
+def test_unknown_version_is_rejected():
+    with pytest.raises(ValueError):
+        content_codec.decode(content_codec.PREFIX + "9AAAA")
+
+
+def test_disabled_compression_still_escapes_the_prefix(monkeypatch):
+    monkeypatch.setattr(content_codec, "COMPRESSION_ENABLED", False)
+    assert content_codec.encode(LONG_TEXT) == LONG_TEXT
+    assert content_codec.decode(content_codec.encode(content_codec.PREFIX + "x")) == content_codec.PREFIX + "x"
@@ -0,0 +1,103 @@
+import asyncio
+import json
+
+import pytest
+
+import flashcard_generator
+import item_generation
+import llm_cache
+import llm_gateway
+import llm_scheduler
+import quiz_generator
+
+QUESTION = {"question": "2 + 2?", "options": ["3", "4"], "correct_index": 1}
+
+
+@pytest.fixture
+def model(monkeypatch):
+    """Serve a canned model response and record cache discards."""
+    state = {"response": "", "discarded": []}
+
+    async def generate(prompt, use_cache=True, priority=llm_scheduler.STANDARD, store=True):
+        return state["response"]
+
+    async def stream(prompt, use_cache=True):
+        response = state["response"]
+        for start in range(0, len(response), 5):
+            yield response[start:start + 5]
+
+    async def discard(model_name, prompt):
+        state["discarded"].append(prompt)
+
+    monkeypatch.setattr(llm_gateway, "generate", generate)
+    monkeypatch.setattr(llm_gateway, "stream", stream)
+    monkeypatch.setattr(llm_cache, "discard", discard)
+    return state
+
+
+async def collect(events):
+    return [event async for event in events]
+
+
+def test_describe_input():
+    assert item_generation.describe_input("", "Cells") == "Topic: Cells"
+    assert item_generation.describe_input("Mitosis.", "") == "Text:\nMitosis."
+    assert item_generation.describe_input("Mitosis.", "Cells") == "Topic: Cells\n\nText:\nMitosis."
+
+
+def test_question_validator():
+    assert quiz_generator.is_valid_question(QUESTION)
+    assert not quiz_generator.is_valid_question({**QUESTION, "correct_index": 2})
+    assert not quiz_generator.is_valid_question({**QUESTION, "correct_index": True})
+    assert not quiz_generator.is_valid_question({**QUESTION, "options": "34"})
+    assert not quiz_generator.is_valid_question({"options": ["3", "4"], "correct_index": 0})
+
+
+def test_flashcard_validator():
+    assert flashcard_generator.is_valid_flashcard({"front": "DNA", "back": "Genetic material"})
+    assert not flashcard_generator.is_valid_flashcard({"front": "DNA", "back": " "})
+    assert not flashcard_generator.is_valid_flashcard({"front": "DNA"})
+
+
+def test_generate_keeps_valid_items(model):
+    model["response"] = json.dumps({"questions": [QUESTION, {"question": "broken"}]})
+    assert asyncio.run(quiz_generator.generate_quiz(topic="Math")) == {"questions": [QUESTION]}
+    assert model["discarded"] == []
+
+
+def test_generate_salvages_truncated_response_and_drops_it_from_cache(model):
+    model["response"] = json.dumps({"questions": [QUESTION, QUESTION]})[:-10]
+    assert asyncio.run(quiz_generator.generate_quiz(topic="Math")) == {"questions": [QUESTION]}
+    assert len(model["discarded"]) == 1
+
+
+def test_generate_study_only_and_errors(model):
+    model["response"] = '{"study_only": true, "message": "Study only."}'
+    assert asyncio.run(flashcard_generator.generate_flashcards(topic="Football scores")) == {
+        "study_only": True, "message": "Study only.",
+    }
+    model["response"] = '{"flashcards": []}'
+    assert asyncio.run(flashcard_generator.generate_flashcards(topic="Cells")) == {"error": "No flashcards were generated."}
+    assert "error" in asyncio.run(flashcard_generator.generate_flashcards())
+
+
+def test_stream_yields_items_then_done(model):
+    card = {"front": "DNA", "back": "Genetic material"}
+    model["response"] = json.dumps({"flashcards": [card, {"front": "no back"}, card]})
+    events = asyncio.run(collect(flashcard_generator.stream_flashcards(topic="Cells")))
+    assert events == [
+        {"type": "flashcard", "index": 0, "flashcard": card},
+        {"type": "flashcard", "index": 1, "flashcard": card},
+        {"type": "done", "count": 2},
+    ]
+
+
+def test_stream_study_only_and_malformed(model):
+    model["response"] = '{"study_only": true}'
+    events = asyncio.run(collect(quiz_generator.stream_quiz(topic="Football scores")))
+    assert events == [{"type": "study_only", "message": item_generation.STUDY_ONLY_MESSAGE}]
+
+    model["response"] = "not json"
+    events = asyncio.run(collect(quiz_generator.stream_quiz(topic="Math")))
+    assert events == [{"type": "error", "detail": "not json"}]
+    assert len(model["discarded"]) == 1
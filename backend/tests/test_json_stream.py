@@ -0,0 +1,47 @@
+import json
+
+import json_stream
+
+DOCUMENT = {"questions": [
+    {"question": "What is {x}?", "options": ["a \"quoted\" }", "b"], "correct_index": 1},
+    {"question": "Second", "options": ["[", "]"], "correct_index": 0},
+]}
+
+
+def test_strip_fences():
+    assert json_stream.strip_fences("```json\n{\"a\": 1}\n```") == "{\"a\": 1}"
+    assert json_stream.strip_fences("  {\"a\": 1} ") == "{\"a\": 1}"
+    assert json_stream.strip_fences(None) == ""
+
+
+def test_parser_yields_each_item_once_whatever_the_chunking():
+    raw = "```json\n" + json.dumps(DOCUMENT) + "\n```"
+    for size in (1, 3, 7, len(raw)):
+        parser = json_stream.ArrayItemParser("questions")
+        items = []
+        for start in range(0, len(raw), size):
+            items.extend(parser.feed(raw[start:start + size]))
+        assert items == DOCUMENT["questions"]
+
+
+def test_parser_ignores_other_arrays_and_nested_objects():
+    raw = json.dumps({"other": [{"x": 1}], "questions": [{"meta": {"deep": [1]}}]})
+    assert json_stream.ArrayItemParser("questions").feed(raw) == [{"meta": {"deep": [1]}}]
+
+
+def test_parse_items_complete_document():
+    document, items = json_stream.parse_items(json.dumps(DOCUMENT), "questions")
+    assert document == DOCUMENT
+    assert items == DOCUMENT["questions"]
+
+
+def test_parse_items_salvages_complete_items_of_a_truncated_response():
+    raw = json.dumps(DOCUMENT)[:-20]
+    document, items = json_stream.parse_items(raw, "questions")
+    assert document is None
+    assert items == DOCUMENT["questions"][:1]
+
+
+def test_parse_items_drops_non_object_elements():
+    document, items = json_stream.parse_items('{"questions": [1, "x", {"ok": true}]}', "questions")
+    assert items == [{"ok": True}]
@@ -0,0 +1,162 @@
+import asyncio
+import time
+import types
+
+import pytest
+
+import llm_scheduler
+from llm_scheduler import BACKGROUND, INTERACTIVE, STANDARD, Scheduler, TokenBucket
+from provider_errors import ProviderOverloadedError, QuotaExceededError
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Replace the scheduler module's monotonic clock with one the test advances."""
+    now = [1000.0]
+    monkeypatch.setattr(llm_scheduler, "time", types.SimpleNamespace(monotonic=lambda: now[0]))
+    return now
+
+
+def test_token_bucket_refills_and_debits(clock):
+    bucket = TokenBucket(60) # one unit per second, at most 60
+    assert bucket.delay_for(60) == 0
+    bucket.consume(50)
+    assert bucket.tokens == 10
+    assert bucket.delay_for(20) == pytest.approx(10)
+    clock[0] += 4
+    assert bucket.delay_for(20) == pytest.approx(6)
+    clock[0] += 1000
+    assert bucket.delay_for(1) == 0
+    assert bucket.tokens == 60 # never more than a minute's worth
+    bucket.consume(-30) # a refund cannot overfill either
+    assert bucket.tokens == 60
+    assert bucket.delay_for(500) == 0 # larger than capacity: waits only for a full bucket
+
+
+def test_retry_delay_bounds(clock, monkeypatch):
+    monkeypatch.setattr(llm_scheduler, "BACKOFF_BASE_SECONDS", 1.0)
+    monkeypatch.setattr(llm_scheduler, "BACKOFF_MAX_SECONDS", 5.0)
+    monkeypatch.setattr(llm_scheduler, "MAX_RETRIES", 3)
+    scheduler = Scheduler()
+    assert scheduler.retry_delay(RuntimeError("boom"), 0) is None
+
+    for attempt in range(3):
+        for _ in range(50):
+            delay = scheduler.retry_delay(QuotaExceededError("429"), attempt)
+            assert 0 <= delay <= min(5.0, 2 ** attempt)
+    assert scheduler.retry_delay(QuotaExceededError("429"), 3) is None
+
+    delay = scheduler.retry_delay(QuotaExceededError("429", retry_after=7), 0)
+    assert 7 <= delay <= 8
+    # Dispatching pauses until the provider's retry time has passed
+    assert scheduler._paused_until == pytest.approx(clock[0] + delay)
+    assert not scheduler.is_idle()
+
+
+def test_waiters_are_dispatched_by_priority_then_arrival():
+    async def main():
+        scheduler = Scheduler(max_concurrency=1, requests_per_minute=6000)
+        order = []
+
+        async def call(name, priority):
+            async with scheduler.slot(priority, 1):
+                order.append(name)
+
+        await scheduler.acquire(STANDARD, 1) # occupies the only slot
+        tasks = []
+        for name, priority in [("background", BACKGROUND), ("standard", STANDARD),
+                               ("chat-1", INTERACTIVE), ("chat-2", INTERACTIVE)]:
+            tasks.append(asyncio.create_task(call(name, priority)))
+            await asyncio.sleep(0)
+        assert scheduler.queue_length == 4
+        scheduler.release()
+        await asyncio.gather(*tasks)
+        return order, scheduler.stats()
+
+    order, stats = asyncio.run(main())
+    assert order == ["chat-1", "chat-2", "standard", "background"]
+    assert stats["running"] == 0 and stats["queued"] == 0 and stats["dispatched"] == 5
+
+
+def test_full_queue_sheds_with_retry_after():
+    async def main():
+        scheduler = Scheduler(max_concurrency=1, requests_per_minute=60, max_queue=2)
+        await scheduler.acquire(STANDARD, 1)
+        waiters = [asyncio.create_task(scheduler.acquire(STANDARD, 1)) for _ in range(2)]
+        await asyncio.sleep(0)
+        with pytest.raises(ProviderOverloadedError) as raised:
+            await scheduler.acquire(INTERACTIVE, 1)
+        for waiter in waiters:
+            waiter.cancel()
+        await asyncio.gather(*waiters, return_exceptions=True)
+        return raised.value, scheduler.stats()
+
+    error, stats = asyncio.run(main())
+    # Two waiters ahead, one request per second, one slot
+    assert error.retry_after == 2
+    assert stats["shed"] == 1
+    assert stats["queued"] == 0
+
+
+def test_slot_is_released_when_the_call_fails():
+    async def main():
+        scheduler = Scheduler(max_concurrency=1, requests_per_minute=6000)
+        with pytest.raises(ValueError):
+            async with scheduler.slot(STANDARD, 1):
+                raise ValueError("boom")
+        async with scheduler.slot(STANDARD, 1):
+            pass
+        return scheduler.stats()
+
+    stats = asyncio.run(main())
+    assert stats["running"] == 0 and stats["dispatched"] == 2
+
+
+def test_cancelled_waiter_leaves_the_queue():
+    async def main():
+        scheduler = Scheduler(max_concurrency=1, requests_per_minute=6000)
+        await scheduler.acquire(STANDARD, 1)
+        waiter = asyncio.create_task(scheduler.acquire(STANDARD, 1))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        queued = scheduler.queue_length
+        scheduler.release()
+        return queued, scheduler.stats()
+
+    queued, stats = asyncio.run(main())
+    assert queued == 0
+    assert stats["running"] == 0 and stats["dispatched"] == 1
+
+
+def test_empty_request_bucket_delays_dispatch():
+    async def main():
+        scheduler = Scheduler(requests_per_minute=600) # ten per second
+        scheduler.requests.tokens = 0
+        started = time.monotonic()
+        async with scheduler.slot(STANDARD, 1):
+            return time.monotonic() - started
+
+    assert 0.08 <= asyncio.run(main()) < 1
+
+
+def test_run_retries_quota_errors_and_corrects_token_estimate(monkeypatch):
+    monkeypatch.setattr(llm_scheduler, "BACKOFF_BASE_SECONDS", 0.001)
+    attempts = []
+
+    async def call():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise QuotaExceededError("429", retry_after=0.01)
+        return types.SimpleNamespace(usage_metadata=types.SimpleNamespace(total_token_count=300))
+
+    async def main():
+        scheduler = Scheduler(requests_per_minute=6000, tokens_per_minute=10000)
+        await scheduler.run(call, tokens=1000)
+        return scheduler
+
+    scheduler = asyncio.run(main())
+    assert len(attempts) == 3
+    assert scheduler.stats()["retries"] == 2
+    # Three dispatches were estimated at 1000 each; the successful one used 300
+    assert scheduler.tokens.tokens == pytest.approx(10000 - 2000 - 300, abs=50)
@@ -0,0 +1,180 @@
+import asyncio
+import json
+from datetime import date
+
+import pytest
+
+import llm_cache
+import llm_gateway
+import llm_scheduler
+import plan_schedule
+import study_planner
+
+TODAY = date(2026, 3, 2) # a Monday
+
+
+def test_parse_topics_weights():
+    assert plan_schedule.parse_topics("Algebra x2; Geometry\nStatistics (x3), - Physics Chapter: 5") == [
+        ("Algebra", 2.0), ("Geometry", 1.0), ("Statistics", 3.0), ("Physics Chapter: 5", 1.0),
+    ]
+    assert plan_schedule.parse_topics("Matrix 5, Calculus (2)") == [("Matrix 5", 1.0), ("Calculus (2)", 1.0)]
+    with pytest.raises(plan_schedule.PlanInputError):
+        plan_schedule.parse_topics(" , ;")
+
+
+def test_study_weekdays_are_spread():
+    assert plan_schedule.study_weekdays(7) == set(range(7))
+    assert plan_schedule.study_weekdays(3) == {0, 2, 4}
+
+
+def test_allocate_hours_gives_every_topic_a_slot():
+    assert plan_schedule.allocate_hours([("A", 1), ("B", 1), ("C", 100)], 6) == [0.5, 0.5, 5.0]
+    assert plan_schedule.allocate_hours([("A", 1), ("B", 3)], 4) == [1.5, 2.5]
+    with pytest.raises(plan_schedule.PlanInputError):
+        plan_schedule.allocate_hours([("A", 1), ("B", 1), ("C", 1)], 1)
+
+
+def test_schedule_layout():
+    schedule = plan_schedule.build_schedule("A, B", "2026-03-02", "2026-03-15", hours_per_day="2", today=TODAY)
+    types = [day["type"] for day in schedule["days"]]
+    assert len(types) == 14
+    assert types[6] == "review" and types[13] == "review"
+    assert types.count("study") == 12
+    assert schedule["study_days"] == 12 and schedule["review_days"] == 2 and schedule["rest_days"] == 0
+    assert [topic["hours"] for topic in schedule["topics"]] == [12.0, 12.0]
+    assert all(sum(slot["hours"] for slot in day["slots"]) == 2 for day in schedule["days"])
+
+
+def test_every_topic_is_scheduled():
+    topics = ", ".join(f"T{n}" for n in range(60))
+    schedule = plan_schedule.build_schedule(topics, today=TODAY)
+    scheduled = {topic for topic, _, _ in plan_schedule.study_sessions(schedule)}
+    assert scheduled == {f"T{n}" for n in range(60)}
+
+    schedule = plan_schedule.build_schedule("A:1, B:1, C x100", "2026-03-02", "2026-03-08", hours_per_day="1", today=TODAY)
+    assert all(topic["sessions"] >= 1 for topic in schedule["topics"])
+
+
+def test_schedule_input_errors():
+    with pytest.raises(plan_schedule.PlanInputError):
+        plan_schedule.build_schedule("A", "2026-03-10", "2026-03-01", today=TODAY)
+    with pytest.raises(plan_schedule.PlanInputError):
+        plan_schedule.build_schedule("A", "not a date", today=TODAY)
+    with pytest.raises(plan_schedule.PlanInputError):
+        plan_schedule.build_schedule("A, B, C", "2026-03-02", "2026-03-02", hours_per_day="1", today=TODAY)
+
+
+def test_render_markdown():
+    schedule = plan_schedule.build_schedule("Algebra", "2026-03-02", "2026-03-04", today=TODAY)
+    markdown = plan_schedule.render_markdown(schedule, "An overview.", ["Sleep well"])
+    assert markdown.startswith("### Overview\nAn overview.")
+    assert "### Week of 2026-03-02" in markdown
+    assert "Algebra (part 1/2), 2 h" in markdown
+    assert markdown.endswith("### Tips\n- Sleep well")
+
+
+@pytest.fixture
+def model(monkeypatch):
+    state = {"response": "", "discarded": 0}
+
+    async def generate(prompt, use_cache=True, priority=llm_scheduler.STANDARD, store=True):
+        return state["response"]
+
+    async def stream(prompt, use_cache=True, priority=llm_scheduler.STANDARD):
+        state["streaming"] = True
+        response = state["response"]
+        for start in range(0, len(response), 7):
+            yield response[start:start + 7]
+
+    async def discard(model_name, prompt):
+        state["discarded"] += 1
+
+    monkeypatch.setattr(llm_gateway, "generate", generate)
+    monkeypatch.setattr(llm_gateway, "stream", stream)
+    monkeypatch.setattr(llm_cache, "discard", discard)
+    return state
+
+
+def plan(topics="Algebra"):
+    return asyncio.run(study_planner.build_study_plan(topics, "2026-03-02", "2026-03-04"))
+
+
+def test_fill_is_applied(model):
+    model["response"] = json.dumps({
+        "sessions": [{"id": 1, "focus": "Linear equations"}, {"id": "2", "focus": "Quadratics"}, {"id": 1}],
+        "overview": "Two days.",
+        "tips": ["Rest", 3],
+    })
+    schedule, markdown = plan()
+    assert schedule["overview"] == "Two days."
+    assert schedule["tips"] == ["Rest"]
+    assert schedule["days"][0]["slots"][0]["focus"] == "Linear equations"
+    assert schedule["days"][1]["slots"][0]["focus"] == "Quadratics"
+    assert "Linear equations" in markdown
+    assert model["discarded"] == 0
+
+
+@pytest.mark.parametrize("response", [
+    "not json",
+    "[1, 2]",
+    '{"sessions": {"1": "Linear equations"}, "tips": []}',
+    '{"sessions": "Linear equations"}',
+    '{"sessions": [{"id": 1, "focus": "Linear equations"}], "tips": "Rest well"}',
+])
+def test_wrong_shaped_fill_is_dropped(model, response):
+    model["response"] = response
+    schedule, _ = plan()
+    assert schedule["tips"] == [] and schedule["overview"] == ""
+    assert "focus" not in schedule["days"][0]["slots"][0]
+    assert model["discarded"] == 1
+
+
+def test_study_only(model):
+    model["response"] = '{"study_only": true}'
+    assert plan("Fantasy football") == (None, study_planner.STUDY_ONLY_MESSAGE)
+
+
+def stream_plan(topics="Algebra"):
+    async def collect():
+        return [chunk async for chunk in study_planner.stream_study_plan(topics, "2026-03-02", "2026-03-04")]
+    return asyncio.run(collect())
+
+
+def test_stream_sends_the_calendar_before_calling_the_model(model):
+    model["response"] = json.dumps({"sessions": [{"id": 1, "focus": "Linear equations"}], "tips": ["Rest"]})
+    events = study_planner.stream_study_plan("Algebra", "2026-03-02", "2026-03-04")
+
+    async def first():
+        chunk = await events.__anext__()
+        await events.aclose()
+        return chunk
+
+    assert asyncio.run(first()).startswith("### Overview")
+    assert "streaming" not in model
+
+
+def test_stream_sends_focus_lines_then_tips(model):
+    model["response"] = json.dumps({
+        "sessions": [{"id": 1, "focus": "Linear equations"}, {"id": 2, "focus": "Quadratics"}],
+        "overview": "Two days.",
+        "tips": ["Rest"],
+    })
+    chunks = stream_plan()
+    calendar = "".join(chunks[:-4])
+    assert "### Week of 2026-03-02" in calendar and "Linear equations" not in calendar
+    assert chunks[-4:] == [
+        "\n\n### Session focus\n- **Monday 2026-03-02: Algebra (part 1/2)** - Linear equations",
+        "\n- **Tuesday 2026-03-03: Algebra (part 2/2)** - Quadratics",
+        "\n\n### Summary\nTwo days.",
+        "\n\n### Tips\n- Rest",
+    ]
+    assert model["discarded"] == 0
+
+
+def test_stream_study_only_and_malformed(model):
+    model["response"] = '{"study_only": true}'
+    assert stream_plan("Fantasy football")[-1] == "\n\n" + study_planner.STUDY_ONLY_MESSAGE
+    model["response"] = '{"sessions": [{"id": 1, "focus": "Linear equations"}'
+    chunks = stream_plan()
+    assert chunks[-1].endswith("Linear equations")
+    assert model["discarded"] == 1
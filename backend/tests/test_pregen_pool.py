@@ -0,0 +1,53 @@
+import asyncio
+import json
+
+import pytest
+
+import llm_gateway
+import llm_scheduler
+import pregen_pool
+
+CARDS = {"flashcards": [{"front": "DNA", "back": "Genetic material"}]}
+
+
+@pytest.fixture
+def calls(monkeypatch):
+    """Record the gateway calls and answer each with a flashcard set."""
+    calls = []
+
+    async def generate(prompt, use_cache=True, priority=llm_scheduler.STANDARD, store=True):
+        calls.append({"prompt": prompt, "use_cache": use_cache, "priority": priority, "store": store})
+        return json.dumps(CARDS)
+
+    monkeypatch.setattr(llm_gateway, "generate", generate)
+    return calls
+
+
+def test_variants_get_distinct_uncached_prompts(calls):
+    pool = pregen_pool.PregenPool()
+    pool.record("flashcards", "Cells")
+    key = ("flashcards", "cells")
+
+    assert asyncio.run(pool.fill_one(key))
+    assert asyncio.run(pool.fill_one(key))
+    assert pool.take("flashcards", " cells ") == CARDS
+
+    assert calls[0]["prompt"] != calls[1]["prompt"]
+    assert all(call == {**call, "use_cache": False, "store": False, "priority": llm_scheduler.BACKGROUND} for call in calls)
+    assert pool.stats()["generated"] == 2
+
+
+def test_result_for_a_forgotten_topic_is_dropped(calls, monkeypatch):
+    pool = pregen_pool.PregenPool()
+    pool.record("flashcards", "Cells")
+    key = ("flashcards", "cells")
+
+    async def generate(*args, **kwargs):
+        pool._forget(key)
+        return json.dumps(CARDS)
+
+    monkeypatch.setattr(llm_gateway, "generate", generate)
+    assert not asyncio.run(pool.fill_one(key))
+    assert pool.take("flashcards", "Cells") is None
+    assert pool.stats()["discarded"] == 1
+    assert pool.stats()["variants"] == 0
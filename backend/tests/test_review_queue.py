@@ -0,0 +1,126 @@
+import asyncio
+
+import pytest
+from sqlalchemy import delete
+
+import database
+import review_queue
+from models import ReviewCard
+
+NOW = 1_800_000_000
+DAY = review_queue.DAY_SECONDS
+
+
+def run(work):
+    """Run work(db) in a fresh async session on the test database and commit."""
+    async def main():
+        engine = database.make_async_engine()
+        try:
+            async with database.async_sessionmaker(engine, expire_on_commit=False)() as db:
+                result = await work(db)
+                await db.commit()
+                return result
+        finally:
+            await engine.dispose()
+
+    return asyncio.run(main())
+
+
+@pytest.fixture(autouse=True)
+def empty_queue():
+    database.init_db()
+    run(lambda db: db.execute(delete(ReviewCard)))
+
+
+def add(cards, user_id=1, now=NOW):
+    async def work(db):
+        await review_queue.add_cards(db, user_id, cards, now=now)
+    run(work)
+
+
+def next_due(user_id=1, limit=20, lease=600, now=NOW):
+    return run(lambda db: review_queue.next_due(db, user_id, limit, lease, now=now))
+
+
+def grade(card_id, quality, now, user_id=1):
+    return run(lambda db: review_queue.grade(db, user_id, card_id, quality, now=now))
+
+
+def test_sm2_schedule():
+    add([("DNA", "Genetic material")])
+    card, = next_due()
+
+    first = grade(card.id, 5, NOW)
+    assert (first.reps, first.interval_days, first.due_at) == (1, 1.0, NOW + DAY)
+    assert first.ease == pytest.approx(2.6)
+
+    now = first.due_at
+    second = grade(card.id, 4, now)
+    assert (second.reps, second.interval_days, second.due_at) == (2, 6.0, now + 6 * DAY)
+    assert second.ease == pytest.approx(2.6)
+
+    now = second.due_at
+    third = grade(card.id, 3, now)
+    assert (third.reps, third.interval_days) == (3, 16.0) # round(6 * 2.6)
+    assert third.ease == pytest.approx(2.46)
+    assert third.due_at == now + 16 * DAY
+
+    now = third.due_at
+    lapse = grade(card.id, 1, now)
+    assert (lapse.reps, lapse.lapses, lapse.interval_days) == (0, 1, 0.0)
+    assert lapse.due_at == now + review_queue.REVIEW_RELEARN_SECONDS
+    assert lapse.ease == pytest.approx(2.46) # a lapse keeps the ease
+    assert lapse.last_reviewed_at == now
+
+
+def test_ease_never_drops_below_minimum():
+    add([("DNA", "Genetic material")])
+    card, = next_due()
+    now = NOW
+    for _ in range(10):
+        card = grade(card.id, 3, now)
+        now = card.due_at
+    assert card.ease == pytest.approx(review_queue.MIN_EASE)
+
+
+def test_lease_hides_cards_without_moving_due_time():
+    add([("a", "1"), ("b", "2"), ("c", "3")])
+    first = next_due(limit=2)
+    assert len(first) == 2
+    assert all(card.due_at == NOW for card in first)
+    second = next_due(limit=2)
+    assert {card.front for card in second} == {"c"}
+    assert next_due(lease=0) == []
+    # Ungraded cards come back once the lease runs out, still in due order
+    assert [card.front for card in next_due(lease=0, now=NOW + 601)] == ["a", "b", "c"]
+
+
+def test_only_due_or_leased_cards_can_be_graded():
+    add([("a", "1")], now=NOW + DAY)
+    card, = next_due(lease=0, now=NOW + DAY)
+
+    with pytest.raises(review_queue.CardNotDueError):
+        grade(card.id, 5, NOW) # not due yet and not leased
+
+    graded = grade(card.id, 5, NOW + DAY)
+    with pytest.raises(review_queue.CardNotDueError):
+        grade(card.id, 5, NOW + DAY + 1) # a repeated grade does not stretch the interval
+    assert grade(card.id, 5, graded.due_at).interval_days == 6.0
+
+    assert grade(card.id + 1000, 5, NOW) is None
+    assert grade(card.id, 5, graded.due_at, user_id=2) is None
+
+
+def test_leased_card_can_be_graded_and_lease_ends():
+    add([("a", "1")])
+    card, = next_due()
+    graded = grade(card.id, 1, NOW + 10)
+    # A lapsed card is due again after the relearn delay, even though it was leased longer
+    assert graded.due_at == NOW + 10 + review_queue.REVIEW_RELEARN_SECONDS
+    assert [c.id for c in next_due(lease=0, now=graded.due_at)] == [card.id]
+
+
+def test_lease_is_capped():
+    add([("a", "1")])
+    next_due(lease=10**19)
+    assert next_due(lease=0, now=NOW + review_queue.REVIEW_MAX_LEASE_SECONDS)[0].front == "a"
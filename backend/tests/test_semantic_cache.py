@@ -0,0 +1,90 @@
+import asyncio
+
+import pytest
+
+import ai_chat
+import llm_gateway
+import llm_scheduler
+import semantic_cache
+
+
+def test_filler_words_do_not_change_the_match():
+    cache = semantic_cache.SemanticCache()
+    cache.store("What is photosynthesis?", "Beginner", "Plants make sugar from light.")
+    assert cache.lookup("explain photosynthesis please", "Beginner") == "Plants make sugar from light."
+
+
+def test_opposite_word_is_not_served():
+    cache = semantic_cache.SemanticCache()
+    cache.store("advantages of nuclear energy", "Beginner", "Low emissions.")
+    assert cache.lookup("disadvantages of nuclear energy", "Beginner") is None
+    assert cache.lookup("What are the advantages of nuclear energy?", "Beginner") == "Low emissions."
+    assert cache.lookup("nuclear energy advantage", "Beginner") == "Low emissions."
+
+
+def test_scores_do_not_depend_on_entry_age():
+    cache = semantic_cache.SemanticCache()
+    cache.store("cell membrane transport", "Beginner", "answer")
+    vector = cache._vector(semantic_cache._features(semantic_cache.tokens("cell membrane transport")))
+    before = cache._similarities(cache._partitions["Beginner"], vector)[0]
+    for n in range(200):
+        cache.store(f"cell topic{n}", "Beginner", "other")
+    after = cache._similarities(cache._partitions["Beginner"], vector)[0]
+    assert before == pytest.approx(1.0) and after == pytest.approx(1.0)
+    assert cache.lookup("cell membrane transport", "Beginner") == "answer"
+
+
+def test_different_topic_or_level_misses():
+    cache = semantic_cache.SemanticCache()
+    cache.store("What is photosynthesis?", "Beginner", "Plants make sugar from light.")
+    assert cache.lookup("What is mitosis?", "Beginner") is None
+    assert cache.lookup("What is photosynthesis?", "Advanced") is None
+
+
+def test_unknown_levels_are_not_stored():
+    cache = semantic_cache.SemanticCache()
+    for level in ("beginner", "Expert", "x" * 50):
+        cache.store("What is photosynthesis?", level, "answer")
+    assert cache.stats()["entries"] == {}
+    assert cache.stats()["stores"] == 0
+
+
+def test_least_recently_used_entry_is_replaced():
+    cache = semantic_cache.SemanticCache(max_entries=2)
+    cache.store("photosynthesis", "Beginner", "p")
+    cache.store("mitosis", "Beginner", "m")
+    assert cache.lookup("photosynthesis", "Beginner") == "p"
+    cache.store("osmosis", "Beginner", "o")
+    assert cache.lookup("mitosis", "Beginner") is None
+    assert cache.lookup("photosynthesis", "Beginner") == "p"
+    assert cache.stats()["entries"] == {"Beginner": 2}
+    assert cache.stats()["evictions"] == 1
+
+
+@pytest.fixture
+def chat(monkeypatch):
+    """A fresh semantic cache and a model that answers with state["answer"]."""
+    state = {"answer": "", "calls": 0}
+
+    async def generate(prompt, use_cache=True, priority=llm_scheduler.STANDARD, store=True):
+        state["calls"] += 1
+        return state["answer"]
+
+    monkeypatch.setattr(semantic_cache, "cache", semantic_cache.SemanticCache())
+    monkeypatch.setattr(llm_gateway, "generate", generate)
+    return state
+
+
+def test_chat_answers_are_reused(chat):
+    chat["answer"] = "Plants make sugar from light."
+    asyncio.run(ai_chat.study_chat("What is photosynthesis?"))
+    assert asyncio.run(ai_chat.study_chat("explain photosynthesis")) == chat["answer"]
+    assert chat["calls"] == 1
+
+
+def test_chat_does_not_store_refusals_or_bypassed_answers(chat):
+    chat["answer"] = ai_chat.STUDY_ONLY_MESSAGE
+    asyncio.run(ai_chat.study_chat("football scores"))
+    chat["answer"] = "Fresh answer."
+    asyncio.run(ai_chat.study_chat("What is photosynthesis?", use_cache=False))
+    assert semantic_cache.cache.stats()["stores"] == 0
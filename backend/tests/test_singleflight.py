@@ -0,0 +1,82 @@
+import asyncio
+
+import pytest
+
+import singleflight
+
+
+def test_make_key_normalizes_whitespace_and_case():
+    assert singleflight.make_key("chat", text="  What is  DNA? ") == singleflight.make_key("chat", text="what is dna?")
+    assert singleflight.make_key("chat", text="a") != singleflight.make_key("quiz", text="a")
+
+
+def test_concurrent_calls_share_one_execution():
+    flight = singleflight.SingleFlight()
+    calls = 0
+
+    async def work():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return "answer"
+
+    async def main():
+        return await asyncio.gather(*(flight.do(("chat", "q"), work) for _ in range(5)))
+
+    assert asyncio.run(main()) == ["answer"] * 5
+    assert calls == 1
+    stats = flight.stats()
+    assert stats["endpoints"]["chat"] == {"calls": 5, "executed": 1, "coalesced": 4}
+    assert stats["inflight"] == 0
+
+
+def test_sequential_calls_run_again():
+    flight = singleflight.SingleFlight()
+    calls = 0
+
+    async def work():
+        nonlocal calls
+        calls += 1
+        return calls
+
+    async def main():
+        return [await flight.do(("chat", "q"), work) for _ in range(3)]
+
+    assert asyncio.run(main()) == [1, 2, 3]
+
+
+def test_exception_reaches_every_waiter():
+    flight = singleflight.SingleFlight()
+
+    async def work():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("upstream failed")
+
+    async def main():
+        return await asyncio.gather(*(flight.do(("quiz", "x"), work) for _ in range(3)), return_exceptions=True)
+
+    results = asyncio.run(main())
+    assert all(isinstance(result, RuntimeError) for result in results)
+
+
+def test_cancelled_waiter_does_not_cancel_the_work():
+    flight = singleflight.SingleFlight()
+
+    async def main():
+        done = asyncio.Event()
+
+        async def work():
+            await asyncio.sleep(0.05)
+            done.set()
+            return "answer"
+
+        first = asyncio.ensure_future(flight.do(("chat", "q"), work))
+        second = asyncio.ensure_future(flight.do(("chat", "q"), work))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        assert await second == "answer"
+        assert done.is_set()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+
+    asyncio.run(main())
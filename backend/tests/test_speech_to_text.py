@@ -0,0 +1,124 @@
+import io
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import speech_to_text
+
+
+class StubRouter(BaseHTTPRequestHandler):
+    """Answers every POST with {"text": ...} after `delay` seconds, over keep-alive connections."""
+
+    protocol_version = "HTTP/1.1"
+    delay = 0.0
+    status = 200
+    connections = set()
+    requests = []
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        type(self).connections.add(self.client_address)
+        type(self).requests.append((self.path, self.headers.get("Authorization"), body))
+        time.sleep(self.delay)
+        payload = json.dumps({"text": f" router {len(body)} "} if self.status == 200 else {"error": "busy"}).encode()
+        self.send_response(self.status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def router(monkeypatch):
+    StubRouter.delay, StubRouter.status = 0.0, 200
+    StubRouter.connections, StubRouter.requests = set(), []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubRouter)
+    thread = threading.Thread(target=server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True)
+    thread.start()
+    monkeypatch.setenv("HF_TOKEN", "test-token")
+    monkeypatch.setattr(speech_to_text, "ROUTER_URL", f"http://127.0.0.1:{server.server_address[1]}")
+    monkeypatch.setattr(speech_to_text, "_session", None)
+    yield StubRouter
+    server.shutdown()
+    server.server_close()
+
+
+def upload(data: bytes = b"RIFF-audio"):
+    audio = io.BytesIO(data)
+    audio.type = "audio/wav"
+    return audio
+
+
+def test_router_requests_reuse_one_connection(router, monkeypatch):
+    monkeypatch.setattr(speech_to_text, "DEFAULT_PROVIDER", "")
+    for _ in range(5):
+        assert speech_to_text.transcribe_single(upload(), "org/model") == "router 10"
+    assert len(router.requests) == 5
+    assert len(router.connections) == 1
+    path, authorization, body = router.requests[0]
+    assert path == "/org/model"
+    assert authorization == "Bearer test-token"
+    assert body == b"RIFF-audio"
+
+
+def test_router_quota_error_is_classified(router, monkeypatch):
+    monkeypatch.setattr(speech_to_text, "DEFAULT_PROVIDER", "")
+    router.status = 429
+    with pytest.raises(speech_to_text.QuotaExceededError):
+        speech_to_text.transcribe_single(upload(), "org/model")
+
+
+def test_provider_failure_falls_back_to_router(router, monkeypatch):
+    def failing_provider(payload, model_id, token):
+        raise RuntimeError("provider down")
+
+    monkeypatch.setattr(speech_to_text, "DEFAULT_PROVIDER", "stub")
+    monkeypatch.setattr(speech_to_text, "HEDGE_AFTER_SECONDS", 0)
+    monkeypatch.setattr(speech_to_text, "transcribe_with_provider", failing_provider)
+    assert speech_to_text.transcribe_single(upload(b"abc"), "org/model") == "router 3"
+
+
+def test_slow_provider_is_hedged_by_router(router, monkeypatch):
+    def slow_provider(payload, model_id, token):
+        time.sleep(1)
+        return "provider"
+
+    monkeypatch.setattr(speech_to_text, "DEFAULT_PROVIDER", "stub")
+    monkeypatch.setattr(speech_to_text, "HEDGE_AFTER_SECONDS", 0.1)
+    monkeypatch.setattr(speech_to_text, "transcribe_with_provider", slow_provider)
+    started = time.monotonic()
+    assert speech_to_text.transcribe_single(upload(), "org/model") == "router 10"
+    assert time.monotonic() - started < 0.8
+    assert len(router.requests) == 1
+
+
+def test_fast_provider_never_starts_the_hedge(router, monkeypatch):
+    monkeypatch.setattr(speech_to_text, "DEFAULT_PROVIDER", "stub")
+    monkeypatch.setattr(speech_to_text, "HEDGE_AFTER_SECONDS", 0.5)
+    monkeypatch.setattr(speech_to_text, "transcribe_with_provider", lambda payload, model_id, token: "provider")
+    assert speech_to_text.transcribe_single(upload(), "org/model") == "provider"
+    assert router.requests == []
+
+
+def test_hedge_returns_provider_when_router_fails(router, monkeypatch):
+    def provider(payload, model_id, token):
+        time.sleep(0.4)
+        return "provider"
+
+    router.status = 500
+    monkeypatch.setattr(speech_to_text, "DEFAULT_PROVIDER", "stub")
+    monkeypatch.setattr(speech_to_text, "HEDGE_AFTER_SECONDS", 0.1)
+    monkeypatch.setattr(speech_to_text, "transcribe_with_provider", provider)
+    assert speech_to_text.transcribe_single(upload(), "org/model") == "provider"
+
+
+def test_provider_client_times_out_like_the_router():
+    client = speech_to_text.get_inference_client("hf-inference", "test-token")
+    assert client.timeout == speech_to_text.REQUEST_TIMEOUT_SECONDS
+    assert speech_to_text.get_inference_client("hf-inference", "test-token") is client
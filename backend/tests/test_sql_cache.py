@@ -0,0 +1,85 @@
+import asyncio
+import time
+from datetime import datetime, timedelta
+
+import llm_cache
+import sql_cache
+import transcript_cache
+from database import SessionLocal
+from models import LLMCacheEntry, TranscriptCacheEntry
+
+
+def clear(model):
+    db = SessionLocal()
+    try:
+        model.__table__.create(bind=db.get_bind(), checkfirst=True)
+        db.query(model).delete()
+        db.commit()
+    finally:
+        db.close()
+
+
+def keys(model):
+    db = SessionLocal()
+    try:
+        return {key for key, in db.query(model.key)}
+    finally:
+        db.close()
+
+
+def test_transcript_cache_evicts_least_recently_used_in_batches(monkeypatch):
+    clear(TranscriptCacheEntry)
+    monkeypatch.setattr(sql_cache, "EVICT_BATCH_SIZE", 2)
+    monkeypatch.setattr(transcript_cache, "MAX_BYTES", 50)
+    monkeypatch.setattr(transcript_cache._table, "evict_every", 1000)
+    for index in range(10):
+        transcript_cache.put(f"k{index}", "model", "x" * 10)
+        time.sleep(0.002)
+    assert transcript_cache.get("k0") == "x" * 10 # now the most recently used
+
+    with transcript_cache._table.session() as db:
+        transcript_cache._evict(db)
+    assert keys(TranscriptCacheEntry) == {"k0", "k6", "k7", "k8", "k9"}
+
+
+def test_transcript_cache_round_trip_and_miss():
+    clear(TranscriptCacheEntry)
+    transcript_cache.put("a", "model", "hello")
+    transcript_cache.put("a", "model", "hello again")
+    assert transcript_cache.get("a") == "hello again"
+    assert transcript_cache.get("missing") is None
+
+
+def test_llm_cache_disk_eviction_drops_expired_then_oldest(monkeypatch):
+    clear(LLMCacheEntry)
+    monkeypatch.setattr(sql_cache, "EVICT_BATCH_SIZE", 3)
+    monkeypatch.setattr(llm_cache, "DISK_MAX_ENTRIES", 4)
+    monkeypatch.setattr(llm_cache._table, "evict_every", 1000)
+    old = datetime.utcnow() - timedelta(seconds=llm_cache.TTL_SECONDS + 60)
+    db = SessionLocal()
+    try:
+        db.add_all(LLMCacheEntry(key=f"old{i}", model="m", response="r", created_at=old, last_used_at=old) for i in range(5))
+        db.commit()
+    finally:
+        db.close()
+    for index in range(7):
+        llm_cache._disk_put(f"new{index}", "m", "r")
+        time.sleep(0.002)
+
+    with llm_cache._table.session() as db:
+        llm_cache._disk_evict(db)
+    assert keys(LLMCacheEntry) == {"new3", "new4", "new5", "new6"}
+
+
+def test_llm_cache_put_get_discard():
+    clear(LLMCacheEntry)
+    llm_cache._memory.clear()
+
+    async def main():
+        await llm_cache.put("m", "What is  DNA?", "A molecule.")
+        llm_cache._memory.clear()
+        assert await llm_cache.get("m", "What is DNA?") == "A molecule." # from disk, whitespace-normalized
+        await llm_cache.discard("m", "What is DNA?")
+        assert await llm_cache.get("m", "What is DNA?") is None
+
+    asyncio.run(main())
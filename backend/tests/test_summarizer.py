@@ -0,0 +1,54 @@
+import asyncio
+
+import pytest
+
+import llm_gateway
+import llm_scheduler
+import summarizer
+
+SHORT_NOTES = "# Cells\nThe unit of life.\n# DNA\nGenetic code.\n# RNA\nCopies genes."
+
+
+def test_notes_within_budget_are_one_chunk():
+    assert summarizer.split_into_chunks(SHORT_NOTES) == [SHORT_NOTES]
+    assert summarizer.split_into_chunks("  \n ") == []
+
+
+def test_small_sections_are_packed_up_to_the_budget():
+    sections = [f"# Section {n}\n" + "word " * 30 for n in range(6)] # about 40 tokens each
+    chunks = summarizer.split_into_chunks("\n".join(sections), budget=100)
+    assert chunks == ["\n\n".join(s.strip() for s in sections[i:i + 2]) for i in (0, 2, 4)]
+
+
+def test_only_oversized_sections_are_split():
+    big = "# Big\n" + "\n\n".join("sentence " * 20 for _ in range(4)) # about 200 tokens
+    small = "# Small\nA short section."
+    chunks = summarizer.split_into_chunks(f"{small}\n{big}\n{small}", budget=100)
+    assert chunks[0] == small
+    assert chunks[-1] == small
+    assert len(chunks) > 3
+    assert all(summarizer.estimate_tokens(chunk) <= 100 for chunk in chunks)
+
+
+@pytest.fixture
+def prompts(monkeypatch):
+    prompts = []
+
+    async def generate(prompt, use_cache=True, priority=llm_scheduler.STANDARD, store=True):
+        prompts.append(prompt)
+        return "notes"
+
+    monkeypatch.setattr(llm_gateway, "generate", generate)
+    return prompts
+
+
+def test_short_notes_cost_one_call(prompts):
+    assert asyncio.run(summarizer.summarize_text(SHORT_NOTES)) == "notes"
+    assert len(prompts) == 1
+
+
+def test_long_notes_are_mapped_then_merged(prompts, monkeypatch):
+    monkeypatch.setattr(summarizer, "CHUNK_TOKEN_BUDGET", 100)
+    text = "\n".join(f"# Section {n}\n" + "word " * 60 for n in range(3))
+    asyncio.run(summarizer.summarize_text(text))
+    assert len(prompts) == 4 # three sections, one merge
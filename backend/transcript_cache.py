@@ -0,0 +1,86 @@
+import hashlib
+import os
+from datetime import datetime
+
+from sqlalchemy import func
+
+from models import TranscriptCacheEntry
+from sql_cache import SqlCacheTable
+
+CACHE_ENABLED = os.getenv("TRANSCRIPT_CACHE_ENABLED", "1") == "1"
+# Bound on the summed size of cached transcripts; least recently used go first
+MAX_BYTES = int(os.getenv("TRANSCRIPT_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+# Check the size bound every this many writes instead of on every insert
+_EVICT_EVERY = 20
+_HASH_CHUNK_BYTES = 1024 * 1024
+
+_stats = {"hits": 0, "misses": 0, "writes": 0, "evictions": 0}
+
+
+def make_key(audio_file, model_id: str) -> str:
+    """sha256 of the model id and the audio bytes, read in chunks from the start of the file.
+
+    The file position is restored afterwards.
+    """
+    digest = hashlib.sha256(model_id.encode("utf-8") + b"\0")
+    position = audio_file.tell()
+    audio_file.seek(0)
+    while True:
+        chunk = audio_file.read(_HASH_CHUNK_BYTES)
+        if not chunk:
+            break
+        digest.update(chunk)
+    audio_file.seek(position)
+    return digest.hexdigest()
+
+
+def get(key: str):
+    """Return the cached transcript for this key, or None on a miss."""
+    if not CACHE_ENABLED:
+        return None
+    with _table.session() as db:
+        entry = db.get(TranscriptCacheEntry, key)
+        if entry is None:
+            _stats["misses"] += 1
+            return None
+        entry.last_used_at = datetime.utcnow()
+        db.commit()
+        _stats["hits"] += 1
+        return entry.transcript
+
+
+def _evict(db):
+    """Delete the least recently used rows until the total size is within MAX_BYTES."""
+    total = db.query(func.coalesce(func.sum(TranscriptCacheEntry.size), 0)).scalar()
+    if total > MAX_BYTES:
+        _stats["evictions"] += _table.trim(db, total - MAX_BYTES, weight=TranscriptCacheEntry.size)
+
+
+_table = SqlCacheTable(TranscriptCacheEntry, _evict, _EVICT_EVERY)
+
+
+def put(key: str, model_id: str, transcript: str):
+    if not CACHE_ENABLED or not transcript:
+        return
+    with _table.session() as db:
+        now = datetime.utcnow()
+        stored = _table.store(db, TranscriptCacheEntry(
+            key=key,
+            model=model_id,
+            transcript=transcript,
+            size=len(transcript.encode("utf-8")),
+            created_at=now,
+            last_used_at=now,
+        ))
+        if stored:
+            _stats["writes"] += 1
+
+
+def stats():
+    lookups = _stats["hits"] + _stats["misses"]
+    return {
+        **_stats,
+        "hit_rate": round(_stats["hits"] / lookups, 4) if lookups else 0.0,
+        "max_bytes": MAX_BYTES,
+    }
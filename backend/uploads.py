@@ -0,0 +1,135 @@
+import json
+import os
+
+from fastapi import HTTPException
+
+from audio_segments import is_wav
+
+# The first file part of a multipart body must start within this many bytes to be recognized
+SNIFF_BYTES = 64 * 1024
+
+
+class SizeLimit:
+    """Body size cap for one path, optionally higher for WAV uploads.
+
+    Whether an upload is a WAV is decided from the first bytes of the first
+    multipart file part, which must arrive within SNIFF_BYTES of the start
+    of the body; until then, and for anything else, max_bytes applies.
+    """
+
+    def __init__(self, max_bytes: int, wav_max_bytes: int = None):
+        self.max_bytes = max_bytes
+        self.wav_max_bytes = wav_max_bytes
+
+    @property
+    def ceiling(self) -> int:
+        return max(self.max_bytes, self.wav_max_bytes or 0)
+
+
+def _wav_part(head: bytes):
+    """True or False once the first file part's leading bytes are in `head`, None before that."""
+    name = head.find(b"filename=")
+    if name < 0:
+        return None
+    body = head.find(b"\r\n\r\n", name)
+    if body < 0 or len(head) < body + 16:
+        return None
+    return is_wav(bytes(head[body + 4:body + 16]))
+
+
+class UploadSizeLimit:
+    """ASGI middleware capping the request body size of selected paths.
+
+    A declared Content-Length over the highest limit is rejected before any
+    of the body is read. Otherwise bytes are counted as the multipart parser
+    pulls them in, and the request fails with 413 as soon as the limit that
+    applies is crossed, so an oversized upload is never spooled in full.
+    """
+
+    def __init__(self, app, limits: dict):
+        self.app = app
+        self.limits = limits # path -> SizeLimit, or max body bytes
+
+    async def __call__(self, scope, receive, send):
+        limit = self.limits.get(scope.get("path")) if scope["type"] == "http" else None
+        if limit is None:
+            return await self.app(scope, receive, send)
+        if isinstance(limit, int):
+            limit = SizeLimit(limit)
+
+        headers = dict(scope.get("headers") or [])
+        declared = headers.get(b"content-length")
+        if declared and declared.isdigit() and int(declared) > limit.ceiling:
+            return await _reject(send, limit.ceiling)
+
+        received = 0
+        max_bytes = limit.max_bytes
+        head = bytearray() if limit.wav_max_bytes else None # body start, kept until the type is known
+
+        async def limited_receive():
+            nonlocal received, max_bytes, head
+            message = await receive()
+            if message["type"] == "http.request":
+                body = message.get("body", b"")
+                received += len(body)
+                if head is not None:
+                    head += body[:SNIFF_BYTES - len(head)]
+                    wav = _wav_part(head)
+                    if wav is not None or len(head) >= SNIFF_BYTES:
+                        if wav:
+                            max_bytes = limit.wav_max_bytes
+                        head = None
+                if received > max_bytes:
+                    raise HTTPException(status_code=413, detail=too_large_detail(max_bytes))
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+
+def too_large_detail(max_bytes: int) -> str:
+    return f"File too large. Maximum size is {max_bytes // (1024 * 1024)}MB."
+
+
+async def _reject(send, max_bytes: int):
+    body = json.dumps({"detail": too_large_detail(max_bytes)}).encode("utf-8")
+    await send({
+        "type": "http.response.start",
+        "status": 413,
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+class AudioUpload:
+    """File-like view of an uploaded file for speech_to_text.
+
+    Reads go straight to the upload's spooled temporary file (memory up to
+    a threshold, disk beyond), and `.type` carries the MIME type the way
+    Streamlit's UploadedFile does.
+    """
+
+    def __init__(self, file, content_type: str = None):
+        self.file = file
+        self.type = content_type
+
+    def read(self, size: int = -1) -> bytes:
+        return self.file.read(size)
+
+    def seek(self, offset: int, whence: int = 0) -> int:
+        return self.file.seek(offset, whence)
+
+    def tell(self) -> int:
+        return self.file.tell()
+
+
+def reopen(file):
+    """A second handle on an upload's temporary file that outlives the upload.
+
+    Depending on the FastAPI version the upload is closed when the handler
+    returns, before a streamed response has read it. The spooled file is
+    moved to disk if it was still in memory and its descriptor duplicated,
+    so the data stays readable until the new handle is closed.
+    """
+    handle = os.fdopen(os.dup(file.fileno()), "rb")
+    handle.seek(0)
+    return handle
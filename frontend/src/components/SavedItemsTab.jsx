@@ -9,20 +9,25 @@ export default function SavedItemsTab({ isActive }) {
     const [loading, setLoading] = useState(true);
     const [error, setError] = useState('');
     const [selectedItem, setSelectedItem] = useState(null);
+    const [nextCursor, setNextCursor] = useState(null);
+    const [loadingMore, setLoadingMore] = useState(false);
 
-    const fetchItems = async () => {
+    const fetchItems = async (cursor = null) => {
         try {
-            setLoading(true);
+            cursor ? setLoadingMore(true) : setLoading(true);
             const token = localStorage.getItem('token');
             const API_URL = import.meta.env.VITE_API_BASE_URL || 'http://localhost:8000';
             const res = await axios.get(`${API_URL}/api/saved-content`, {
-                headers: { Authorization: `Bearer ${token}` }
+                headers: { Authorization: `Bearer ${token}` },
+                params: cursor ? { fields: 'summary', cursor } : { fields: 'summary' }
             });
-            setItems(res.data);
+            setItems(prev => cursor ? [...prev, ...res.data] : res.data);
+            setNextCursor(res.headers['x-next-cursor'] || null);
         } catch (err) {
             setError('Failed to fetch saved items');
         } finally {
             setLoading(false);
+            setLoadingMore(false);
         }
     };
 
@@ -32,6 +37,19 @@ export default function SavedItemsTab({ isActive }) {
         }
     }, [isActive]);
 
+    const openItem = async (item) => {
+        try {
+            const token = localStorage.getItem('token');
+            const API_URL = import.meta.env.VITE_API_BASE_URL || 'http://localhost:8000';
+            const res = await axios.get(`${API_URL}/api/saved-content/${item.id}`, {
+                headers: { Authorization: `Bearer ${token}` }
+            });
+            setSelectedItem(res.data);
+        } catch (err) {
+            setError('Failed to load saved item');
+        }
+    };
+
     const deleteItem = async (id, e) => {
         e.stopPropagation();
         try {
@@ -162,7 +180,7 @@ export default function SavedItemsTab({ isActive }) {
                     {items.map(item => (
                         <div
                             key={item.id}
-                            onClick={() => setSelectedItem(item)}
+                            onClick={() => openItem(item)}
                             className={`p-5 rounded-2xl border flex flex-col cursor-pointer transition-all hover:-translate-y-1 hover:shadow-lg ${getBgColor(item.content_type)} group`}
                         >
                             <div className="flex justify-between items-start mb-3">
@@ -185,6 +203,15 @@ export default function SavedItemsTab({ isActive }) {
                             </p>
                         </div>
                     ))}
+                    {nextCursor && (
+                        <button
+                            onClick={() => fetchItems(nextCursor)}
+                            disabled={loadingMore}
+                            className="md:col-span-2 lg:col-span-3 flex items-center justify-center gap-2 p-3 rounded-2xl border border-white/10 text-slate-300 hover:bg-white/5 transition-colors disabled:opacity-50"
+                        >
+                            {loadingMore ? <><Loader2 size={18} className="animate-spin" /> Loading...</> : 'Load more'}
+                        </button>
+                    )}
                 </div>
             )}
         </div>
@@ -43,9 +43,11 @@ export default function VoiceNotesTab() {
         if (e.target.files && e.target.files[0]) {
             const selectedFile = e.target.files[0];
 
-            // Limit file size to 10MB (10 * 1024 * 1024 bytes)
-            if (selectedFile.size > 10 * 1024 * 1024) {
-                setError('File size exceeds the 10MB limit. Please upload a smaller audio file.');
+            // WAV recordings are split into segments server-side, so they may be much larger
+            const isWav = selectedFile.type === 'audio/wav' || selectedFile.type === 'audio/x-wav' || selectedFile.name.toLowerCase().endsWith('.wav');
+            const limitMb = isWav ? 200 : 10;
+            if (selectedFile.size > limitMb * 1024 * 1024) {
+                setError(`File size exceeds the ${limitMb}MB limit. Please upload a smaller audio file.`);
                 setFile(null);
                 setTranscript('');
                 setSummary('');